@@ -0,0 +1,353 @@
+# Pool of long-lived ACE generator processes so the ERG image is loaded once, not once per MRS
+import atexit
+import queue
+import re
+import threading
+from delphin import ace, interface
+import POGG.config
+import POGG.generation_cache
+
+# status of a generation request, see GenerationResults
+# everything ACE generated
+GENERATION_OK = 'ok'
+# ACE stopped at max_results, so there may have been more
+GENERATION_TRUNCATED = 'truncated'
+# ACE ran out of the memory it was allowed (max_chart_megabytes/max_unpack_megabytes), results are whatever it had
+GENERATION_RESOURCE_LIMIT = 'resource_limit'
+# ACE was killed for running past the timeout
+GENERATION_TIMEOUT = 'timeout'
+# the request was cancelled (see GenerationRequest)
+GENERATION_CANCELLED = 'cancelled'
+# ACE reported an error
+GENERATION_ERROR = 'error'
+
+# how ACE reports running out of memory
+RESOURCE_LIMIT_PATTERN = re.compile(r"RAM limit|out of (RAM|memory)", re.IGNORECASE)
+
+
+class ACEGeneratorPool:
+    """
+    Pool of warm ACE generator processes.
+
+    Opening an ACEGenerator loads the whole ERG image, which takes far longer than generating from a single MRS.
+    Instead of opening a new generator for every MRS, the pool keeps up to `size` generators open and hands them
+    out per request. A generator that crashes (or is killed because it ran past the timeout) is restarted
+    so the next request still gets a working process.
+    """
+    def __init__(self, grammar, cmdargs=None, size=1, timeout=None, executable=None, cache=None,
+                 max_results=None, max_chart_megabytes=None, max_unpack_megabytes=None):
+        """
+        :param grammar: path to the compiled grammar image (e.g. the ERG .dat file)
+        :type grammar: str
+        :param cmdargs: command line arguments for ACE, defaults to ['-r', 'root_frag']
+        :type cmdargs: list
+        :param size: maximum number of ACE processes kept open at once
+        :type size: int
+        :param timeout: seconds a single request may take before its ACE process is killed and restarted
+        :type timeout: float
+        :param executable: path to the ACE binary, if it isn't just `ace`
+        :type executable: str
+        :param cache: results already generated, checked by mrs_util.generate before anything is sent to ACE
+        :type cache: POGG.generation_cache.GenerationCache
+        :param max_results: maximum number of realizations per request (ACE's -n), no limit if None
+        :type max_results: int
+        :param max_chart_megabytes: memory ACE may use for the chart per request, ACE's default if None
+        :type max_chart_megabytes: int
+        :param max_unpack_megabytes: memory ACE may use for unpacking realizations per request, ACE's default if None
+        :type max_unpack_megabytes: int
+        """
+        if size < 1:
+            raise ValueError("ACE generator pool size must be at least 1, got {}".format(size))
+
+        self.grammar = grammar
+        self.cmdargs = ['-r', 'root_frag'] if cmdargs is None else list(cmdargs)
+        # the limits are ACE options, so ACE stops itself (and keeps what it has) instead of being killed
+        self.max_results = max_results
+        if max_results is not None:
+            self.cmdargs += ['-n', str(max_results)]
+        if max_chart_megabytes is not None:
+            self.cmdargs.append('--max-chart-megabytes={}'.format(max_chart_megabytes))
+        if max_unpack_megabytes is not None:
+            self.cmdargs.append('--max-unpack-megabytes={}'.format(max_unpack_megabytes))
+        self.size = size
+        self.timeout = timeout
+        self.executable = executable
+        self.cache = cache
+
+        # each entry is either an open generator or None, a free slot where a generator still has to be opened
+        # LIFO so the most recently used (i.e. warm) generators are handed out before free slots
+        self._slots = queue.LifoQueue()
+        for _ in range(size):
+            self._slots.put(None)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _open_generator(self):
+        # ACEProcess appends its own arguments to cmdargs in place, so give every process its own copy
+        return ace.ACEGenerator(self.grammar, list(self.cmdargs), executable=self.executable)
+
+    def checkout(self):
+        """
+        Get an open generator from the pool, opening a new one if there's a free slot
+        and otherwise waiting until one is returned
+        :return: open ACE generator
+        :rtype: ace.ACEGenerator
+        """
+        if self._closed:
+            raise RuntimeError("ACE generator pool is closed")
+
+        generator = self._slots.get()
+        if generator is None:
+            try:
+                generator = self._open_generator()
+            except Exception:
+                # give the slot back so the next request can try again
+                self._slots.put(None)
+                raise
+        return generator
+
+    def checkin(self, generator, healthy=True):
+        """
+        Return a generator to the pool. Unhealthy generators are closed instead and their slot is freed,
+        so the next checkout opens a fresh process
+        :param generator: generator previously returned by checkout()
+        :type generator: ace.ACEGenerator
+        :param healthy: whether the generator can keep being used
+        :type healthy: bool
+        """
+        if healthy and not self._closed and _is_running(generator):
+            self._slots.put(generator)
+        else:
+            _close_quietly(generator)
+            self._slots.put(None)
+
+    def interact(self, mrs_string, timeout=None, request=None):
+        """
+        Send an MRS to one of the pooled generators and return the response
+        The response's 'status' is one of the GENERATION_* statuses
+        :param mrs_string: MRS string to generate from
+        :type mrs_string: str
+        :param timeout: seconds this request may take, the pool's timeout if None
+        :type timeout: float
+        :param request: handle another thread can cancel this request with
+        :type request: GenerationRequest
+        :return: ACE response
+        :rtype: delphin.interface.Response
+        """
+        if timeout is None:
+            timeout = self.timeout
+        generator = self.checkout()
+
+        if request is not None and not request._start(generator):
+            # cancelled while it was waiting for a generator, so don't send it at all
+            self.checkin(generator)
+            response = _error_response(mrs_string, "Request was cancelled before it was sent to ACE")
+            response['status'] = GENERATION_CANCELLED
+            return response
+
+        # if the request runs too long, kill the process, which makes PyDelphin stop waiting on it
+        watchdog = None
+        timed_out = threading.Event()
+        if timeout is not None:
+            watchdog = threading.Timer(timeout, _kill, (generator, timed_out))
+            watchdog.daemon = True
+            watchdog.start()
+
+        healthy = False
+        response = None
+        try:
+            response = generator.interact(mrs_string)
+            # if ACE dies mid-request, PyDelphin closes the generator and returns whatever it had read,
+            # so checkin sees the process isn't running any more and frees its slot
+            healthy = True
+        except OSError:
+            # ACE was killed (timed out or cancelled) before the MRS could be written to it
+            if not timed_out.is_set() and not (request is not None and request.cancelled.is_set()):
+                raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            if request is not None:
+                request._finish()
+            self.checkin(generator, healthy)
+
+        if timed_out.is_set():
+            error = "ACE was killed after {} seconds".format(timeout)
+            status = GENERATION_TIMEOUT
+        elif request is not None and request.cancelled.is_set():
+            error = "ACE was killed because the request was cancelled"
+            status = GENERATION_CANCELLED
+        else:
+            response['status'] = self._status(response)
+            return response
+
+        if response is None:
+            response = _error_response(mrs_string, error)
+        else:
+            response.setdefault('ERRORS', []).append(error)
+        response['status'] = status
+        return response
+
+    def _status(self, response):
+        # status of a request that ACE finished by itself
+        messages = response.get('ERRORS', []) + response.get('WARNINGS', []) + response.get('NOTES', [])
+        if any(RESOURCE_LIMIT_PATTERN.search(message) for message in messages):
+            return GENERATION_RESOURCE_LIMIT
+        if response.get('ERRORS'):
+            return GENERATION_ERROR
+        if self.max_results is not None and len(response.get('results', [])) >= self.max_results:
+            return GENERATION_TRUNCATED
+        return GENERATION_OK
+
+    def close(self):
+        """
+        Close every idle generator, generators still checked out are closed when they're returned
+        (and the cache's database, which is opened again if the cache is used afterwards)
+        """
+        self._closed = True
+        while True:
+            try:
+                generator = self._slots.get_nowait()
+            except queue.Empty:
+                break
+            if generator is not None:
+                _close_quietly(generator)
+        if self.cache is not None:
+            self.cache.close()
+
+
+class GenerationResults(list):
+    """
+    Results of generating from one MRS (see mrs_util.generate), along with the GENERATION_* status of the request,
+    so a timeout or a cap can be told apart from the ERG just not generating anything
+    """
+    def __init__(self, results=(), status=None):
+        """
+        :param results: generation results
+        :type results: Iterable
+        :param status: GENERATION_* status (None if nothing was sent to ACE)
+        :type status: str
+        """
+        super().__init__(results)
+        self.status = status
+
+
+class GenerationRequest:
+    """
+    Handle for one request sent through ACEGeneratorPool.interact, so it can be cancelled from another thread
+    (e.g. when the asyncio task waiting on it is cancelled, see mrs_util.generate_async)
+    Cancelling a request that's already been sent kills its ACE process, which is restarted the same as after a timeout
+    """
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._generator = None
+
+    def cancel(self):
+        """
+        Cancel the request, whether it's been sent yet or not
+        """
+        with self._lock:
+            self.cancelled.set()
+            if self._generator is not None:
+                _kill(self._generator)
+
+    def _start(self, generator):
+        # False if it's already been cancelled
+        with self._lock:
+            if self.cancelled.is_set():
+                return False
+            self._generator = generator
+            return True
+
+    def _finish(self):
+        with self._lock:
+            self._generator = None
+
+
+def _error_response(mrs_string, error):
+    # response for a request that never got to ACE
+    return interface.Response({'NOTES': [], 'WARNINGS': [], 'ERRORS': [error], 'input': mrs_string, 'results': []})
+
+
+def _is_running(generator):
+    return generator._p.poll() is None
+
+
+def _kill(generator, killed=None):
+    if killed is not None:
+        killed.set()
+    try:
+        generator._p.kill()
+    except OSError:
+        pass
+
+
+def _close_quietly(generator):
+    try:
+        generator.close()
+    except (OSError, ValueError):
+        _kill(generator)
+
+
+def pool_from_global_config():
+    """
+    Make a generator pool with the grammar, limits, and generation cache the global config asks for
+    :return: generator pool
+    :rtype: ACEGeneratorPool
+    """
+    config = POGG.config.load_global_config()
+    return ACEGeneratorPool(config['ERG'], ['-r', 'root_frag'],
+                            size=config.get('ACE_pool_size', 1),
+                            timeout=config.get('ACE_timeout'),
+                            cache=POGG.generation_cache.from_global_config(),
+                            max_results=config.get('ACE_max_results'),
+                            max_chart_megabytes=config.get('ACE_max_chart_megabytes'),
+                            max_unpack_megabytes=config.get('ACE_max_unpack_megabytes'))
+
+
+# shared pool used by mrs_util.generate when no pool is passed in, created on first use
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool():
+    """
+    Get the process-wide generator pool, creating it from the global config the first time it's needed
+    :return: shared generator pool
+    :rtype: ACEGeneratorPool
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = pool_from_global_config()
+        return _shared_pool
+
+
+def close_shared_pool():
+    """
+    Close the shared generator pool, a new one is created if generation is requested afterwards
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool = None
+
+
+def detach_shared_pool():
+    """
+    Forget the shared generator pool without closing it. Used in forked worker processes,
+    where the inherited pool's ACE processes belong to the parent process
+    """
+    global _shared_pool
+    _shared_pool = None
+
+
+atexit.register(close_shared_pool)
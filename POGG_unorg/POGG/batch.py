@@ -0,0 +1,294 @@
+# Running the graph -> MRS -> text pipeline over a whole directory of graphs, optionally across several processes
+import os
+import concurrent.futures
+import networkx as nx
+import POGG.mrs_util
+import POGG.graph_util
+import POGG.graph_corpus
+import POGG.composition_cache
+import POGG.evaluation
+import POGG.ace_pool
+
+
+# reason recorded for a graph that got no results, by the status of its generation request
+NO_RESULTS_REASONS = {
+    POGG.ace_pool.GENERATION_OK: "ERG did not generate",
+    POGG.ace_pool.GENERATION_TRUNCATED: "ERG did not generate",
+    POGG.ace_pool.GENERATION_RESOURCE_LIMIT: "ACE hit its memory limit",
+    POGG.ace_pool.GENERATION_TIMEOUT: "Generation timed out",
+    POGG.ace_pool.GENERATION_CANCELLED: "Generation cancelled",
+    POGG.ace_pool.GENERATION_ERROR: "ACE error",
+}
+
+# kept here as well, since this is where the batch tools have always looked for it
+list_graph_files = POGG.graph_util.list_graph_files
+
+
+def process_graph(graph_path, lexicon, results_directory, pool=None, memoize=False, cache_dir=None):
+    """
+    Convert one graph to MRS, generate from it, and write the per-graph results file
+    :param graph_path: path to the .dot file
+    :type graph_path: str
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param results_directory: directory the per-graph results file is written to
+    :type results_directory: str
+    :param pool: generator pool to generate with, the shared pool if not given
+    :type pool: ACEGeneratorPool
+    :param memoize: whether to compose subtrees under nodes with several parents only once (see SubtreeMemo)
+    :type memoize: bool
+    :param cache_dir: directory for the composition cache (see composition_cache), no caching if None
+    :type cache_dir: str
+    :return: tuple of the graph name, eval information, and generation information ([# results, reason, status])
+    :rtype: tuple
+    """
+    graph_name, mrs_string, eval_info = compose_graph(graph_path, lexicon, memoize, cache_dir)
+
+    results = []
+    if mrs_string:
+        results = POGG.mrs_util.generate(mrs_string, pool)
+
+    generation_entry = write_graph_results(graph_path, results_directory, mrs_string, eval_info, results)
+    return graph_name, eval_info, generation_entry
+
+
+def compose_graph(graph_path, lexicon, memoize=False, cache_dir=None):
+    """
+    Read one graph and convert it to a wrapped MRS string, i.e. everything process_graph does before generating
+    :param graph_path: path to the .dot file
+    :type graph_path: str
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param memoize: whether to compose subtrees under nodes with several parents only once (see SubtreeMemo)
+    :type memoize: bool
+    :param cache_dir: directory for the composition cache (see composition_cache), no caching if None
+    :type cache_dir: str
+    :return: tuple of the graph name, MRS string ("" if no MRS was produced, None if the graph has cycles),
+    and eval information
+    :rtype: tuple
+    """
+    filename = os.path.basename(graph_path)
+    graph_name = os.path.splitext(filename)[0]
+    print(filename)
+
+    eval_info = {
+        'nodes': {},
+        'edges': {}
+    }
+
+    # from the directory's pack if it's been packed (see graph_corpus), otherwise from the .dot file
+    graph = POGG.graph_corpus.read_graph(graph_path)
+
+    # TODO: might want to deal with this better in the future...
+    # if there's a cycle, skip it entirely
+    try:
+        nx.find_cycle(graph)
+        return graph_name, None, eval_info
+    except nx.NetworkXNoCycle:
+        pass
+
+    root = POGG.graph_util.find_root(graph)
+
+    # from the composition cache if this composition has been done before (see composition_cache)
+    mrs_string, eval_info = POGG.composition_cache.compose(graph, root, lexicon, memoize, cache_dir)
+    return graph_name, mrs_string, eval_info
+
+
+def write_graph_results(graph_path, results_directory, mrs_string, eval_info, results):
+    """
+    Write the per-graph results file, i.e. everything process_graph does after generating
+    :param graph_path: path to the .dot file
+    :type graph_path: str
+    :param results_directory: directory the per-graph results file is written to
+    :type results_directory: str
+    :param mrs_string: MRS string from compose_graph
+    :type mrs_string: str
+    :param eval_info: eval information from compose_graph
+    :type eval_info: dict
+    :param results: generation results ([] if nothing was generated), see mrs_util.generate
+    :type results: POGG.ace_pool.GenerationResults
+    :return: generation information ([# results, reason, GENERATION_* status or None if nothing was generated])
+    :rtype: list
+    """
+    with open(results_filename(graph_path, results_directory), 'w') as results_file:
+        results_file.write(graph_path + "\n")
+
+        if mrs_string is None:
+            results_file.write("Graph contains cycles")
+            return [0, "Graph contains cycles", None]
+
+        results_file.write(mrs_string + "\n")
+
+        if mrs_string == "":
+            generation_entry = [0, "MRS not produced", None]
+        else:
+            results_file.write("GENERATED RESULTS ... \n")
+            for r in results:
+                results_file.write(r.get('surface') + "\n")
+
+            # e.g. a timeout shouldn't look like the ERG not generating, and partial results are still results
+            status = getattr(results, 'status', POGG.ace_pool.GENERATION_OK)
+            if len(results) == 0:
+                generation_entry = [0, NO_RESULTS_REASONS.get(status, "ERG did not generate"), status]
+            else:
+                generation_entry = [len(results), "Successfully generated", status]
+
+        results_file.write("\nTOTAL RESULTS: {}".format(len(results)))
+
+        results_file.write("\n\n")
+        results_file.write(POGG.evaluation.node_evaluation(eval_info['nodes']))
+        results_file.write("\n\n")
+        results_file.write(POGG.evaluation.edge_evaluation(eval_info['edges']))
+        results_file.write("\n\n")
+        results_file.write(POGG.evaluation.evaluation_summary(eval_info))
+
+    return generation_entry
+
+
+def results_filename(graph_path, results_directory):
+    """
+    Get the path of the per-graph results file written for a graph
+    :param graph_path: path to the .dot file
+    :type graph_path: str
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :return: path to the results file, e.g. RESULTS_DIRECTORY/graph0.txt for graph0.dot
+    :rtype: str
+    """
+    graph_name = os.path.splitext(os.path.basename(graph_path))[0]
+    return os.path.join(results_directory, graph_name + ".txt")
+
+
+# per-process state for worker processes, set once by _init_worker so the lexicon isn't re-sent with every graph
+_worker_lexicon = None
+_worker_results_directory = None
+_worker_memoize = False
+_worker_cache_dir = None
+
+
+def _init_worker(lexicon, results_directory, memoize, cache_dir):
+    global _worker_lexicon, _worker_results_directory, _worker_memoize, _worker_cache_dir
+    _worker_lexicon = lexicon
+    _worker_results_directory = results_directory
+    _worker_memoize = memoize
+    _worker_cache_dir = cache_dir
+    # a forked worker inherits the parent's shared pool, but the ACE processes in it belong to the parent
+    POGG.ace_pool.detach_shared_pool()
+
+
+def _process_chunk(graph_paths):
+    return [process_graph(graph_path, _worker_lexicon, _worker_results_directory, memoize=_worker_memoize,
+                          cache_dir=_worker_cache_dir)
+            for graph_path in graph_paths]
+
+
+def _chunk(items, chunksize):
+    return [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+
+def run_batch(graph_paths, lexicon, results_directory, workers=1, chunksize=1, ordered=True, pool=None,
+              memoize=False, cache_dir=None):
+    """
+    Process many graphs, fanning them out over a pool of worker processes if workers > 1
+    Results are yielded per graph as (graph_name, eval_info, generation_entry) tuples, see process_graph
+    :param graph_paths: paths to the .dot files to process
+    :type graph_paths: list
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :param workers: number of worker processes, 1 processes every graph in this process
+    :type workers: int
+    :param chunksize: number of graphs sent to a worker at a time
+    :type chunksize: int
+    :param ordered: if True yield results in the order of graph_paths, otherwise as soon as each chunk finishes
+    :type ordered: bool
+    :param pool: generator pool to use when processing in this process, each worker process uses its own
+    :type pool: ACEGeneratorPool
+    :param memoize: whether to compose subtrees under nodes with several parents only once (see SubtreeMemo)
+    :type memoize: bool
+    :param cache_dir: directory for the composition cache (see composition_cache), no caching if None
+    :type cache_dir: str
+    :return: generator of per-graph results
+    :rtype: generator
+    """
+    graph_paths = list(graph_paths)
+
+    if workers is None or workers <= 1:
+        for graph_path in graph_paths:
+            yield process_graph(graph_path, lexicon, results_directory, pool, memoize, cache_dir)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(lexicon, results_directory, memoize, cache_dir)) as executor:
+        futures = [executor.submit(_process_chunk, chunk) for chunk in _chunk(graph_paths, max(1, chunksize))]
+        if not ordered:
+            futures = concurrent.futures.as_completed(futures)
+        for future in futures:
+            for graph_result in future.result():
+                yield graph_result
+
+
+async def run_pipeline(graph_paths, lexicon, results_directory, pool=None, memoize=False, cache_dir=None,
+                       concurrency=None, timeout=None):
+    """
+    Process many graphs in this process, composing each graph while the ones before it are still with ACE,
+    and writing each graph's results file as soon as its generation comes back (see mrs_util.generate_many)
+    Results are yielded per graph as (graph_name, eval_info, generation_entry) tuples as they finish, see process_graph
+    :param graph_paths: paths to the .dot files to process
+    :type graph_paths: list
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :param pool: generator pool to generate with, the shared pool if not given
+    :type pool: ACEGeneratorPool
+    :param memoize: whether to compose subtrees under nodes with several parents only once (see SubtreeMemo)
+    :type memoize: bool
+    :param cache_dir: directory for the composition cache (see composition_cache), no caching if None
+    :type cache_dir: str
+    :param concurrency: maximum number of graphs being generated from at once, the pool size if None
+    :type concurrency: int
+    :param timeout: seconds ACE may take per graph, the pool's timeout if None
+    :type timeout: float
+    :return: async generator of per-graph results
+    :rtype: AsyncGenerator
+    """
+    graph_paths = list(graph_paths)
+    # position -> (graph name, MRS string, eval info), for graphs that are composed but not written yet
+    composed = {}
+
+    def mrs_strings():
+        # composed as generate_many asks for them, i.e. while earlier graphs are being generated from
+        for position, graph_path in enumerate(graph_paths):
+            composed[position] = compose_graph(graph_path, lexicon, memoize, cache_dir)
+            yield composed[position][1]
+
+    async for position, results in POGG.mrs_util.generate_many(mrs_strings(), pool, concurrency, timeout):
+        graph_name, mrs_string, eval_info = composed.pop(position)
+        generation_entry = write_graph_results(graph_paths[position], results_directory, mrs_string, eval_info, results)
+        yield graph_name, eval_info, generation_entry
+
+
+def merge_graph_result(graph_result, full_eval_info, generation_info):
+    """
+    Merge the results for one graph into the eval and generation information for the whole batch
+    Node and edge names are prefixed with the graph name so they stay unique across graphs
+    :param graph_result: (graph_name, eval_info, generation_entry) tuple from process_graph
+    :type graph_result: tuple
+    :param full_eval_info: eval information for every graph so far, updated in place
+    :type full_eval_info: dict
+    :param generation_info: generation information for every graph so far, updated in place
+    :type generation_info: dict
+    """
+    graph_name, eval_info, generation_entry = graph_result
+
+    for n in eval_info['nodes']:
+        new_node_name = "{}_{}".format(graph_name, n)
+        full_eval_info['nodes'][new_node_name] = eval_info['nodes'][n]
+
+    for e in eval_info['edges']:
+        new_edge_name = "{}_{}".format(graph_name, e)
+        full_eval_info['edges'][new_edge_name] = eval_info['edges'][e]
+
+    generation_info[graph_name] = generation_entry
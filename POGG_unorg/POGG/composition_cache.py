@@ -0,0 +1,258 @@
+# On-disk cache of the wrapped MRS (and eval info) composed for a graph, so a scenario that's run again
+# only composes the graphs that something has changed for
+# Converting a graph always gives the same MRS string as long as the same things go into it, i.e.
+#   - the graph's regularized node and edge labels and its structure (not which idApple1/idApple2 it was)
+#   - the lexicon entries those labels look up (only those, so editing one entry only misses for graphs that use it)
+#   - comp_to_graph_relations.json, the SEMI, and the code that does the composing
+# so all of that goes into the key, and nothing has to be checked or invalidated by hand
+import hashlib
+import json
+import os
+import pickle
+import threading
+from delphin.__about__ import __version__ as delphin_version
+import POGG.composition_library
+import POGG.config
+import POGG.data_regularization
+import POGG.evaluation
+import POGG.graph_to_mrs
+import POGG.mrs_algebra
+import POGG.mrs_util
+import POGG.persistent
+import POGG.semantic_constructions.base
+
+# bump if what gets written to the cache changes
+COMPOSITION_CACHE_VERSION = 1
+# modules whose code decides what a graph is composed into
+COMPOSITION_MODULES = [POGG.composition_library, POGG.data_regularization, POGG.evaluation, POGG.graph_to_mrs,
+                       POGG.mrs_algebra, POGG.mrs_util, POGG.persistent, POGG.semantic_constructions.base]
+
+_lock = threading.Lock()
+# hash of everything that's the same for every graph (composition types, SEMI, code), worked out once per process
+_environment = None
+
+
+def cache_path(cache_dir, key):
+    """
+    Get the path of the cache file for a key
+    :param cache_dir: directory for the cache
+    :type cache_dir: str
+    :param key: key from graph_key
+    :type key: str
+    :return: path to the cache file
+    :rtype: str
+    """
+    # split over subdirectories so no one directory ends up with every graph in it
+    return os.path.join(cache_dir, key[:2], "{}.pickle".format(key))
+
+
+def environment_fingerprint():
+    """
+    Get a hash of everything that affects composition apart from the graph and the lexicon,
+    i.e. comp_to_graph_relations.json, the SEMI, and the composition code
+    :return: hex digest
+    :rtype: str
+    """
+    global _environment
+    with _lock:
+        if _environment is None:
+            digest = hashlib.sha1()
+            digest.update(json.dumps(POGG.config.load_composition_types(), sort_keys=True).encode('utf-8'))
+            digest.update(POGG.config.SEMI_fingerprint().encode('utf-8'))
+            digest.update(delphin_version.encode('utf-8'))
+            for module in COMPOSITION_MODULES:
+                with open(module.__file__, 'rb') as module_file:
+                    digest.update(module_file.read())
+            _environment = digest.hexdigest()
+        return _environment
+
+
+def _graph_structure(graph, root):
+    # regularized labels and structure of everything under the root, in the order graph_to_mrs walks it
+    # nodes are numbered in the order they're first reached, so the numbering only depends on the structure
+    node_ids = {root: 0}
+    order = [root]
+    structure = []
+    for node in order:
+        children = []
+        for child in graph.successors(node):
+            if child not in node_ids:
+                node_ids[child] = len(order)
+                order.append(child)
+            edge_label = graph.get_edge_data(node, child)[0]['label']
+            children.append([POGG.data_regularization.regularize_edge(edge_label), node_ids[child]])
+        structure.append([POGG.data_regularization.regularize_node(node), children])
+    return structure
+
+
+def _lexicon_entries(lexicon, structure):
+    # every lexicon lookup converting the graph can make, along with whether it found anything
+    entries = []
+    seen = set()
+    to_visit = [label for label, _ in structure]
+    while to_visit:
+        node = to_visit.pop()
+        if isinstance(node, dict):
+            # compositional entry written out in place, its head/modifier are looked up in turn
+            predicates = node.get('predicates')
+            if isinstance(predicates, dict):
+                to_visit.extend(predicates.values())
+            continue
+        if not isinstance(node, str) or node in seen or POGG.graph_to_mrs.ERG_PREDICATE_PATTERN.match(node):
+            continue
+        seen.add(node)
+        for lexicon_type in ('entityTypes', 'propertyValues'):
+            entries_of_type = lexicon.get(lexicon_type, {})
+            if node in entries_of_type:
+                entries.append([lexicon_type, node, True, entries_of_type[node]])
+                if isinstance(entries_of_type[node], dict):
+                    to_visit.append(entries_of_type[node])
+                break
+            entries.append([lexicon_type, node, False, None])
+
+    properties = lexicon.get('properties', {})
+    for edge in sorted({edge for _, children in structure for edge, _ in children}):
+        entries.append(['properties', edge, edge in properties, properties.get(edge)])
+
+    return sorted(entries, key=lambda entry: (entry[0], entry[1]))
+
+
+def graph_key(graph, root, lexicon, memoize=False):
+    """
+    Get the cache key for composing a graph, which changes whenever anything that could change its MRS does
+    :param graph: graph to compose MRS from
+    :type graph: DiGraph
+    :param root: root node
+    :type root: str
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param memoize: whether subtrees are memoized (see SubtreeMemo), which numbers the variables differently
+    :type memoize: bool
+    :return: hex digest
+    :rtype: str
+    """
+    structure = _graph_structure(graph, root)
+    key = [COMPOSITION_CACHE_VERSION, environment_fingerprint(), bool(memoize),
+           structure, _lexicon_entries(lexicon, structure)]
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def graph_lexicon_fingerprint(graph, lexicon):
+    """
+    Get a hash of the lexicon entries a graph can use, which only changes when one of those entries does
+    Unlike graph_key this doesn't need a root (or a graph without cycles), since it looks at every node and edge
+    (graph_to_mrs.lexicon_fingerprint hashes the whole lexicon instead)
+    :param graph: graph to compose MRS from
+    :type graph: DiGraph
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :return: hex digest
+    :rtype: str
+    """
+    structure = [[POGG.data_regularization.regularize_node(node), []] for node in sorted(graph.nodes)]
+    # only the edge labels matter for the lookups, not where the edges go
+    structure.append([None, [[POGG.data_regularization.regularize_edge(label), 0]
+                             for _, _, label in graph.edges(data='label')]])
+    entries = _lexicon_entries(lexicon, structure)
+    return hashlib.sha1(json.dumps(entries, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def lexicon_uses(graph, lexicon):
+    """
+    Get the lexicon entries each node and edge in a graph can look up (including ones that aren't in the lexicon yet,
+    since adding them changes what the node or edge becomes), i.e. what editing an entry can change in the graph
+    :param graph: graph to compose MRS from
+    :type graph: DiGraph
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :return: dict of lexicon type -> entry -> names of the nodes and edge labels that use it
+    :rtype: dict
+    """
+    uses = {}
+    lookups = [(node, [[POGG.data_regularization.regularize_node(node), []]]) for node in graph.nodes]
+    lookups += [(label, [[None, [[POGG.data_regularization.regularize_edge(label), 0]]]])
+                for label in {label for _, _, label in graph.edges(data='label')}]
+    for name, structure in lookups:
+        for lexicon_type, entry, _, _ in _lexicon_entries(lexicon, structure):
+            uses.setdefault(lexicon_type, {}).setdefault(entry, set()).add(name)
+    return {lexicon_type: {entry: sorted(names) for entry, names in entries.items()}
+            for lexicon_type, entries in uses.items()}
+
+
+def load(cache_dir, key):
+    """
+    Get a cached composition
+    :param cache_dir: directory for the cache
+    :type cache_dir: str
+    :param key: key from graph_key
+    :type key: str
+    :return: tuple of the wrapped MRS string and eval information (None if it isn't cached)
+    :rtype: tuple
+    """
+    try:
+        with open(cache_path(cache_dir, key), 'rb') as cache_file:
+            cached = pickle.load(cache_file)
+        return cached['mrs'], cached['eval_info']
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def store(cache_dir, key, mrs_string, eval_info):
+    """
+    Cache a composition
+    :param cache_dir: directory for the cache
+    :type cache_dir: str
+    :param key: key from graph_key
+    :type key: str
+    :param mrs_string: wrapped MRS string ("" if no MRS was produced)
+    :type mrs_string: str
+    :param eval_info: eval information for the graph
+    :type eval_info: dict
+    """
+    filename = cache_path(cache_dir, key)
+    # a cache that can't be written just means composing again next time
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        temp_filename = "{}.{}.{}.tmp".format(filename, os.getpid(), threading.get_ident())
+        with open(temp_filename, 'wb') as cache_file:
+            pickle.dump({'mrs': mrs_string, 'eval_info': eval_info}, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, filename)
+    except OSError as e:
+        print("Couldn't write composition cache {}: {}".format(filename, e))
+
+
+def compose(graph, root, lexicon, memoize=False, cache_dir=None):
+    """
+    Convert a graph to a wrapped MRS string, from the cache if the same composition has been done before
+    :param graph: graph to compose MRS from
+    :type graph: DiGraph
+    :param root: root node
+    :type root: str
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param memoize: whether to compose subtrees under nodes with several parents only once (see SubtreeMemo)
+    :type memoize: bool
+    :param cache_dir: directory for the cache, no caching if None
+    :type cache_dir: str
+    :return: tuple of the wrapped MRS string ("" if no MRS was produced) and eval information
+    :rtype: tuple
+    """
+    key = None
+    if cache_dir is not None:
+        key = graph_key(graph, root, lexicon, memoize)
+        cached = load(cache_dir, key)
+        if cached is not None:
+            return cached
+
+    # variables are numbered per graph, so the same graph always gets the same MRS
+    with POGG.mrs_algebra.var_labeler_scope():
+        memo = POGG.graph_to_mrs.SubtreeMemo(graph, lexicon) if memoize else None
+        conversion_results = POGG.graph_to_mrs.graph_to_mrs(root, graph, lexicon, memo=memo)
+        graphmrs = conversion_results[0]
+        eval_info = conversion_results[1]
+
+        mrs_string = POGG.mrs_util.wrap_SEMENT(graphmrs)
+
+    if key is not None:
+        store(cache_dir, key, mrs_string, eval_info)
+    return mrs_string, eval_info
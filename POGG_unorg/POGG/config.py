@@ -0,0 +1,206 @@
+# Loading the global config, the composition types, and the grammar's SEMI
+# Everything is loaded the first time it's asked for (not at import) and then kept for the rest of the process
+# The parsed SEMI is also cached on disk so later processes don't have to parse the SEMI files again
+import copyreg
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import yaml
+from delphin.__about__ import __version__ as delphin_version
+from delphin import semi
+
+# config_data directory that sits next to the POGG package
+CONFIG_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config_data")
+DEFAULT_GLOBAL_CONFIG = os.path.join(CONFIG_DATA_DIRECTORY, "global_config.yml")
+DEFAULT_COMPOSITION_TYPES = os.path.join(CONFIG_DATA_DIRECTORY, "comp_to_graph_relations.json")
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "POGG")
+
+# bump if what gets written to the SEMI cache changes
+SEMI_CACHE_VERSION = 1
+
+_lock = threading.RLock()
+_global_config = None
+_composition_types = None
+_SEMI = None
+
+# PyDelphin's synopsis classes are tuples with a custom __new__, which pickle can't rebuild on its own
+copyreg.pickle(semi.SynopsisRole, lambda role: (semi.SynopsisRole, tuple(role)))
+copyreg.pickle(semi.Synopsis, lambda synopsis: (semi.Synopsis, (list(synopsis),)))
+
+
+def global_config_path():
+    """
+    Get the path to the global config, the POGG_GLOBAL_CONFIG environment variable if it's set
+    :return: path to global_config.yml
+    :rtype: str
+    """
+    return os.environ.get('POGG_GLOBAL_CONFIG', DEFAULT_GLOBAL_CONFIG)
+
+
+def load_global_config():
+    """
+    Get the global config, reading it the first time it's needed
+    :return: global config
+    :rtype: dict
+    """
+    global _global_config
+    with _lock:
+        if _global_config is None:
+            with open(global_config_path()) as config_file:
+                _global_config = yaml.safe_load(config_file)
+        return _global_config
+
+
+def load_composition_types():
+    """
+    Get the dict of composition functions and their composition types (comp_to_graph_relations.json)
+    :return: composition types
+    :rtype: dict
+    """
+    global _composition_types
+    with _lock:
+        if _composition_types is None:
+            with open(os.environ.get('POGG_COMPOSITION_TYPES', DEFAULT_COMPOSITION_TYPES)) as comp_file:
+                _composition_types = json.load(comp_file)
+        return _composition_types
+
+
+def SEMI_path():
+    """
+    Get the path to the top SEMI file, the POGG_SEMI environment variable if it's set, otherwise from the global config
+    :return: path to the SEMI
+    :rtype: str
+    """
+    path = os.environ.get('POGG_SEMI')
+    if path is None:
+        path = load_global_config()['SEMI']
+    return path
+
+
+def cache_directory():
+    """
+    Get the directory on-disk caches are written to,
+    the POGG_CACHE_DIR environment variable, then cache_directory in the global config, then ~/.cache/POGG
+    :return: path to the cache directory
+    :rtype: str
+    """
+    path = os.environ.get('POGG_CACHE_DIR')
+    if path is None:
+        path = load_global_config().get('cache_directory') or DEFAULT_CACHE_DIRECTORY
+    return os.path.expanduser(path)
+
+
+def get_SEMI():
+    """
+    Get the SEMI, loading it the first time it's needed
+    :return: SEMI
+    :rtype: delphin.semi.SemI
+    """
+    global _SEMI
+    with _lock:
+        if _SEMI is None:
+            _SEMI = load_SEMI(SEMI_path(), cache_directory())
+        return _SEMI
+
+
+def reset():
+    """
+    Forget everything that's been loaded, so it's loaded again (e.g. after changing the environment variables)
+    """
+    global _global_config, _composition_types, _SEMI
+    with _lock:
+        _global_config = None
+        _composition_types = None
+        _SEMI = None
+
+
+def SEMI_fingerprint(path=None):
+    """
+    Get a hash of the contents of the SEMI, including every file it includes
+    :param path: path to the top SEMI file (see SEMI_path if None)
+    :type path: str
+    :return: hex digest
+    :rtype: str
+    """
+    if path is None:
+        path = SEMI_path()
+    digest = hashlib.sha1()
+    for f in sorted(_SEMI_files(path)):
+        with open(f, 'rb') as semi_file:
+            digest.update(semi_file.read())
+    return digest.hexdigest()
+
+
+def _SEMI_files(path):
+    # the top SEMI file and every file it includes, the same way PyDelphin follows includes
+    files = []
+    to_visit = [os.path.abspath(os.path.expanduser(path))]
+    while to_visit:
+        current = to_visit.pop()
+        if current in files:
+            continue
+        files.append(current)
+        with open(current, encoding='utf-8') as semi_file:
+            for line in semi_file:
+                match = re.match(r"include:\s*(?P<filename>.+)$", line.rstrip("\n"))
+                if match:
+                    to_visit.append(os.path.join(os.path.dirname(current), match.group('filename').rstrip()))
+    return files
+
+
+def _file_stamps(files):
+    # files that changed will (almost certainly) have a new mtime or size
+    stamps = {}
+    for f in files:
+        stat = os.stat(f)
+        stamps[f] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+
+def _SEMI_cache_filename(path, directory):
+    key = "{}|{}|{}".format(os.path.abspath(os.path.expanduser(path)), delphin_version, SEMI_CACHE_VERSION)
+    return os.path.join(directory, "semi-{}.pickle".format(hashlib.sha1(key.encode('utf-8')).hexdigest()))
+
+
+def load_SEMI(path, cache_dir=None):
+    """
+    Load a SEMI, from the on-disk cache if none of its files have changed since it was cached
+    :param path: path to the top SEMI file
+    :type path: str
+    :param cache_dir: directory for the cache, no caching if None
+    :type cache_dir: str
+    :return: SEMI
+    :rtype: delphin.semi.SemI
+    """
+    if cache_dir is None:
+        return semi.load(path)
+
+    cache_filename = _SEMI_cache_filename(path, cache_dir)
+
+    # only the files recorded in the cache need to be checked,
+    # if the includes themselves changed then one of those files changed too
+    try:
+        with open(cache_filename, 'rb') as cache_file:
+            cached = pickle.load(cache_file)
+        if cached['stamps'] == _file_stamps(cached['stamps']):
+            return cached['SEMI']
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, TypeError, AttributeError):
+        pass
+
+    stamps = _file_stamps(_SEMI_files(path))
+    loaded_SEMI = semi.load(path)
+
+    # a cache that can't be written just means parsing again next time
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_filename = "{}.{}.tmp".format(cache_filename, os.getpid())
+        with open(temp_filename, 'wb') as cache_file:
+            pickle.dump({'stamps': stamps, 'SEMI': loaded_SEMI}, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, cache_filename)
+    except OSError as e:
+        print("Couldn't write SEMI cache {}: {}".format(cache_filename, e))
+
+    return loaded_SEMI
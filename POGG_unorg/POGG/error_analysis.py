@@ -1,12 +1,12 @@
 import os
-import yaml
 from delphin import ace, mrs
 from delphin.codecs import simplemrs
+import POGG.config
 import POGG.mrs_util
 from tabulate import tabulate
 
 # Load elements from global config
-global_config = yaml.safe_load((open("../config_data/global_config.yml")))
+global_config = POGG.config.load_global_config()
 grammar_location = global_config['ERG']
 
 error_analysis_path = "/POGG_data/development/Heal_TheTrees/results/error_analysis/"
@@ -42,13 +42,20 @@ with open(os.path.join(error_analysis_path, error_analysis_filename), 'w') as er
     # parse desired string with ERG
     with ace.ACEParser(grammar_location) as parser:
         response = parser.interact(desired_output)
-        for i, r in enumerate(response.results()):
-            target_mrs_obj = simplemrs.decode(r['mrs'])
-
-            # find discrepancies between result and broken mrs
-            error_analysis_file.write("------------------------------------------------------------------------------\n")
-            error_analysis_file.write("TARGET SSEMENT #{}:\n{}\n\n".format(i, simplemrs.encode(target_mrs_obj, indent=True)))
+        target_mrs_objs = [simplemrs.decode(r['mrs']) for r in response.results()]
+
+    # compare fingerprints first, so only parses that could match get the full isomorphism check
+    isomorphic_targets = POGG.mrs_util.find_isomorphic(composed_mrs_obj, target_mrs_objs, properties=False)
+    error_analysis_file.write("PARSES ISOMORPHIC TO MRS WITH ERROR: {}\n".format(isomorphic_targets))
+
+    for i, target_mrs_obj in enumerate(target_mrs_objs):
+        # find discrepancies between result and broken mrs
+        error_analysis_file.write("------------------------------------------------------------------------------\n")
+        error_analysis_file.write("TARGET SSEMENT #{}:\n{}\n\n".format(i, simplemrs.encode(target_mrs_obj, indent=True)))
+        if i in isomorphic_targets:
+            error_analysis_file.write("SEMENTs are isomorphic!\n")
+        else:
             POGG.mrs_util.find_discrepancy(target_mrs_obj, composed_mrs_obj, error_analysis_file)
-            error_analysis_file.write("------------------------------------------------------------------------------\n")
+        error_analysis_file.write("------------------------------------------------------------------------------\n")
 
 
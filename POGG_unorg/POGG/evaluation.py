@@ -1,6 +1,169 @@
 from tabulate import tabulate
 
 
+class EvalTable:
+    """
+    Flat eval information for converting one graph, filled in as the graph is walked
+    Nodes are kept in the order they're visited (parent before children) and edges in the order they're reached
+    (the edge to a child before everything below the child), so every subtree is one contiguous range of each.
+    When a node or edge fails, everything below it is marked as a range instead of walking through it,
+    and the marks are only applied once, when the table is turned into eval_info (see to_eval_info)
+    """
+    def __init__(self):
+        self.node_names = []
+        self.node_entries = []
+        self.edge_names = []
+        self.edge_entries = []
+        # (start, end, reason) ranges to mark as not included, in the order they were marked
+        self.node_marks = []
+        self.edge_marks = []
+
+    def position(self):
+        """
+        Get the current end of the table, i.e. where the next subtree starts
+        :return: # of nodes, edges, node marks, and edge marks so far
+        :rtype: tuple
+        """
+        return len(self.node_names), len(self.edge_names), len(self.node_marks), len(self.edge_marks)
+
+    def add_node(self, name, produced, included):
+        """
+        Add the entry for a node
+        :param name: node name with its counter (e.g. red_3)
+        :type name: str
+        :param produced: (bool, reason) for whether the node's MRS was produced
+        :type produced: tuple
+        :param included: (bool, reason) for whether the node's MRS was included
+        :type included: tuple
+        :return: the node's entry
+        :rtype: dict
+        """
+        entry = {'produced': produced, 'included': included}
+        self.node_names.append(name)
+        self.node_entries.append(entry)
+        return entry
+
+    def reserve_edge(self):
+        """
+        Make room for an edge before the subtree below it is added, so it comes first (see set_edge)
+        :return: index of the edge
+        :rtype: int
+        """
+        self.edge_names.append(None)
+        self.edge_entries.append(None)
+        return len(self.edge_names) - 1
+
+    def set_edge(self, index, name, produced, included):
+        """
+        Fill in the entry for a reserved edge
+        :param index: index from reserve_edge
+        :type index: int
+        :param name: edge name with its counter (e.g. color_2)
+        :type name: str
+        :param produced: (bool, reason) for whether the edge's MRS was composed
+        :type produced: tuple
+        :param included: (bool, reason) for whether the edge's MRS was included
+        :type included: tuple
+        :return: the edge's entry
+        :rtype: dict
+        """
+        entry = {'produced': produced, 'included': included}
+        self.edge_names[index] = name
+        self.edge_entries[index] = entry
+        return entry
+
+    def mark_not_included(self, start, reason):
+        """
+        Mark everything from a position to the end of the table as not included (unless it already isn't)
+        :param start: position the subtree starts at (see position)
+        :type start: tuple
+        :param reason: (False, reason) to mark entries with
+        :type reason: tuple
+        """
+        node_start, edge_start = start[:2]
+        if node_start < len(self.node_names):
+            self.node_marks.append((node_start, len(self.node_names), reason))
+        if edge_start < len(self.edge_names):
+            self.edge_marks.append((edge_start, len(self.edge_names), reason))
+
+    def subtree(self, start):
+        """
+        Copy everything from a position to the end of the table
+        :param start: position the subtree starts at (see position)
+        :type start: tuple
+        :return: table for just the subtree, with its marks not applied yet
+        :rtype: EvalTable
+        """
+        node_start, edge_start, node_mark_start, edge_mark_start = start
+        table = EvalTable()
+        table.node_names = self.node_names[node_start:]
+        table.node_entries = [dict(entry) for entry in self.node_entries[node_start:]]
+        table.edge_names = self.edge_names[edge_start:]
+        table.edge_entries = [_copy_entry(entry) for entry in self.edge_entries[edge_start:]]
+        # marks are added after everything they cover, so the subtree's own marks are the last ones
+        table.node_marks = [(s - node_start, e - node_start, r) for s, e, r in self.node_marks[node_mark_start:]]
+        table.edge_marks = [(s - edge_start, e - edge_start, r) for s, e, r in self.edge_marks[edge_mark_start:]]
+        return table
+
+    def extend(self, table, rename_node=None, rename_edge=None):
+        """
+        Add a copy of another table (e.g. a subtree) at the end of this one
+        :param table: table to add
+        :type table: EvalTable
+        :param rename_node: function to rename the other table's nodes with, if they need new names
+        :type rename_node: callable
+        :param rename_edge: function to rename the other table's edges with, if they need new names
+        :type rename_edge: callable
+        """
+        node_start = len(self.node_names)
+        edge_start = len(self.edge_names)
+        self.node_names.extend(table.node_names if rename_node is None else map(rename_node, table.node_names))
+        self.node_entries.extend(dict(entry) for entry in table.node_entries)
+        self.edge_names.extend(table.edge_names if rename_edge is None else map(rename_edge, table.edge_names))
+        self.edge_entries.extend(_copy_entry(entry) for entry in table.edge_entries)
+        self.node_marks.extend((s + node_start, e + node_start, r) for s, e, r in table.node_marks)
+        self.edge_marks.extend((s + edge_start, e + edge_start, r) for s, e, r in table.edge_marks)
+
+    def to_eval_info(self):
+        """
+        Apply the marks and get the eval information as nested dicts, which is what everything else uses
+        :return: eval information, {'nodes': {name: entry}, 'edges': {name: entry}}
+        :rtype: dict
+        """
+        _apply_marks(self.node_entries, self.node_marks)
+        _apply_marks(self.edge_entries, self.edge_marks)
+        self.node_marks = []
+        self.edge_marks = []
+        return {
+            'nodes': dict(zip(self.node_names, self.node_entries)),
+            'edges': dict(zip(self.edge_names, self.edge_entries))
+        }
+
+
+def _copy_entry(entry):
+    # edges that are still reserved don't have an entry yet
+    return None if entry is None else dict(entry)
+
+
+def _apply_marks(entries, marks):
+    # subtree ranges are either nested or separate, and an inner subtree is marked before the one around it,
+    # so whatever is included gets the reason from the innermost mark covering it
+    # (same as marking each subtree's entries as soon as its parent failed)
+    if not marks:
+        return
+    marks = sorted(marks, key=lambda mark: (mark[0], -mark[1]))
+    open_marks = []
+    next_mark = 0
+    for i, entry in enumerate(entries):
+        while open_marks and open_marks[-1][1] <= i:
+            open_marks.pop()
+        while next_mark < len(marks) and marks[next_mark][0] == i:
+            open_marks.append(marks[next_mark])
+            next_mark += 1
+        if open_marks and entry is not None and entry['included'][0]:
+            entry['included'] = open_marks[-1][2]
+
+
 def node_evaluation(node_eval_info):
     node_table = []
     successful_nodes = 0
@@ -75,3 +238,46 @@ def evaluation_summary(eval_info):
                      ["Edges", "Included", included_edges, total_edges, edges_included_coverage]]
 
     return tabulate(summary_table, headers=["Graph Component", "Metric", "Successful", "Total", "Coverage"])
+
+
+
+def write_evaluation_summary(summary_filename, generation_info, full_eval_info):
+    """
+    Write the evaluation summary for a whole batch of graphs
+    :param summary_filename: path to write the summary to (e.g. evaluation_summary.txt)
+    :type summary_filename: str
+    :param generation_info: [# of results, reason, generation status] for each graph
+    :type generation_info: dict
+    :param full_eval_info: node/edge eval information for every graph
+    :type full_eval_info: dict
+    """
+    with open(summary_filename, 'w') as summary_file:
+        summary_file.write("EVALUATION SUMMARY\n\n")
+        # total results per graph
+        generation_table = []
+        graphs_generated_from = 0
+        for g in generation_info:
+            g_info = generation_info[g]
+            # (older entries don't have a status)
+            status = g_info[2] if len(g_info) > 2 and g_info[2] is not None else ""
+            generation_table.append([g, str(g_info[0]), g_info[1], status])
+            if g_info[0] > 0:
+                graphs_generated_from += 1
+
+        total_graphs = len(generation_info)
+        graph_coverage = graphs_generated_from / total_graphs if total_graphs > 0 else 0
+        coverage_table = [[str(graphs_generated_from), str(total_graphs), str(graph_coverage)]]
+
+        summary_file.write(tabulate(coverage_table, headers=["Graphs Generated From", "Total Graphs", "Graph Coverage"]))
+        summary_file.write("\n\n")
+        summary_file.write(tabulate(sorted(generation_table, key=lambda x: x[0]), headers=["Graph Name", "Results", "Reason", "Status"]))
+        summary_file.write("\n\n")
+
+        # total node/edge coverage
+        summary_file.write(evaluation_summary(full_eval_info))
+
+        # node/edge information
+        summary_file.write("\n\n")
+        summary_file.write(node_evaluation(full_eval_info['nodes']))
+        summary_file.write("\n\n")
+        summary_file.write(edge_evaluation(full_eval_info['edges']))
@@ -0,0 +1,203 @@
+# Cache of what ACE generated from each MRS, so the same MRS isn't sent to ACE again (in this run or a later one)
+# MRSs are keyed by their canonical form (see mrs_util.canonical_mrs), so isomorphic MRSs that only got different
+# variable names (e.g. from idApple1 and idApple2, which regularize to the same thing) share an entry,
+# along with the grammar image and the ACE arguments, since either of those changing changes what's generated
+# Recently used entries are kept in memory, and everything is kept in an SQLite database in the cache directory
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from delphin import interface
+import POGG.ace_pool
+import POGG.config
+import POGG.mrs_util
+
+# bump if what gets written to the cache changes
+GENERATION_CACHE_VERSION = 2
+GENERATION_CACHE_FILENAME = "generations.sqlite3"
+
+
+def cache_path(cache_dir):
+    """
+    Get the path of the generation cache database in a cache directory
+    :param cache_dir: directory for on-disk caches (see config.cache_directory)
+    :type cache_dir: str
+    :return: path to the database
+    :rtype: str
+    """
+    return os.path.join(cache_dir, GENERATION_CACHE_FILENAME)
+
+
+class GenerationCache:
+    """
+    Generation results by MRS, in memory (the most recently used `size` entries) and optionally on disk
+    The database is only opened the first time it's used, and opened again in a process forked after that,
+    so a cache can be made before worker processes are started
+    """
+    def __init__(self, path=None, size=1024):
+        """
+        :param path: path to the SQLite database (see cache_path), only cached in memory if None
+        :type path: str
+        :param size: number of entries kept in memory
+        :type size: int
+        """
+        self.path = path
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+        # grammar path -> stamp, so the image is only checked once
+        self._grammar_stamps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self._memory)
+
+    def key(self, mrs_string, grammar, cmdargs):
+        """
+        Get the cache key for generating from an MRS
+        :param mrs_string: MRS string to generate from
+        :type mrs_string: str
+        :param grammar: path to the compiled grammar image
+        :type grammar: str
+        :param cmdargs: command line arguments for ACE
+        :type cmdargs: list
+        :return: hex digest
+        :rtype: str
+        """
+        stamp = self._grammar_stamps.get(grammar)
+        if stamp is None:
+            stamp = self._grammar_stamps[grammar] = grammar_stamp(grammar)
+        key = [GENERATION_CACHE_VERSION, stamp, list(cmdargs), POGG.mrs_util.canonical_mrs(mrs_string)]
+        return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Get the results cached for a key
+        :param key: key from key()
+        :type key: str
+        :return: generation results, with the status they were generated with (None if there aren't any cached)
+        :rtype: POGG.ace_pool.GenerationResults
+        """
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = None
+                connection = self._connect()
+                if connection is not None:
+                    try:
+                        row = connection.execute("SELECT results FROM generations WHERE key = ?", (key,)).fetchone()
+                    except sqlite3.Error as e:
+                        print("Couldn't read generation cache {}: {}".format(self.path, e))
+                if row is not None:
+                    cached = json.loads(row[0])
+                    self._remember(key, cached)
+            if cached is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # fresh copies, so nothing that changes the results it's given changes the cache
+        return POGG.ace_pool.GenerationResults([interface.Result(r) for r in cached['results']], cached['status'])
+
+    def put(self, key, results, status=None):
+        """
+        Cache the results for a key
+        :param key: key from key()
+        :type key: str
+        :param results: generation results
+        :type results: list
+        :param status: GENERATION_* status of the request the results came from (GENERATION_OK if None)
+        :type status: str
+        """
+        if status is None:
+            status = POGG.ace_pool.GENERATION_OK
+        cached = {'results': [dict(r) for r in results], 'status': status}
+        with self._lock:
+            self._remember(key, cached)
+            connection = self._connect()
+            if connection is not None:
+                # a cache that can't be written just means generating again next time
+                try:
+                    with connection:
+                        connection.execute("INSERT OR REPLACE INTO generations (key, results) VALUES (?, ?)",
+                                           (key, json.dumps(cached, default=str)))
+                except sqlite3.Error as e:
+                    print("Couldn't write generation cache {}: {}".format(self.path, e))
+
+    def close(self):
+        """
+        Close the database, it's opened again if the cache is used afterwards
+        """
+        with self._lock:
+            if self._connection is not None and self._connection_pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def _remember(self, key, cached):
+        self._memory[key] = cached
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def _connect(self):
+        if self.path is None:
+            return None
+        # a connection opened before a fork belongs to the parent process
+        if self._connection is None or self._connection_pid != os.getpid():
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # several worker processes can share the database, so wait for each other's writes
+                connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                with connection:
+                    connection.execute("CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, results TEXT)")
+            except (OSError, sqlite3.Error) as e:
+                print("Couldn't open generation cache {}: {}".format(self.path, e))
+                self.path = None
+                return None
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+
+def grammar_stamp(grammar):
+    """
+    Get a stamp that changes when a grammar image is recompiled
+    :param grammar: path to the compiled grammar image
+    :type grammar: str
+    :return: absolute path, mtime, and size of the image (None for both if it can't be read)
+    :rtype: list
+    """
+    # a recompiled image will (almost certainly) have a new mtime or size, and hashing the whole image would take a while
+    try:
+        stat = os.stat(grammar)
+        return [os.path.abspath(grammar), stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        return [os.path.abspath(grammar), None, None]
+
+
+def from_global_config():
+    """
+    Make the generation cache the global config asks for (cache_generations, generation_cache_size),
+    kept in the cache directory (see config.cache_directory)
+    :return: generation cache (None if cache_generations isn't set)
+    :rtype: GenerationCache
+    """
+    config = POGG.config.load_global_config()
+    if not config.get('cache_generations', False):
+        return None
+    return GenerationCache(cache_path(POGG.config.cache_directory()), size=config.get('generation_cache_size', 1024))
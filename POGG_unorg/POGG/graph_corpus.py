@@ -0,0 +1,397 @@
+# Packing a directory of .dot graphs into one binary file, so the same graphs don't have to be parsed again every run
+# The pack sits next to the .dot files, and every graph in it is checked against its .dot file before it's used,
+# so an edited (or new) .dot file is read from the .dot file until the corpus is packed again
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import POGG.graph_util
+
+CORPUS_FILENAME = "graphs.poggpack"
+CORPUS_MAGIC = b"POGGPACK"
+# bump if the layout of the pack changes
+CORPUS_VERSION = 1
+# magic, version, # strings, where the string offsets start, where the string data starts, where the index starts,
+# and how long the index is
+_HEADER = struct.Struct("<8sIIQQQQ")
+# string id for "no string" (e.g. a graph with no name)
+_NO_STRING = 0xFFFFFFFF
+# each graph is stored as one run of uint32 words:
+# directed, name, # nodes, # edges, # node attributes, # edge attributes,
+# node names, edge sources, edge destinations (as node indices),
+# then (node index, key, value) for each node attribute and (edge index, key, value) for each edge attribute
+_RECORD_HEADER_WORDS = 6
+
+# corpora already opened by read_graph in this process, by graph directory
+_open_corpora = {}
+_open_corpora_lock = threading.Lock()
+
+
+def corpus_path(graph_directory):
+    """
+    Get the path of the pack for a graph directory
+    :param graph_directory: directory containing .dot files
+    :type graph_directory: str
+    :return: path to the pack
+    :rtype: str
+    """
+    return os.path.join(graph_directory, CORPUS_FILENAME)
+
+
+def _graph_name(graph_path):
+    # same name the batch tools use for a graph, e.g. graph0 for graph0.dot
+    return os.path.splitext(os.path.basename(graph_path))[0]
+
+
+def _file_stamp(path):
+    # edited files will (almost certainly) have a new mtime or size
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def pack_corpus(graph_directory, path=None):
+    """
+    Pack every .dot file in a directory into one binary file
+    Files the native reader can't handle (see graph_util.read_dot) are only listed in the index,
+    and are still read from their .dot files
+    :param graph_directory: directory containing .dot files
+    :type graph_directory: str
+    :param path: where to write the pack (next to the .dot files if None)
+    :type path: str
+    :return: path to the pack
+    :rtype: str
+    """
+    if path is None:
+        path = corpus_path(graph_directory)
+
+    strings = {}
+
+    def intern(string):
+        string_id = strings.get(string)
+        if string_id is None:
+            string_id = len(strings)
+            strings[string] = string_id
+        return string_id
+
+    records = bytearray(_HEADER.size)
+    index = {}
+    for graph_path in sorted(POGG.graph_util.list_graph_files(graph_directory)):
+        # stamp first, so a file that's changed while it's read just looks out of date later on
+        entry = {'file': os.path.basename(graph_path), 'stamp': _file_stamp(graph_path), 'offset': None, 'length': 0}
+        index[_graph_name(graph_path)] = entry
+        with open(graph_path) as dot_file:
+            data = dot_file.read()
+        try:
+            statements = POGG.graph_util.read_dot_statements(data)
+        except POGG.graph_util.UnsupportedDot:
+            continue
+        words = _encode_graph(statements, intern)
+        entry['offset'] = len(records)
+        entry['length'] = len(words) * words.itemsize
+        records.extend(words.tobytes())
+
+    # string table: offsets (one more than the # of strings, so each string ends where the next starts), then the text
+    string_data = bytearray()
+    string_offsets = _words()
+    for string in strings:
+        string_offsets.append(len(string_data))
+        string_data.extend(string.encode('utf-8'))
+    string_offsets.append(len(string_data))
+
+    string_offsets_start = len(records)
+    records.extend(string_offsets.tobytes())
+    string_data_start = len(records)
+    records.extend(string_data)
+    index_start = len(records)
+    # only file names go in the index, so the pack still works after its directory is copied or moved
+    index_data = json.dumps({'graphs': index}).encode('utf-8')
+    records.extend(index_data)
+    records[:_HEADER.size] = _HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, len(strings), string_offsets_start,
+                                          string_data_start, index_start, len(index_data))
+
+    # write somewhere else first, so nothing ever sees half a pack
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, 'wb') as pack_file:
+        pack_file.write(records)
+    os.replace(temp_path, path)
+    return path
+
+
+def _words(values=()):
+    # array of uint32 (little-endian once it's gone through _to_little_endian)
+    return array.array('I', values)
+
+
+def _to_little_endian(words):
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+
+def _encode_graph(statements, intern):
+    directed, name, nodes, edges = statements
+    # nodes that are only in edges are added after the declared ones, same as building the graph does
+    node_indices = {}
+    for node in nodes:
+        node_indices.setdefault(node, len(node_indices))
+    for source, destination, _ in edges:
+        node_indices.setdefault(source, len(node_indices))
+        node_indices.setdefault(destination, len(node_indices))
+
+    node_attributes = [(node_indices[node], intern(key), intern(value))
+                       for node, attributes in nodes.items() for key, value in attributes.items()]
+    edge_attributes = [(i, intern(key), intern(value))
+                       for i, (_, _, attributes) in enumerate(edges) for key, value in attributes.items()]
+
+    words = _words([int(directed), intern(name) if name != "" else _NO_STRING,
+                    len(node_indices), len(edges), len(node_attributes), len(edge_attributes)])
+    words.extend(intern(node) for node in node_indices)
+    words.extend(node_indices[source] for source, _, _ in edges)
+    words.extend(node_indices[destination] for _, destination, _ in edges)
+    for attribute in node_attributes + edge_attributes:
+        words.extend(attribute)
+    return _to_little_endian(words)
+
+
+class _StringTable(dict):
+    """
+    Strings in a pack by id, each decoded the first time it's used
+    """
+    def __init__(self, data, start, offsets):
+        super().__init__()
+        self._data = data
+        self._start = start
+        self._offsets = offsets
+
+    def __missing__(self, string_id):
+        string = self._data[self._start + self._offsets[string_id]:self._start + self._offsets[string_id + 1]]
+        string = string.decode('utf-8')
+        self[string_id] = string
+        return string
+
+
+class GraphCorpus:
+    """
+    Graphs packed by pack_corpus, loaded one at a time when they're asked for
+    The pack is memory-mapped, so opening it only reads the index, and each graph is only decoded when it's needed
+    """
+    def __init__(self, path):
+        """
+        :param path: path to the pack
+        :type path: str
+        """
+        self.path = path
+        with open(path, 'rb') as pack_file:
+            self._mmap = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, string_count, string_offsets_start, string_data_start, index_start, index_length = \
+                _HEADER.unpack_from(self._mmap)
+            if magic != CORPUS_MAGIC or version != CORPUS_VERSION:
+                raise ValueError("{} isn't a version {} graph corpus".format(path, CORPUS_VERSION))
+            string_offsets = _words()
+            string_offsets.frombytes(self._mmap[string_offsets_start:string_data_start])
+            self._strings = _StringTable(self._mmap, string_data_start, _to_little_endian(string_offsets))
+            index = json.loads(self._mmap[index_start:index_start + index_length].decode('utf-8'))
+        except (struct.error, ValueError):
+            self._mmap.close()
+            raise
+        # the .dot files are the ones next to the pack, wherever it's been copied or moved to
+        self.graph_directory = os.path.dirname(os.path.abspath(path))
+        self._index = index['graphs']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        return self.graph(name)
+
+    def names(self):
+        """
+        Get the names of every graph in the corpus
+        :return: graph names (e.g. graph0 for graph0.dot)
+        :rtype: list
+        """
+        return list(self._index)
+
+    def graph_path(self, name):
+        """
+        Get the path of the .dot file a graph was packed from
+        :param name: graph name
+        :type name: str
+        :return: path to the .dot file
+        :rtype: str
+        """
+        return os.path.join(self.graph_directory, self._index[name]['file'])
+
+    def is_current(self, name):
+        """
+        Check that a graph's .dot file hasn't changed since it was packed
+        :param name: graph name
+        :type name: str
+        :return: True if the packed graph can be used
+        :rtype: bool
+        """
+        try:
+            return self._matches(name, self.graph_path(name))
+        except KeyError:
+            return False
+
+    def _matches(self, name, graph_path):
+        # graph_path is the file the graph was packed from, and hasn't changed since
+        entry = self._index[name]
+        if os.path.basename(graph_path) != entry['file']:
+            return False
+        try:
+            return _file_stamp(graph_path) == entry['stamp']
+        except OSError:
+            return False
+
+    def is_stale(self):
+        """
+        Check whether the corpus needs packing again, i.e. .dot files have been added, removed, or changed
+        :return: True if the corpus is out of date
+        :rtype: bool
+        """
+        try:
+            graph_paths = POGG.graph_util.list_graph_files(self.graph_directory)
+        except OSError:
+            return True
+        if {_graph_name(p) for p in graph_paths} != set(self._index):
+            return True
+        return not all(self.is_current(name) for name in self._index)
+
+    def graph(self, name):
+        """
+        Load one graph, the same graph graph_util.read_dot gives for its .dot file
+        Graphs that weren't packed, or whose .dot file has changed since, are read from the .dot file
+        :param name: graph name
+        :type name: str
+        :return: graph
+        :rtype: MultiDiGraph
+        """
+        return self.read(self.graph_path(name))
+
+    def read(self, graph_path):
+        """
+        Load the graph for a .dot file, from the pack if the file was packed and hasn't changed since,
+        otherwise from the .dot file itself
+        :param graph_path: path to the .dot file
+        :type graph_path: str
+        :return: graph
+        :rtype: MultiDiGraph
+        """
+        name = _graph_name(graph_path)
+        entry = self._index.get(name)
+        if entry is None or entry['offset'] is None or not self._matches(name, graph_path):
+            return POGG.graph_util.read_dot(graph_path)
+        words = _words()
+        words.frombytes(self._mmap[entry['offset']:entry['offset'] + entry['length']])
+        return self._decode_graph(_to_little_endian(words))
+
+    def _decode_graph(self, words):
+        strings = self._strings
+        directed, name_id, node_count, edge_count, node_attribute_count, edge_attribute_count = \
+            words[:_RECORD_HEADER_WORDS]
+        position = _RECORD_HEADER_WORDS
+        node_names = [strings[s] for s in words[position:position + node_count]]
+        position += node_count
+        sources = words[position:position + edge_count]
+        position += edge_count
+        destinations = words[position:position + edge_count]
+        position += edge_count
+
+        # nodes are stored in the order they ended up in the graph, so adding them all before the edges keeps that order
+        nodes = {node: {} for node in node_names}
+        for i in range(position, position + 3 * node_attribute_count, 3):
+            nodes[node_names[words[i]]][strings[words[i + 1]]] = strings[words[i + 2]]
+        position += 3 * node_attribute_count
+        edges = [(node_names[s], node_names[d], {}) for s, d in zip(sources, destinations)]
+        for i in range(position, position + 3 * edge_attribute_count, 3):
+            edges[words[i]][2][strings[words[i + 1]]] = strings[words[i + 2]]
+
+        name = "" if name_id == _NO_STRING else strings[name_id]
+        return POGG.graph_util.graph_from_statements(bool(directed), name, nodes, edges)
+
+    def close(self):
+        """
+        Close the memory-mapped pack
+        """
+        self._mmap.close()
+
+
+def open_corpus(graph_directory, path=None, repack=True):
+    """
+    Open the pack for a graph directory, packing it first if there isn't one or it's out of date
+    :param graph_directory: directory containing .dot files
+    :type graph_directory: str
+    :param path: path to the pack (next to the .dot files if None)
+    :type path: str
+    :param repack: whether to pack again if the corpus is missing or out of date
+    :type repack: bool
+    :return: corpus
+    :rtype: GraphCorpus
+    """
+    if path is None:
+        path = corpus_path(graph_directory)
+    corpus = None
+    try:
+        corpus = GraphCorpus(path)
+    except (OSError, ValueError, struct.error):
+        if not repack:
+            raise
+    if repack and (corpus is None or corpus.is_stale()):
+        if corpus is not None:
+            corpus.close()
+        corpus = GraphCorpus(pack_corpus(graph_directory, path))
+    return corpus
+
+
+def read_graph(graph_path):
+    """
+    Read a graph, from its directory's pack if there is one and the graph hasn't changed since it was packed,
+    otherwise from the .dot file (see graph_util.read_dot)
+    :param graph_path: path to the .dot file
+    :type graph_path: str
+    :return: graph
+    :rtype: MultiDiGraph
+    """
+    graph_directory = os.path.dirname(os.path.abspath(graph_path))
+    with _open_corpora_lock:
+        if graph_directory not in _open_corpora:
+            try:
+                _open_corpora[graph_directory] = GraphCorpus(corpus_path(graph_directory))
+            except (OSError, ValueError, struct.error):
+                _open_corpora[graph_directory] = None
+        corpus = _open_corpora[graph_directory]
+    if corpus is None:
+        return POGG.graph_util.read_dot(graph_path)
+    return corpus.read(graph_path)
+
+
+def close_corpora():
+    """
+    Close every corpus opened by read_graph (e.g. after packing again, so the new packs are picked up)
+    """
+    with _open_corpora_lock:
+        for corpus in _open_corpora.values():
+            if corpus is not None:
+                corpus.close()
+        _open_corpora.clear()
+
+
+if __name__ == '__main__':
+    # python -m POGG.graph_corpus GRAPH_DIRECTORY [GRAPH_DIRECTORY ...]
+    for directory in sys.argv[1:]:
+        print("Packed {}".format(pack_corpus(directory)))
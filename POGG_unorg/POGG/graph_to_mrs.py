@@ -1,8 +1,13 @@
 # CONVERTING GRAPH TO MRS
 # ORGANIZED: 01/04/2024
 # DOCUMENTED: 01/04/2024
+import hashlib
 import json
 import re
+import POGG.composition_library
+import POGG.config
+import POGG.evaluation
+import POGG.mrs_algebra
 import POGG.semantic_constructions.base
 import POGG.data_regularization
 
@@ -13,22 +18,441 @@ import POGG.data_regularization
 #   PARENT_HOLE: parent (hole) -> hole (plug) ... photos --(of)--> cake
 #   PARENT_PLUG: parent (plug) -> child (hole) ... apple --(color)--> red
 #   EDGE_PRED_PARENT_CHILD: parent (ARG1) -> child (ARG2) + edge predicate ... cookie --(on)--> plate
-COMPOSITION_TYPES = json.load(open("../config_data/comp_to_graph_relations.json"))
+COMPOSITION_TYPES = POGG.config.load_composition_types()
 
+# patterns for guessing the part of speech of a predicate label, tried in order,
+# along with the composition_library function that creates the basic SSEMENT for it
+POS_PATTERNS = [
+    # noun
+    (re.compile(r'_[A-z]+_n_[0-z]+$'), 'noun_ssement'),
+    # adjective
+    (re.compile(r'_[A-z\-]+_a_[0-z]+$'), 'adjective_ssement'),
+    # verb
+    (re.compile(r'_[A-z]+_v_[0-z]$'), 'verb_ssement'),
+    # quantifier
+    (re.compile(r'_[A-z]+_q$'), 'quant_ssement'),
+    # preposition
+    (re.compile(r'_[A-z]+_p(_loc)*$'), 'preposition_ssement')
+]
+# if no guess, do basic_ssement, assuming ARG0 as INDEX
+DEFAULT_POS_FUNCTION = 'basic'
+# node text that looks like an ERG predicate is used as the predicate label instead of being looked up in the lexicon
+ERG_PREDICATE_PATTERN = re.compile("^_?[0-z-]+_[0-z]+_[0-z]+$")
 
-def load_lexicon(lexicon_filename):
+# predicate label -> composition_library function name, so each predicate is only classified once per process
+_pos_functions = {}
+
+
+def load_lexicon(lexicon_filename, compiled=False):
     """
     Load the lexicon given a filename
     :param lexicon_filename: filename fo the lexicon
     :type lexicon_filename: str
-    :return: lexicon in json format
+    :param compiled: if True, compile the lexicon so nodes/edges are looked up instead of worked out every time
+    :type compiled: bool
+    :return: lexicon in json format (a CompiledLexicon if compiled)
     :rtype: dict
     """
     lexicon_file = open(lexicon_filename)
     lexicon = json.load(lexicon_file)
+    if compiled:
+        lexicon = CompiledLexicon(lexicon)
     return lexicon
 
 
+def lexicon_fingerprint(lexicon):
+    """
+    Get a hash of the lexicon's contents, which changes whenever any entry does
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :return: hex digest
+    :rtype: str
+    """
+    if isinstance(lexicon, CompiledLexicon):
+        return lexicon.fingerprint
+    return hashlib.sha1(json.dumps(lexicon, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CompiledLexicon(dict):
+    """
+    Lexicon that's been worked through once up front, so converting a node or edge is just a dict lookup
+    Every entry is compiled into a (function, arguments) pair with the composition_library functions already looked up
+    (and the composition type already decided), instead of doing all of that in node_to_mrs/edge_to_mrs for every node.
+    Anything wrong with an entry is collected in problems when the lexicon is compiled, and using that entry still fails
+    with the same error node_to_mrs/edge_to_mrs would have given.
+    It's still the original lexicon dict as well, but it shouldn't be changed after it's compiled
+    """
+    def __init__(self, lexicon):
+        """
+        :param lexicon: lexicon with node to ERG predicate label mappings
+        :type lexicon: dict
+        """
+        super().__init__(lexicon)
+        self.fingerprint = hashlib.sha1(json.dumps(lexicon, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        # node/edge key -> (function, arguments)
+        self.nodes = {}
+        self.edges = {}
+        # descriptions of every entry that can't be used
+        self.problems = []
+
+        for lexicon_type in ('entityTypes', 'propertyValues'):
+            for node in self.get(lexicon_type, {}):
+                # entityTypes are looked up first, so those win if a key is in both
+                if node in self.nodes:
+                    continue
+                entry = self._compile_node(node, set())
+                self.nodes[node] = entry
+                if entry[0] is _raise_node_error:
+                    self.problems.append("{} '{}': {}".format(lexicon_type, node, entry[1][1]))
+
+        for edge in self.get('properties', {}):
+            entry = self._compile_edge(edge)
+            self.edges[edge] = entry
+            if entry[0] is _raise_edge_error:
+                self.problems.append("properties '{}': {}".format(edge, entry[1][1]))
+
+    def __reduce__(self):
+        # the compiled entries hold functions, so just send the lexicon and compile it again (e.g. for worker processes)
+        return CompiledLexicon, (dict(self),)
+
+    def node_mrs(self, node, variables):
+        """
+        Create MRS for individual node (see node_to_mrs)
+        :param node: node text
+        :type node: str
+        :param variables: dict of variables and values, if you need to constrain them (e.g. NUM=sg)
+        :type variables: dict
+        :return: SSEMENT for the node
+        :rtype: SSEMENT
+        """
+        entry = self.nodes.get(node)
+        if entry is None:
+            # not in the lexicon, (e.g. it's an ERG predicate or a missing key), so only work it out once
+            entry = self._compile_node(node, set())
+            self.nodes[node] = entry
+        function, arguments = entry
+        return function(variables, *arguments)
+
+    def edge_mrs(self, parent, child, edge):
+        """
+        Compose MRS between parent and child (see edge_to_mrs)
+        :param parent: parent SSEMENT
+        :type parent: SSEMENT
+        :param child: child SSEMENT
+        :type child: SSEMENT
+        :param edge: edge text
+        :type edge: str
+        :return: composed SSEMENT
+        :rtype: SSEMENT
+        """
+        entry = self.edges.get(edge)
+        if entry is None:
+            raise KeyError("Can't find '{}' as a key in the lexicon".format(edge))
+        function, arguments = entry
+        return function(parent, child, *arguments)
+
+    def _compile_node(self, node, seen):
+        # same steps as node_to_mrs, but any error is turned into an entry that raises it
+        if isinstance(node, dict) or ERG_PREDICATE_PATTERN.match(node):
+            node_json = node
+        elif node in self.get('entityTypes', {}):
+            node_json = self['entityTypes'][node]
+        elif node in self.get('propertyValues', {}):
+            node_json = self['propertyValues'][node]
+        else:
+            return _raise_node_error, (KeyError, "Can't find '{}' as a key in the lexicon".format(node))
+
+        if node_json == "":
+            return _raise_node_error, (ValueError, "'{}' has no value in the lexicon".format(node))
+        elif isinstance(node_json, str):
+            constructor, error = _library_function(_guess_constructor_name(node_json))
+            if error:
+                return _raise_node_error, error
+            return _node_from_predicate, (constructor, node_json)
+
+        # compositional node, the head and modifier are worked out first so their errors come first
+        if not isinstance(node, dict):
+            if node in seen:
+                return _raise_node_error, (ValueError, "'{}' refers back to itself in the lexicon".format(node))
+            seen = seen | {node}
+        try:
+            head, modifier = node_json['predicates']['head'], node_json['predicates']['modifier']
+            comp_rule_name = node_json['composition']
+        except (KeyError, TypeError) as error:
+            return _raise_node_error, (type(error), str(error))
+        head_entry = self._compile_node(head, seen)
+        if head_entry[0] is _raise_node_error:
+            return head_entry
+        modifier_entry = self._compile_node(modifier, seen)
+        if modifier_entry[0] is _raise_node_error:
+            return modifier_entry
+
+        composition_types = COMPOSITION_TYPES.get(comp_rule_name)
+        if composition_types is None:
+            message = "Can't find '{}' as a key in comp_to_graph_relations.json".format(comp_rule_name)
+            return _raise_node_error, (KeyError, message)
+        if 'HEAD_FIRST_NODE' in composition_types:
+            head_first = True
+        elif 'HEAD_SECOND_NODE' in composition_types:
+            head_first = False
+        else:
+            return _raise_node_error, (ValueError, "No legitimate composition type for {}".format(comp_rule_name))
+        comp_rule, error = _library_function(comp_rule_name)
+        if error:
+            return _raise_node_error, error
+        return _node_from_parts, (comp_rule, head_first, head_entry, modifier_entry)
+
+    def _compile_edge(self, edge):
+        # same steps as edge_to_mrs, but any error is turned into an entry that raises it
+        edge_json = self['properties'][edge]
+        if edge_json == '':
+            return _raise_edge_error, (ValueError, "'{}' has no value in lexicon".format(edge))
+        try:
+            edge_composition = edge_json if isinstance(edge_json, str) else edge_json['composition']
+        except (KeyError, TypeError) as error:
+            return _raise_edge_error, (type(error), str(error))
+
+        composition_types = COMPOSITION_TYPES.get(edge_composition)
+        if composition_types is None:
+            message = "Can't find '{}' as a key in comp_to_graph_relations.json".format(edge_composition)
+            return _raise_edge_error, (KeyError, message)
+
+        if 'PARENT_HOLE' in composition_types or 'PARENT_PLUG' in composition_types:
+            comp_rule, error = _library_function(edge_json)
+            if error:
+                return _raise_edge_error, error
+            return _edge_without_predicate, (comp_rule, 'PARENT_HOLE' in composition_types)
+        elif 'EDGE_PRED_PARENT_CHILD' in composition_types:
+            try:
+                edge_pred = edge_json["property_predicate"]["predicate_label"]
+                edge_ssement_type = edge_json["property_predicate"]["predicate_type"]
+                comp_rule_name = edge_json["composition"]
+            except (KeyError, TypeError) as error:
+                return _raise_edge_error, (type(error), str(error))
+            comp_rule, error = _library_function(comp_rule_name)
+            if error:
+                return _raise_edge_error, error
+            edge_ssement_rule, error = _library_function(edge_ssement_type)
+            if error:
+                return _raise_edge_error, error
+            return _edge_with_predicate, (comp_rule, edge_ssement_rule, edge_pred)
+        else:
+            return _raise_edge_error, (ValueError, "No legitimate composition type for {}".format(edge_composition))
+
+
+def _library_function(name):
+    # (function, None) from composition_library, or (None, (error class, message)) if it isn't there
+    try:
+        return getattr(POGG.composition_library, name), None
+    except (AttributeError, TypeError) as error:
+        return None, (type(error), str(error))
+
+
+def _node_from_predicate(variables, constructor, pred_label):
+    return constructor(pred_label, variables)
+
+
+def _node_from_parts(variables, comp_rule, head_first, head_entry, modifier_entry):
+    head_mrs = head_entry[0]({}, *head_entry[1])
+    nonhead_mrs = modifier_entry[0]({}, *modifier_entry[1])
+    if head_first:
+        return comp_rule(head_mrs, nonhead_mrs)
+    return comp_rule(nonhead_mrs, head_mrs)
+
+
+def _raise_node_error(variables, error_class, message):
+    raise error_class(message)
+
+
+def _edge_without_predicate(parent, child, comp_rule, parent_is_functor):
+    # see parent_hole_composition and parent_plug_composition
+    if parent_is_functor:
+        return comp_rule(parent, child)
+    return comp_rule(child, parent)
+
+
+def _edge_with_predicate(parent, child, comp_rule, edge_ssement_rule, edge_pred):
+    # see edge_predicate
+    return comp_rule(edge_ssement_rule(edge_pred), parent, child)
+
+
+def _raise_edge_error(parent, child, error_class, message):
+    raise error_class(message)
+
+
+class SubtreeMemo:
+    """
+    Memo of the subtrees already composed for one graph, for nodes that are reachable from more than one parent
+    Instead of composing the subtree again for every path to the node, the stored SSEMENT is copied with fresh
+    variables (mrs_algebra.alpha_rename) and its eval information is renumbered to follow on from the current counters,
+    so every path still gets its own MRS and its own eval entries, just like without the memo
+    Entries are keyed on the node and a fingerprint of the lexicon, so they're never reused under a different lexicon
+    """
+    def __init__(self, graph, lexicon, lexicon_version=None):
+        """
+        :param graph: graph the memo is for
+        :type graph: DiGraph
+        :param lexicon: lexicon the graph is being converted with
+        :type lexicon: dict
+        :param lexicon_version: fingerprint of the lexicon, if it's already known (see lexicon_fingerprint)
+        :type lexicon_version: str
+        """
+        self.graph = graph
+        self.lexicon_version = lexicon_fingerprint(lexicon) if lexicon_version is None else lexicon_version
+        # (node, lexicon version) -> (SSEMENT, EvalTable, start node count, # nodes, start edge count, # edges)
+        self._entries = {}
+        # (node, lexicon version) -> on_node/on_edge calls made while composing the subtree (see graph_to_mrs)
+        self._hook_calls = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def store(self, node, subtree_mrs, eval_table, node_start, node_count, edge_start, edge_count, hook_calls=None):
+        """
+        Store the result of composing a subtree
+        :param node: root of the subtree
+        :type node: str
+        :param subtree_mrs: composed SSEMENT for the subtree (None if composition failed)
+        :type subtree_mrs: SSEMENT
+        :param eval_table: eval table for just the subtree (see EvalTable.subtree), which is kept as is
+        :type eval_table: EvalTable
+        :param node_start: node counter before the subtree
+        :type node_start: int
+        :param node_count: node counter after the subtree
+        :type node_count: int
+        :param edge_start: edge counter before the subtree
+        :type edge_start: int
+        :param edge_count: edge counter after the subtree
+        :type edge_count: int
+        :param hook_calls: hook calls made while composing the subtree, positioned within its eval table
+        (only kept if hooks were passed to graph_to_mrs)
+        :type hook_calls: list
+        """
+        if hook_calls is not None:
+            self._hook_calls[(node, self.lexicon_version)] = hook_calls
+        # the composed SSEMENT can be changed in place later on (e.g. update_index), so keep a snapshot of it
+        if subtree_mrs is not None:
+            subtree_mrs = subtree_mrs.snapshot()
+        self._entries[(node, self.lexicon_version)] = (subtree_mrs, eval_table,
+                                                       node_start, node_count - node_start,
+                                                       edge_start, edge_count - edge_start)
+
+    def reuse(self, node, node_count, edge_count):
+        """
+        Get a fresh copy of an already composed subtree, numbered as if it had just been composed
+        :param node: root of the subtree
+        :type node: str
+        :param node_count: current node counter
+        :type node_count: int
+        :param edge_count: current edge counter
+        :type edge_count: int
+        :return: tuple of SSEMENT, eval table, node counter, and edge counter (None if it hasn't been composed yet)
+        :rtype: tuple
+        """
+        entry = self._entries.get((node, self.lexicon_version))
+        if entry is None:
+            return None
+        subtree_mrs, eval_table, node_start, node_span, edge_start, edge_span = entry
+
+        new_eval_table = POGG.evaluation.EvalTable()
+        new_eval_table.extend(eval_table,
+                              lambda n: _renumber(n, node_start, node_count),
+                              lambda e: _renumber(e, edge_start, edge_count))
+        new_mrs = None if subtree_mrs is None else POGG.mrs_algebra.alpha_rename(subtree_mrs)
+        return new_mrs, new_eval_table, node_count + node_span, edge_count + edge_span
+
+    def reuse_hook_calls(self, node, node_count, edge_count):
+        """
+        Get the hook calls made while composing a subtree, with their eval names numbered the same way reuse numbers
+        the eval table
+        :param node: root of the subtree
+        :type node: str
+        :param node_count: current node counter
+        :type node_count: int
+        :param edge_count: current edge counter
+        :type edge_count: int
+        :return: list of ('node'/'edge', position in the subtree's eval table, hook arguments minus the eval entry)
+        :rtype: list
+        """
+        key = (node, self.lexicon_version)
+        _, _, node_start, _, edge_start, _ = self._entries[key]
+        hook_calls = []
+        for kind, index, arguments in self._hook_calls.get(key, ()):
+            if kind == 'node':
+                graph_node, eval_name, node_mrs = arguments
+                arguments = (graph_node, _renumber(eval_name, node_start, node_count), node_mrs)
+            else:
+                parent, child, eval_name, composed_mrs = arguments
+                arguments = (parent, child, _renumber(eval_name, edge_start, edge_count), composed_mrs)
+            hook_calls.append((kind, index, arguments))
+        return hook_calls
+
+
+def _renumber(eval_name, old_start, new_start):
+    # eval names look like "red_3", shift the counter so it follows on from new_start
+    name, count = eval_name.rsplit('_', 1)
+    return "{}_{}".format(name, int(count) - old_start + new_start)
+
+
+def _guess_constructor_name(pred_label):
+    # name of the composition_library function that creates the basic SSEMENT for a predicate label
+    function_name = _pos_functions.get(pred_label)
+    if function_name is None:
+        function_name = DEFAULT_POS_FUNCTION
+        for pattern, pos_function in POS_PATTERNS:
+            if pattern.match(pred_label):
+                function_name = pos_function
+                break
+        _pos_functions[pred_label] = function_name
+    return function_name
+
+
+def classify_predicates(pred_labels):
+    """
+    Guess the part of speech of many predicate labels at once, e.g. ahead of a batch
+    :param pred_labels: predicate labels
+    :type pred_labels: Iterable
+    :return: dict of predicate label to the composition_library function that creates its basic SSEMENT
+    :rtype: dict
+    """
+    return {pred_label: _guess_constructor_name(pred_label) for pred_label in pred_labels}
+
+
+def classify_lexicon(lexicon):
+    """
+    Guess the part of speech of every predicate label in a lexicon that node_to_mrs would have to guess
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :return: dict of predicate label to the composition_library function that creates its basic SSEMENT
+    :rtype: dict
+    """
+    pred_labels = []
+    to_visit = list(lexicon.get('entityTypes', {}).values()) + list(lexicon.get('propertyValues', {}).values())
+    while to_visit:
+        value = to_visit.pop()
+        if isinstance(value, dict):
+            for part in value.get('predicates', {}).values():
+                # heads/modifiers that don't look like predicates are other lexicon keys, which get visited anyway
+                if isinstance(part, dict) or ERG_PREDICATE_PATTERN.match(part):
+                    to_visit.append(part)
+        elif isinstance(value, str) and value != "":
+            pred_labels.append(value)
+    return classify_predicates(pred_labels)
+
+
+def classify_SEMI_predicates(SEMI=None):
+    """
+    Guess the part of speech of every predicate in the SEMI, so nothing the grammar knows about is guessed mid-batch
+    :param SEMI: SEMI to take the predicates from (the grammar's SEMI if None)
+    :type SEMI: delphin.semi.SemI
+    :return: dict of predicate label to the composition_library function that creates its basic SSEMENT
+    :rtype: dict
+    """
+    if SEMI is None:
+        SEMI = POGG.config.get_SEMI()
+    return classify_predicates(SEMI.predicates)
+
+
 def guess_pos_and_create_ssement(pred_label, variables={}):
     """
     Given a predicate label, guess the part of speech and then generate the basic SSEMENT
@@ -39,24 +463,7 @@ def guess_pos_and_create_ssement(pred_label, variables={}):
     :return: basic SSEMENT
     :rtype: SSEMENT
     """
-    # noun
-    if re.match('_[A-z]+_n_[0-z]+$', pred_label):
-        return POGG.composition_library.noun_ssement(pred_label, variables)
-    # adjective
-    elif re.match('_[A-z\-]+_a_[0-z]+$', pred_label):
-        return POGG.composition_library.adjective_ssement(pred_label, variables)
-    # verb
-    elif re.match('_[A-z]+_v_[0-z]$', pred_label):
-        return POGG.composition_library.verb_ssement(pred_label, variables)
-    # quantifier
-    elif re.match('_[A-z]+_q$', pred_label):
-        return POGG.composition_library.quant_ssement(pred_label, variables)
-    # preposition
-    elif re.match('_[A-z]+_p(_loc)*$', pred_label):
-        return POGG.composition_library.preposition_ssement(pred_label, variables)
-    # if no guess, do basic_ssement, assuming ARG0 as INDEX
-    else:
-        return POGG.composition_library.basic(pred_label, variables)
+    return getattr(POGG.composition_library, _guess_constructor_name(pred_label))(pred_label, variables)
 
 
 def parent_hole_composition(parent, child, edge_rule):
@@ -149,6 +556,10 @@ def node_to_mrs(node, lexicon, variables={}):
         :return: SSEMENT for the node
         :rtype: SSEMENT
         """
+    # a compiled lexicon has already worked all of this out
+    if isinstance(lexicon, CompiledLexicon) and not isinstance(node, dict):
+        return lexicon.node_mrs(node, variables)
+
     # get ERG predicate
     # might involve compounds or synonyms
 
@@ -156,7 +567,7 @@ def node_to_mrs(node, lexicon, variables={}):
     # TODO: bro this is sooooo bad oh my god, FIX LATER FR
     # ... it's possibly a recursive call, in which case node is already a dict ...
     # ... or if it LOOKS like an ERG predicate ...
-    if isinstance(node, dict) or re.match("^_?[0-z-]+_[0-z]+_[0-z]+$", node):
+    if isinstance(node, dict) or ERG_PREDICATE_PATTERN.match(node):
         node_json = node
     else:
         try:
@@ -184,7 +595,7 @@ def node_to_mrs(node, lexicon, variables={}):
         try:
             composition_types = COMPOSITION_TYPES[comp_rule_name]
         except KeyError:
-            raise KeyError("Can't find '{}' as a key in comp_to_graph_relations.json")
+            raise KeyError("Can't find '{}' as a key in comp_to_graph_relations.json".format(comp_rule_name))
 
         try:
             if 'HEAD_FIRST_NODE' in composition_types:
@@ -211,6 +622,10 @@ def edge_to_mrs(parent, child, edge, lexicon):
     :return: composed SSEMENT
     :rtype: SSEMENT
     """
+    # a compiled lexicon has already worked all of this out
+    if isinstance(lexicon, CompiledLexicon):
+        return lexicon.edge_mrs(parent, child, edge)
+
     try:
         edge_json = lexicon['properties'][edge]
     except:
@@ -229,7 +644,7 @@ def edge_to_mrs(parent, child, edge, lexicon):
     try:
         composition_types = COMPOSITION_TYPES[edge_composition]
     except:
-        raise KeyError("Can't find '{}' as a key in comp_to_graph_relations.json")
+        raise KeyError("Can't find '{}' as a key in comp_to_graph_relations.json".format(edge_composition))
 
     try:
         if 'PARENT_HOLE' in composition_types:
@@ -244,9 +659,115 @@ def edge_to_mrs(parent, child, edge, lexicon):
         raise error
 
 
-def graph_to_mrs(root, graph, lexicon, node_count=0, edge_count=0):
+class _NodeFrame:
+    """
+    State for one node while its children are being converted, i.e. what a recursive call would keep in its locals
+    """
+    __slots__ = ('node', 'composed_mrs', 'children', 'child', 'edge_index', 'child_start',
+                 'table_start', 'node_start', 'edge_start', 'hook_start')
+
+    def __init__(self, node, composed_mrs, children, table_start, node_start, edge_start, hook_start):
+        self.node = node
+        self.composed_mrs = composed_mrs
+        self.children = children
+        # child currently being converted, the index of the edge to it, and where its subtree starts in the eval table
+        self.child = None
+        self.edge_index = None
+        self.child_start = None
+        self.table_start = table_start
+        self.node_start = node_start
+        self.edge_start = edge_start
+        # where the subtree's hook calls start, if they're being kept for the memo
+        self.hook_start = hook_start
+
+
+def _snapshot(sement):
+    # hook calls are kept for the memo, and the SSEMENTs they were passed can be changed in place later on
+    return None if sement is None else sement.snapshot()
+
+
+def _start_node(node, graph, lexicon, eval_table, node_count, edge_count, on_node, hook_calls):
+    # create the MRS for the node on its own, before any of its children are composed in
+    table_start = eval_table.position()
+    regularized_node = POGG.data_regularization.regularize_node(node)
+    # the node/edge names have to be stored in eval with a counter
+    # this is because two separate nodes/edges with the same key should be counted as separate instances
+    eval_node_name = "{}_{}".format(regularized_node, node_count + 1)
+
+    node_mrs = None
+    try:
+        node_mrs = node_to_mrs(regularized_node, lexicon, {})
+        eval_entry = eval_table.add_node(eval_node_name, (True, "MRS fragment produced"), (True, "Included in MRS"))
+    except (KeyError, ValueError) as error:
+        # node is not in lexicon
+        eval_entry = eval_table.add_node(eval_node_name, (False, error), (False, error))
+
+    if on_node is not None:
+        on_node(node, eval_node_name, node_mrs, eval_entry)
+    hook_start = None
+    if hook_calls is not None:
+        hook_start = len(hook_calls)
+        hook_calls.append(('node', table_start[0], (node, eval_node_name, _snapshot(node_mrs))))
+
+    return _NodeFrame(node, node_mrs, iter(graph.successors(node)), table_start, node_count, edge_count, hook_start)
+
+
+def _compose_child(frame, child_mrs, graph, lexicon, eval_table, edge_count, on_edge, hook_calls):
+    # compose a converted child into its parent's MRS
+    # if the parent node or the edge can't be produced, everything below the edge must be marked as disincluded
+    inclusion_failure = False
+
+    edge = graph.get_edge_data(frame.node, frame.child)
+    regularized_edge = POGG.data_regularization.regularize_edge(edge[0]['label'])
+    eval_edge_name = "{}_{}".format(regularized_edge, edge_count)
+
+    if frame.composed_mrs is None:
+        inclusion_failure = 'node'
+        produced = included = (False, "Outbound from failed node")
+    elif child_mrs is None:
+        produced = included = (False, "Inbound to failed node")
+    else:
+        try:
+            frame.composed_mrs = edge_to_mrs(frame.composed_mrs, child_mrs, regularized_edge, lexicon)
+            produced = (True, "MRS composed")
+            included = (True, "Included in MRS")
+        except (KeyError, ValueError, RuntimeError) as error:
+            inclusion_failure = 'edge'
+            produced = included = (False, error)
+    eval_entry = eval_table.set_edge(frame.edge_index, eval_edge_name, produced, included)
+
+    if inclusion_failure:
+        # the child's subtree is everything added to the table since it started
+        eval_table.mark_not_included(frame.child_start, (False, "Descends from failed {}".format(inclusion_failure)))
+
+    if on_edge is not None:
+        on_edge(frame.node, frame.child, eval_edge_name, frame.composed_mrs, eval_entry)
+    if hook_calls is not None:
+        hook_calls.append(('edge', frame.edge_index,
+                           (frame.node, frame.child, eval_edge_name, _snapshot(frame.composed_mrs))))
+
+
+def _replay_hook_calls(memoized_calls, start, eval_table, on_node, on_edge, hook_calls):
+    # make the hook calls for a reused subtree, with the entries it's just been given in the eval table
+    node_start, edge_start = start[:2]
+    for kind, index, arguments in memoized_calls:
+        if kind == 'node':
+            index += node_start
+            if on_node is not None:
+                on_node(*arguments, eval_table.node_entries[index])
+        else:
+            index += edge_start
+            if on_edge is not None:
+                on_edge(*arguments, eval_table.edge_entries[index])
+        # kept as well, in case a subtree around this one is reused
+        hook_calls.append((kind, index, arguments))
+
+
+def graph_to_mrs(root, graph, lexicon, node_count=0, edge_count=0, memo=None, on_node=None, on_edge=None):
     """
     Convert a graph to MRS (SSEMENT)
+    The graph is walked depth-first with an explicit stack instead of recursion,
+    so arbitrarily deep graphs (e.g. long chains of relationships) don't hit Python's recursion limit
     :param root: text on root node
     :type root: str
     :param graph: graph to compose MRS from
@@ -257,8 +778,14 @@ def graph_to_mrs(root, graph, lexicon, node_count=0, edge_count=0):
     :type node_count: int
     :param edge_count: counter for naming edges in the evaluation dictionary
     :type edge_count: int
-    :param variables: dict of variables and values, if you need to constrain them (e.g. NUM=sg)
-    :type variables: dict
+    :param memo: memo of composed subtrees, so nodes with several parents are only composed once (no memo if None)
+    :type memo: SubtreeMemo
+    :param on_node: called as on_node(node, eval_node_name, node_mrs, eval_entry) when a node's own MRS is created
+    :type on_node: callable
+    :param on_edge: called as on_edge(parent, child, eval_edge_name, composed_mrs, eval_entry) when a child is composed in
+    (eval entries passed to hooks don't have "Descends from failed ..." filled in until the whole graph is done,
+    and for subtrees reused from the memo the hooks are called again with the SSEMENTs from when they were composed)
+    :type on_edge: callable
     :return: tuple of composed SSEMENT and eval information
     :rtype: tuple
     """
@@ -300,92 +827,82 @@ def graph_to_mrs(root, graph, lexicon, node_count=0, edge_count=0):
         }
     '''
 
-    regularized_root = POGG.data_regularization.regularize_node(root)
-    # the node/edge names have to be stored in eval with a counter
-    node_count += 1
-    # this is because two separate nodes/edges with the same key should be counted as separate instances
-    eval_node_name = "{}_{}".format(regularized_root, node_count)
-
-    # eval_info for the root
-    eval_info = {
-        'nodes': {
-            eval_node_name: {
-                'produced': None,
-                'included': None
-            }
-        },
-        'edges': {}
-    }
-
-    # 1. get MRS for root
-    root_mrs = None
-    try:
-        root_mrs = node_to_mrs(regularized_root, lexicon, {})
-        eval_info['nodes'][eval_node_name]['produced'] = (True, "MRS fragment produced")
-        eval_info['nodes'][eval_node_name]['included'] = (True, "Included in MRS")
-    except (KeyError, ValueError) as error:
-        # node is not in lexicon
-        eval_info['nodes'][eval_node_name]['produced'] = (False, error)
-        eval_info['nodes'][eval_node_name]['included'] = (False, error)
-
-
-    # 2. for each child ...
-    new_composed_mrs = root_mrs
-    for child in graph.successors(root):
-        # if the root node or any child edge can't be produced, all children must be marked as disincluded
-        inclusion_failure = False
-        # 3. recurse and get the full MRS for the child
-        child_conversion_result = graph_to_mrs(child, graph, lexicon, node_count, edge_count)
-        child_mrs = child_conversion_result[0]
-        child_eval_info = child_conversion_result[1]
-        node_count = child_conversion_result[2]
-        edge_count = child_conversion_result[3]
-
-        # 4. compose child_mrs with the root
-        edge = graph.get_edge_data(root, child)
-        edge_count += 1
-        regularized_edge = POGG.data_regularization.regularize_edge(edge[0]['label'])
-
-        eval_edge_name = "{}_{}".format(regularized_edge, edge_count)
-        eval_info['edges'][eval_edge_name] = {
-            'produced': None,
-            'included': None
-        }
-
-        if new_composed_mrs is None:
-            inclusion_failure = 'node'
-            eval_info['edges'][eval_edge_name]['produced'] = (False, "Outbound from failed node")
-            eval_info['edges'][eval_edge_name]['included'] = (False, "Outbound from failed node")
-        elif child_mrs is None:
-            eval_info['edges'][eval_edge_name]['produced'] = (False, "Inbound to failed node")
-            eval_info['edges'][eval_edge_name]['included'] = (False, "Inbound to failed node")
-        else:
-            try:
-                new_composed_mrs = edge_to_mrs(new_composed_mrs, child_mrs, regularized_edge, lexicon)
-                eval_info['edges'][eval_edge_name]['produced'] = (True, "MRS composed")
-                eval_info['edges'][eval_edge_name]['included'] = (True, "Included in MRS")
-            except (KeyError, ValueError, RuntimeError) as error:
-                inclusion_failure = 'edge'
-                eval_info['edges'][eval_edge_name]['produced'] = (False, error)
-                eval_info['edges'][eval_edge_name]['included'] = (False, error)
-
-        if inclusion_failure:
-            # update child_eval_info to set every node/edge to false
-            for n in child_eval_info['nodes']:
-                if child_eval_info['nodes'][n]['included'][0]:
-                    child_eval_info['nodes'][n]['included'] = (False, "Descends from failed {}".format(inclusion_failure))
-            for e in child_eval_info['edges']:
-                if child_eval_info['edges'][e]['included'][0]:
-                    child_eval_info['edges'][e]['included'] = (False, "Descends from failed {}".format(inclusion_failure))
-
-        # merge child_eval_info with current eval_info
-        eval_info['nodes'] = {**eval_info['nodes'], **child_eval_info['nodes']}
-        eval_info['edges'] = {**eval_info['edges'], **child_eval_info['edges']}
-
-    # 5. return the result
-    # i.e. the MRS up to this point, evaluation information, and the count of included nodes/edges in the MRS
-    # add the root_increment here, so it's only accounted for once
-    return new_composed_mrs, eval_info, node_count, edge_count
+    if memo is not None and memo.graph is not graph:
+        raise ValueError("SubtreeMemo belongs to a different graph")
+
+    # eval info is recorded in one flat table for the whole graph, and only turned into dicts at the end
+    eval_table = POGG.evaluation.EvalTable()
+    # every hook call so far, so they can be made again when the memo reuses a subtree (only kept if both are used)
+    hook_calls = None
+    if memo is not None and (on_node is not None or on_edge is not None):
+        hook_calls = []
+    # nodes on the path from the root to the current node, to catch cycles (which would never finish)
+    on_path = set()
+    stack = []
+    # node waiting to be converted, and whether the last subtree finished (along with its SSEMENT)
+    pending = root
+    finished = False
+    finished_mrs = None
+    while True:
+        # 1. get MRS for the next node, or reuse it if this node's subtree was already composed via another parent
+        if pending is not None:
+            memoized = None if memo is None else memo.reuse(pending, node_count, edge_count)
+            if memoized is not None:
+                reused_start = eval_table.position()
+                eval_table.extend(memoized[1])
+                if hook_calls is not None:
+                    _replay_hook_calls(memo.reuse_hook_calls(pending, node_count, edge_count), reused_start,
+                                       eval_table, on_node, on_edge, hook_calls)
+                finished_mrs, _, node_count, edge_count = memoized
+                finished = True
+            else:
+                if pending in on_path:
+                    raise ValueError("Graph contains a cycle through '{}'".format(pending))
+                stack.append(_start_node(pending, graph, lexicon, eval_table, node_count, edge_count, on_node,
+                                         hook_calls))
+                on_path.add(pending)
+                node_count += 1
+            pending = None
+
+        if not stack:
+            # the root itself was memoized
+            return finished_mrs, eval_table.to_eval_info(), node_count, edge_count
+
+        frame = stack[-1]
+        # 2. compose the child that just finished with its parent
+        if finished:
+            edge_count += 1
+            _compose_child(frame, finished_mrs, graph, lexicon, eval_table, edge_count, on_edge, hook_calls)
+            finished = False
+
+        # 3. move on to the next child ...
+        frame.child = next(frame.children, None)
+        if frame.child is not None:
+            # the edge goes before the child's subtree in the table, its name is filled in once the child is done
+            frame.edge_index = eval_table.reserve_edge()
+            frame.child_start = eval_table.position()
+            pending = frame.child
+            continue
+
+        # ... or if there are none left, this node's subtree is done
+        stack.pop()
+        on_path.discard(frame.node)
+        # only nodes with more than one inbound edge can be reached again
+        if memo is not None and graph.in_degree(frame.node) > 1:
+            subtree_hook_calls = None
+            if hook_calls is not None:
+                # positioned within the subtree's own table, same as eval_table.subtree
+                subtree_hook_calls = [(kind, index - frame.table_start[0 if kind == 'node' else 1], arguments)
+                                      for kind, index, arguments in hook_calls[frame.hook_start:]]
+            memo.store(frame.node, frame.composed_mrs, eval_table.subtree(frame.table_start),
+                       frame.node_start, node_count, frame.edge_start, edge_count, subtree_hook_calls)
+        finished = True
+        finished_mrs = frame.composed_mrs
+
+        # 4. return the result
+        # i.e. the MRS up to this point, evaluation information, and the count of included nodes/edges in the MRS
+        if not stack:
+            return frame.composed_mrs, eval_table.to_eval_info(), node_count, edge_count
 
 # def graph_to_mrs_new(root, graph, lexicon):
 #     """
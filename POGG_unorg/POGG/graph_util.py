@@ -1,8 +1,10 @@
 # Contains functions for building graphs and writing them to files
 # ORGANIZED: 01/30/2024
 # DOCUMENTED: 01/30/2024
+import os
 import networkx as nx
 import random
+import re
 
 
 # TODO: Needs to be generalized for data shapes beyond the perplexity data
@@ -82,6 +84,197 @@ def build_graph(entities):
     return graph
 
 
+def list_graph_files(graph_directory):
+    """
+    Get the paths of every .dot file in a directory
+    :param graph_directory: directory containing .dot files
+    :type graph_directory: str
+    :return: list of paths to .dot files
+    :rtype: list
+    """
+    graph_paths = []
+    for filename in os.listdir(graph_directory):
+        if os.path.splitext(filename)[-1].lower() == '.dot':
+            graph_paths.append(os.path.join(graph_directory, filename))
+    return graph_paths
+
+
+# tokens in the subset of DOT that write_graph_to_dot produces (anything else is left to pydot)
+_DOT_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+    |(?P<string>"(?:[^"\\\n]|\\.)*")
+    |(?P<id>[A-Za-z_][A-Za-z0-9_]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))
+    |(?P<op>->|--|[\[\]{};,=])
+''', re.VERBOSE)
+# DOT keywords, which only show up in statements this reader doesn't handle
+_DOT_KEYWORDS = {'node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'}
+
+
+class UnsupportedDot(ValueError):
+    """
+    Raised when DOT text uses something outside of what the native reader handles
+    """
+
+
+def read_dot(filepath):
+    """
+    Read a graph from a .dot file, the same graph nx.drawing.nx_pydot.read_dot would give
+    Files like the ones write_graph_to_dot writes (node and edge statements with attribute lists) are read directly,
+    which is much faster than going through pydot's parser, and anything else (subgraphs, default attributes, ports,
+    comments, HTML labels, etc.) falls back to pydot.
+    Unlike pydot, this doesn't add a stray '\\n' node for edge statements that end in an attribute list
+    :param filepath: path to the .dot file
+    :type filepath: str
+    :return: graph (MultiGraph for an undirected graph)
+    :rtype: MultiDiGraph
+    """
+    with open(filepath) as dot_file:
+        data = dot_file.read()
+    try:
+        return parse_dot(data)
+    except UnsupportedDot:
+        return nx.drawing.nx_pydot.read_dot(filepath)
+
+
+def parse_dot(data):
+    """
+    Build a graph from DOT text, for the restricted DOT that write_graph_to_dot writes (see read_dot)
+    Node/edge attribute values are kept as written, so quoted values keep their quotes, same as pydot
+    :param data: DOT text
+    :type data: str
+    :return: graph
+    :rtype: MultiDiGraph
+    """
+    return graph_from_statements(*read_dot_statements(data))
+
+
+def read_dot_statements(data):
+    """
+    Read the nodes and edges out of DOT text, in the order they're added to the graph (see parse_dot)
+    Raises UnsupportedDot for anything outside of what write_graph_to_dot writes
+    :param data: DOT text
+    :type data: str
+    :return: tuple of whether the graph is directed, its name, dict of declared nodes and their attributes,
+    and list of (source, destination, attributes) edges
+    :rtype: tuple
+    """
+    tokens = _tokenize_dot(data)
+    position = 0
+
+    def peek(offset=0):
+        if position + offset < len(tokens):
+            return tokens[position + offset]
+        return None, None
+
+    # header: [strict] (digraph | graph) [name] {
+    if peek() == ('id', 'strict'):
+        position += 1
+    kind, graph_type = peek()
+    if kind != 'id' or graph_type not in ('digraph', 'graph'):
+        raise UnsupportedDot("No graph header")
+    position += 1
+    name = "G"
+    kind, text = peek()
+    if kind in ('id', 'string'):
+        name = text.strip('"')
+        position += 1
+    if peek() != ('op', '{'):
+        raise UnsupportedDot("No graph body")
+    position += 1
+    edge_op = '->' if graph_type == 'digraph' else '--'
+
+    # pydot adds declared nodes first, then the edges grouped by their (source, destination), so do the same
+    nodes = {}
+    edges = {}
+    while peek() != ('op', '}'):
+        kind, text = peek()
+        if not _is_dot_id(kind, text):
+            raise UnsupportedDot("Unsupported statement at '{}'".format(text))
+        points = [text]
+        position += 1
+        while peek() == ('op', edge_op):
+            kind, text = peek(1)
+            if not _is_dot_id(kind, text):
+                raise UnsupportedDot("Unsupported edge at '{}'".format(text))
+            points.append(text)
+            position += 2
+
+        attributes = {}
+        if peek() == ('op', '['):
+            position += 1
+            while peek() != ('op', ']'):
+                (key_kind, key), equals, (value_kind, value) = peek(), peek(1), peek(2)
+                if key_kind not in ('id', 'string') or equals != ('op', '=') or value_kind not in ('id', 'string'):
+                    raise UnsupportedDot("Unsupported attribute at '{}'".format(key))
+                attributes[key] = value
+                position += 3
+                if peek() in (('op', ','), ('op', ';')):
+                    position += 1
+            position += 1
+        if peek() == ('op', ';'):
+            position += 1
+
+        if len(points) == 1:
+            nodes.setdefault(points[0].strip('"'), {}).update(attributes)
+        else:
+            for source, destination in zip(points, points[1:]):
+                edges.setdefault((source, destination), []).append(attributes)
+    position += 1
+    if position != len(tokens):
+        # more than one graph in the file
+        raise UnsupportedDot("Text after the graph")
+
+    edge_list = [(source.strip('"'), destination.strip('"'), attributes)
+                 for (source, destination), attribute_list in edges.items() for attributes in attribute_list]
+    return graph_type == 'digraph', name, nodes, edge_list
+
+
+def graph_from_statements(directed, name, nodes, edges):
+    """
+    Build a graph from nodes and edges, adding them in order (see read_dot_statements)
+    :param directed: whether the graph is directed
+    :type directed: bool
+    :param name: graph name ("" for none)
+    :type name: str
+    :param nodes: nodes and their attributes, in order (edges can also add nodes that aren't here)
+    :type nodes: dict
+    :param edges: (source, destination, attributes) edges in order
+    :type edges: list
+    :return: graph
+    :rtype: MultiDiGraph
+    """
+    # pydot doesn't keep "strict" when it parses a file, so it's always a multigraph
+    graph = nx.MultiDiGraph() if directed else nx.MultiGraph()
+    if name != "":
+        graph.name = name
+    for node, attributes in nodes.items():
+        graph.add_node(node, **attributes)
+    for source, destination, attributes in edges:
+        graph.add_edge(source, destination, **attributes)
+    return graph
+
+
+def _is_dot_id(kind, text):
+    # node IDs, but not keywords (or names pydot would skip as keywords once the quotes are stripped)
+    if kind == 'id':
+        return text.lower() not in _DOT_KEYWORDS
+    return kind == 'string' and text.strip('"').lower() not in _DOT_KEYWORDS
+
+
+def _tokenize_dot(data):
+    # (kind, text) for every token, anything the pattern doesn't cover means it's not the simple subset
+    tokens = []
+    position = 0
+    while position < len(data):
+        match = _DOT_TOKEN.match(data, position)
+        if match is None:
+            raise UnsupportedDot("Unsupported character '{}'".format(data[position]))
+        if match.lastgroup != 'space':
+            tokens.append((match.lastgroup, match.group()))
+        position = match.end()
+    return tokens
+
+
 def write_graph_to_dot(graph, filepath):
     """
     write the graph to a .dot file
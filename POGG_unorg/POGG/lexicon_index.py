@@ -0,0 +1,190 @@
+# Reverse index from lexicon entries to the graphs (and the nodes/edges in them) that use them,
+# so after editing a few lexicon entries only the graphs those entries affect are composed and generated again
+# The index comes from the run manifest (see POGG.run_manifest), which records what every graph looked up as it was run,
+# and the lexicon a results directory was last run with is kept next to it (see save_snapshot) to diff edits against
+#   python -m POGG.lexicon_index LOCAL_CONFIG [OLD_LEXICON]
+# recomposes and regenerates the graphs affected by the changes from OLD_LEXICON (the snapshot if not given)
+# to the scenario's lexicon
+import json
+import os
+import sys
+import yaml
+import POGG.ace_pool
+import POGG.batch
+import POGG.config
+import POGG.graph_to_mrs
+import POGG.results_log
+import POGG.run_manifest
+
+# lexicon sections graphs look entries up in
+LEXICON_TYPES = ['entityTypes', 'propertyValues', 'properties']
+LEXICON_SNAPSHOT_FILENAME = "lexicon.json"
+
+
+def snapshot_path(results_directory):
+    """
+    Get the path of the lexicon snapshot in a results directory
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :return: path to the snapshot
+    :rtype: str
+    """
+    return os.path.join(results_directory, LEXICON_SNAPSHOT_FILENAME)
+
+
+def save_snapshot(lexicon, results_directory):
+    """
+    Keep a copy of the lexicon the results directory was run with, for lexicon_changes to diff later edits against
+    :param lexicon: lexicon with node to ERG predicate label mappings
+    :type lexicon: dict
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    """
+    filename = snapshot_path(results_directory)
+    temp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(temp_filename, 'w') as snapshot_file:
+        json.dump(lexicon, snapshot_file, indent=2, sort_keys=True)
+    os.replace(temp_filename, filename)
+
+
+def lexicon_changes(old_lexicon, new_lexicon):
+    """
+    Get the entries that are different between two versions of a lexicon, i.e. added, removed, or changed
+    :param old_lexicon: lexicon before the edits
+    :type old_lexicon: dict
+    :param new_lexicon: lexicon after the edits
+    :type new_lexicon: dict
+    :return: dict of lexicon type -> sorted list of changed entries
+    :rtype: dict
+    """
+    changes = {}
+    for lexicon_type in LEXICON_TYPES:
+        old_entries = old_lexicon.get(lexicon_type, {})
+        new_entries = new_lexicon.get(lexicon_type, {})
+        changed = [entry for entry in set(old_entries) | set(new_entries)
+                   if old_entries.get(entry) != new_entries.get(entry)]
+        if changed:
+            changes[lexicon_type] = sorted(changed)
+    return changes
+
+
+def build_index(manifest):
+    """
+    Build the reverse index from lexicon entries to the graphs and nodes that use them
+    :param manifest: manifest of the results directory
+    :type manifest: POGG.run_manifest.RunManifest
+    :return: dict of lexicon type -> entry -> graph name -> names of the nodes and edge labels that use the entry
+    :rtype: dict
+    """
+    index = {}
+    for graph_name, entry in manifest.entries.items():
+        for lexicon_type, entries in entry.get('uses', {}).items():
+            for lexicon_entry, names in entries.items():
+                index.setdefault(lexicon_type, {}).setdefault(lexicon_entry, {})[graph_name] = names
+    return index
+
+
+def affected_graphs(index, changes):
+    """
+    Get the graphs that use any of the changed lexicon entries
+    :param index: index from build_index
+    :type index: dict
+    :param changes: changed entries from lexicon_changes
+    :type changes: dict
+    :return: dict of graph name -> sorted names of the nodes and edge labels that use a changed entry
+    :rtype: dict
+    """
+    affected = {}
+    for lexicon_type, changed in changes.items():
+        for lexicon_entry in changed:
+            for graph_name, names in index.get(lexicon_type, {}).get(lexicon_entry, {}).items():
+                affected.setdefault(graph_name, set()).update(names)
+    return {graph_name: sorted(names) for graph_name, names in affected.items()}
+
+
+def recompose_affected(graph_directory, results_directory, lexicon, old_lexicon=None, pool=None, memoize=False,
+                       cache_dir=None, workers=1, chunksize=1):
+    """
+    Compose and generate again only the graphs that use a lexicon entry that's changed since the results directory
+    was last run, updating their results files, the results log, the manifest, and the evaluation summary
+    Graphs the manifest doesn't know about (e.g. new ones) are run as well, since there's no telling what they use
+    :param graph_directory: directory containing the .dot files
+    :type graph_directory: str
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :param lexicon: edited lexicon
+    :type lexicon: dict
+    :param old_lexicon: lexicon before the edits, the snapshot from the last run if None (see save_snapshot)
+    :type old_lexicon: dict
+    :param pool: generator pool to generate with
+    :type pool: POGG.ace_pool.ACEGeneratorPool
+    :param memoize: whether to compose subtrees under nodes with several parents only once (see SubtreeMemo)
+    :type memoize: bool
+    :param cache_dir: directory for the composition cache (see composition_cache), no caching if None
+    :type cache_dir: str
+    :param workers: number of worker processes, 1 processes every graph in this process
+    :type workers: int
+    :param chunksize: number of graphs sent to a worker at a time
+    :type chunksize: int
+    :return: dict of graph name -> names of the nodes and edge labels that use a changed entry, for the graphs run
+    :rtype: dict
+    """
+    if old_lexicon is None:
+        try:
+            with open(snapshot_path(results_directory)) as snapshot_file:
+                old_lexicon = json.load(snapshot_file)
+        except OSError:
+            raise FileNotFoundError("No lexicon snapshot in {}, run the whole scenario first or give the old lexicon"
+                                    .format(results_directory))
+
+    manifest = POGG.run_manifest.RunManifest(POGG.run_manifest.manifest_path(results_directory),
+                                             POGG.run_manifest.config_fingerprint(pool, memoize))
+    affected = affected_graphs(build_index(manifest), lexicon_changes(old_lexicon, lexicon))
+
+    graph_paths = POGG.batch.list_graph_files(graph_directory)
+    graph_names = {os.path.splitext(os.path.basename(graph_path))[0] for graph_path in graph_paths}
+    for graph_name in graph_names - set(manifest.entries):
+        affected[graph_name] = []
+    graph_paths = [graph_path for graph_path in graph_paths
+                   if os.path.splitext(os.path.basename(graph_path))[0] in affected]
+    # every affected graph is run, what it uses now is worked out as it's recorded
+    manifest.queue(graph_paths, lexicon)
+
+    results_log_path = POGG.results_log.results_log_path(results_directory)
+    with manifest, POGG.results_log.ResultsLog(results_log_path) as results_log:
+        for graph_result in POGG.batch.run_batch(graph_paths, lexicon, results_directory, workers=workers,
+                                                 chunksize=chunksize, ordered=False, pool=pool, memoize=memoize,
+                                                 cache_dir=cache_dir):
+            results_log.write(graph_result)
+            manifest.record(graph_result, results_directory)
+
+    POGG.results_log.aggregate(results_log_path, os.path.join(results_directory, "evaluation_summary.txt"), graph_names)
+    save_snapshot(lexicon, results_directory)
+    return affected
+
+
+if __name__ == '__main__':
+    # python -m POGG.lexicon_index LOCAL_CONFIG [OLD_LEXICON]
+    with open(sys.argv[1]) as local_config_file:
+        local_config = yaml.safe_load(local_config_file)
+    old_lexicon = None
+    if len(sys.argv) > 2:
+        old_lexicon = POGG.graph_to_mrs.load_lexicon(sys.argv[2])
+
+    # same settings main.py runs the scenario with
+    global_config = POGG.config.load_global_config()
+    lexicon = POGG.graph_to_mrs.load_lexicon(local_config['LEXICON'], compiled=global_config.get('compile_lexicon', False))
+    composition_cache_dir = None
+    if global_config.get('cache_compositions', False):
+        composition_cache_dir = os.path.join(POGG.config.cache_directory(), "compositions")
+
+    with POGG.ace_pool.pool_from_global_config() as generator_pool:
+        affected = recompose_affected(local_config['graph_directory'], local_config['results_directory'], lexicon,
+                                      old_lexicon, pool=generator_pool,
+                                      memoize=global_config.get('memoize_subtrees', False),
+                                      cache_dir=composition_cache_dir,
+                                      workers=global_config.get('batch_workers', 1),
+                                      chunksize=global_config.get('batch_chunksize', 1))
+    for graph_name in sorted(affected):
+        print("{}: {}".format(graph_name, ", ".join(affected[graph_name]) or "new graph"))
+    print("Recomposed {} graphs".format(len(affected)))
@@ -1,15 +1,18 @@
+import asyncio
 import os
 import sys
 import yaml
-import networkx as nx
+import POGG.config
 import POGG.graph_to_mrs
-import POGG.mrs_util
-import POGG.graph_util
-import POGG.evaluation
-from tabulate import tabulate
+import POGG.ace_pool
+import POGG.batch
+import POGG.graph_corpus
+import POGG.lexicon_index
+import POGG.results_log
+import POGG.run_manifest
 
 # Load elements from global config
-global_config = yaml.safe_load((open("../config_data/global_config.yml")))
+global_config = POGG.config.load_global_config()
 # outer folder with individual scenario/graph folders inside
 parent_data_dir = global_config['parent_data_directory']
 
@@ -20,122 +23,92 @@ local_config_path = os.path.join(data_directory, "local_config.yml")
 local_config = yaml.safe_load((open(local_config_path)))
 graph_directory = local_config['graph_directory']
 results_directory = local_config['results_directory']
-lexicon = POGG.graph_to_mrs.load_lexicon(local_config['LEXICON'])
+# compiling the lexicon checks every entry before any graphs are processed
+lexicon = POGG.graph_to_mrs.load_lexicon(local_config['LEXICON'], compiled=global_config.get('compile_lexicon', False))
+for problem in getattr(lexicon, 'problems', []):
+    print("Lexicon problem: {}".format(problem))
+
+# number of worker processes graphs are spread over, and how many graphs each worker gets at a time
+batch_workers = global_config.get('batch_workers', 1)
+batch_chunksize = global_config.get('batch_chunksize', 1)
+# whether subtrees under nodes with several parents are only composed once per graph
+memoize_subtrees = global_config.get('memoize_subtrees', False)
+# whether the graphs are read from a binary pack of the graph directory instead of the .dot files
+pack_graphs = global_config.get('pack_graphs', False)
+# where composed MRSs are cached between runs, so only graphs whose lexicon entries (etc.) changed are composed again
+composition_cache_dir = None
+if global_config.get('cache_compositions', False):
+    composition_cache_dir = os.path.join(POGG.config.cache_directory(), "compositions")
+
+# whether graphs whose results are already up to date (see POGG.run_manifest) are skipped,
+# and whether graphs whose generation failed last time (e.g. timed out) are run again anyway
+incremental_runs = global_config.get('incremental_runs', False)
+retry_failed = global_config.get('retry_failed', False)
+
+# whether graphs are composed while earlier ones are still being generated from (only when batch_workers is 1)
+overlap_generation = global_config.get('overlap_generation', False)
+
+# one pool of ACE generators for the whole run, so the ERG is only loaded once rather than once per graph
+# (only used when batch_workers is 1, each worker process keeps its own pool)
+generator_pool = POGG.ace_pool.pool_from_global_config()
 
 # make results directory if needed
 if not os.path.exists(results_directory):
     os.makedirs(results_directory)
 
 
-# for summary stats at end
-full_eval_info = {
-    'nodes': {},
-    'edges': {}
-}
-node_counter = 0
-edge_counter = 0
-
-# stores # of results per graph, and reason for 0 if 0
-# e.g. {
-#   graph_0: [26, "Succesfully generated"],
-#   graph_1: [0, "MRS not produced"],
-#   graph_2: [0, "ERG did not generate]
-# }
-generation_info = {}
-
-# for each graph...
-for filename in os.listdir(graph_directory):
-    split_file = os.path.splitext(filename)
-    print(filename)
-    graph_name = split_file[0]
-    if split_file[-1].lower() == '.dot':
-        results_filename = os.path.join(results_directory, graph_name + ".txt")
-
-        with open(results_filename, 'w') as results_file:
-            results_file.write(os.path.join(graph_directory, filename) + "\n")
-
-            graph = nx.drawing.nx_pydot.read_dot(os.path.join(graph_directory, filename))
-
-            # TODO: might want to deal with this better in the future...
-            # if there's a cycle, skip it entirely
-            try:
-                nx.find_cycle(graph)
-                generation_info[graph_name] = [0, "Graph contains cycles"]
-                results_file.write("Graph contains cycles")
-                continue
-            except nx.NetworkXNoCycle:
-                pass
-
-            root = POGG.graph_util.find_root(graph)
-
-            conversion_results = POGG.graph_to_mrs.graph_to_mrs(root, graph, lexicon)
-            graphmrs = conversion_results[0]
-            eval_info = conversion_results[1]
-
-            # update full_eval_info
-            for n in eval_info['nodes']:
-                new_node_name = "{}_{}".format(graph_name, n)
-                full_eval_info['nodes'][new_node_name] = eval_info['nodes'][n]
-
-            for e in eval_info['edges']:
-                new_edge_name = "{}_{}".format(graph_name, e)
-                full_eval_info['edges'][new_edge_name] = eval_info['edges'][e]
-
-            mrs_string = POGG.mrs_util.wrap_SEMENT(graphmrs)
-            results_file.write(mrs_string + "\n")
-
-            results = []
-            if mrs_string == "":
-                generation_info[graph_name] = [0, "MRS not produced"]
-            else:
-                results = POGG.mrs_util.generate(mrs_string)
-
-                results_file.write("GENERATED RESULTS ... \n")
-                for r in results:
-                    results_file.write(r.get('surface') + "\n")
-
-                if len(results) == 0:
-                    generation_info[graph_name] = [0, "ERG did not generate"]
-                else:
-                    generation_info[graph_name] = [len(results), "Successfully generated"]
-
-            results_file.write("\nTOTAL RESULTS: {}".format(len(results)))
-
-            results_file.write("\n\n")
-            results_file.write(POGG.evaluation.node_evaluation(eval_info['nodes']))
-            results_file.write("\n\n")
-            results_file.write(POGG.evaluation.edge_evaluation(eval_info['edges']))
-            results_file.write("\n\n")
-            results_file.write(POGG.evaluation.evaluation_summary(eval_info))
-
-
-with open(os.path.join(results_directory,"evaluation_summary.txt"), 'w') as summary_file:
-    summary_file.write("EVALUATION SUMMARY\n\n")
-    # total results per graph
-    generation_table = []
-    graphs_generated_from = 0
-    for g in generation_info:
-        g_info = generation_info[g]
-        generation_table.append([g, str(g_info[0]), g_info[1]])
-        if g_info[0] > 0:
-            graphs_generated_from += 1
-
-    total_graphs = len(generation_info)
-    graph_coverage = graphs_generated_from / total_graphs
-    coverage_table = [[str(graphs_generated_from), str(total_graphs), str(graph_coverage)]]
-
-    summary_file.write(tabulate(coverage_table, headers=["Graphs Generated From", "Total Graphs", "Graph Coverage"]))
-    summary_file.write("\n\n")
-    summary_file.write(tabulate(sorted(generation_table, key=lambda x: x[0]), headers=["Graph Name", "Results", "Reason"]))
-    summary_file.write("\n\n")
-
-    # total node/edge coverage
-    summary_table = POGG.evaluation.evaluation_summary(full_eval_info)
-    summary_file.write(POGG.evaluation.evaluation_summary(full_eval_info))
-
-    # node/edge information
-    summary_file.write("\n\n")
-    summary_file.write(POGG.evaluation.node_evaluation(full_eval_info['nodes']))
-    summary_file.write("\n\n")
-    summary_file.write(POGG.evaluation.edge_evaluation(full_eval_info['edges']))
-
+# results for each graph are added to the results log as soon as the graph is done, instead of being kept in memory,
+# and the evaluation summary is worked out from the log at the end (see POGG.results_log)
+# each line has the graph's generation information, i.e. # of results, reason for 0 if 0,
+# and the status of the generation request (see ace_pool), e.g.
+#   [26, "Succesfully generated", "ok"]
+#   [0, "MRS not produced", null]
+#   [0, "Generation timed out", "timeout"]
+# along with its node/edge eval information
+results_log_path = POGG.results_log.results_log_path(results_directory)
+
+if __name__ == '__main__':
+    if pack_graphs:
+        # packs the graph directory if there's no pack yet or the .dot files have changed since
+        POGG.graph_corpus.open_corpus(graph_directory).close()
+
+    # for each graph...
+    graph_paths = POGG.batch.list_graph_files(graph_directory)
+    graph_names = {os.path.splitext(os.path.basename(graph_path))[0] for graph_path in graph_paths}
+
+    # the manifest records what each graph was run with, so the next run knows which graphs are up to date
+    manifest = POGG.run_manifest.RunManifest(POGG.run_manifest.manifest_path(results_directory),
+                                             POGG.run_manifest.config_fingerprint(generator_pool, memoize_subtrees))
+    if incremental_runs and os.path.exists(results_log_path):
+        # the results of skipped graphs come from the log, so anything that isn't in it has to be run again
+        logged = {record['graph'] for record in POGG.results_log.read_results_log(results_log_path)}
+        graph_paths = manifest.stale_graphs(graph_paths, lexicon, retry_failed, have_results=logged)
+        print("{} of {} graphs to run".format(len(graph_paths), len(graph_names)))
+    else:
+        incremental_runs = False
+        manifest.queue(graph_paths, lexicon)
+
+    with manifest, POGG.results_log.ResultsLog(results_log_path, append=incremental_runs) as results_log:
+        if overlap_generation and batch_workers <= 1:
+            async def run_pipeline():
+                async for graph_result in POGG.batch.run_pipeline(graph_paths, lexicon, results_directory,
+                                                                  pool=generator_pool, memoize=memoize_subtrees,
+                                                                  cache_dir=composition_cache_dir):
+                    results_log.write(graph_result)
+                    manifest.record(graph_result, results_directory)
+            asyncio.run(run_pipeline())
+        else:
+            for graph_result in POGG.batch.run_batch(graph_paths, lexicon, results_directory,
+                                                     workers=batch_workers, chunksize=batch_chunksize,
+                                                     ordered=False, pool=generator_pool, memoize=memoize_subtrees,
+                                                     cache_dir=composition_cache_dir):
+                results_log.write(graph_result)
+                manifest.record(graph_result, results_directory)
+
+    generator_pool.close()
+
+    # the log also has the graphs that were skipped, so the summary still covers the whole graph directory
+    POGG.results_log.aggregate(results_log_path, os.path.join(results_directory, "evaluation_summary.txt"),
+                               graph_names)
+    # what the results directory was run with, so `python -m POGG.lexicon_index` can work out what later edits affect
+    POGG.lexicon_index.save_snapshot(lexicon, results_directory)
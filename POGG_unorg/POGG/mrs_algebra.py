@@ -4,13 +4,18 @@
 
 # taken from the _mrs.py file to test my subclass
 from typing import Optional, Iterable, Mapping, Dict
+import contextlib
+import contextvars
+import sys
+import threading
 
 import delphin.semi
 from delphin.lnk import Lnk
 # end from _mrs.py
 
-import yaml
-from delphin import mrs, semi
+from delphin import mrs, variable
+import POGG.config
+import POGG.persistent
 
 
 class VarIterator:
@@ -30,13 +35,104 @@ class VarIterator:
 class VarLabeler:
     """
     Returns the appropriate label for the next created handle, index, or variable
+    Safe to share between threads, though each composition should really get its own (see var_labeler_scope)
     """
     def __init__(self):
         # make a varIterator for the numbers on the variables
         self.varIt = iter(VarIterator())
+        self._lock = threading.Lock()
 
     def get_var_name(self, var_type):
-        return "{}{}".format(var_type, next(self.varIt))
+        with self._lock:
+            return "{}{}".format(var_type, next(self.varIt))
+
+
+class EqualityClasses:
+    """
+    Disjoint-set (union-find) structure that keeps track of which variables have been identified by EQs
+    Used to group a SEMENT's EQs into sets of equal variables (see mrs_util.group_equalities)
+    Uses path compression and union by rank, so finding/merging classes is near-constant time
+    """
+    def __init__(self, eqs=None):
+        # variable -> parent variable in the tree for its class, a variable that is its own parent is the representative
+        self.parent = {}
+        # upper bound on the height of the tree under each representative
+        self.rank = {}
+        if eqs is not None:
+            for eq in eqs:
+                self.add_eq(eq)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def __contains__(self, var):
+        return var in self.parent
+
+    def find(self, var):
+        """
+        Find the representative of the class a variable is in (the variable itself if it isn't in any EQ)
+        :param var: variable to look up
+        :type var: str
+        :return: representative variable
+        :rtype: str
+        """
+        parent = self.parent
+        if var not in parent:
+            return var
+        root = var
+        while parent[root] != root:
+            root = parent[root]
+        # path compression, point everything on the way up directly at the root
+        while parent[var] != root:
+            parent[var], var = root, parent[var]
+        return root
+
+    def union(self, var1, var2):
+        """
+        Identify two variables, merging their classes
+        :param var1: variable
+        :type var1: str
+        :param var2: variable
+        :type var2: str
+        """
+        for var in (var1, var2):
+            if var not in self.parent:
+                self.parent[var] = var
+                self.rank[var] = 0
+
+        root1 = self.find(var1)
+        root2 = self.find(var2)
+        if root1 == root2:
+            return
+        # union by rank, hang the shorter tree under the taller one
+        if self.rank[root1] < self.rank[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        if self.rank[root1] == self.rank[root2]:
+            self.rank[root1] += 1
+
+    def add_eq(self, eq):
+        """
+        Add an EQ, i.e. a tuple of variables that are all equal
+        :param eq: tuple of variables
+        :type eq: tuple
+        """
+        for var in eq[1:]:
+            self.union(eq[0], var)
+        # an EQ between a variable and itself still belongs in a class
+        if len(eq) == 1 or eq[0] not in self.parent:
+            self.union(eq[0], eq[0])
+
+    def groups(self):
+        """
+        Get the equality groups, i.e. the sets of variables in each class
+        :return: list of sets of equal variables
+        :rtype: list
+        """
+        groups = {}
+        for var in self.parent:
+            groups.setdefault(self.find(var), set()).add(var)
+        return list(groups.values())
 
 
 class SEP(mrs.EP):
@@ -53,6 +149,8 @@ class SEP(mrs.EP):
     but in keeping with the algebra I kept it for now
     """
 
+    __slots__ = ()
+
     def __init__(self,
                  predicate: str,
                  label: str,
@@ -60,7 +158,57 @@ class SEP(mrs.EP):
                  lnk: Optional[Lnk] = None,
                  surface=None,
                  base=None):
-        super().__init__(predicate, label, args, lnk, surface, base)
+        # the same few predicates come up over and over, so keep one copy of each string
+        super().__init__(sys.intern(predicate), label, args, lnk, surface, base)
+
+
+# sentinel for a field that hasn't been materialized from its chain yet
+_UNSET = object()
+
+
+class _Materialized:
+    """
+    Descriptor for a SEMENT field that composition builds up as a chain,
+    which is turned into a list/dict the first time it's used and kept from then on
+    """
+    def __init__(self, field, storage):
+        """
+        :param field: name of the field
+        :type field: str
+        :param storage: slot the value is kept in, either PyDelphin's own slot for it or the name of a SEMENT slot
+        :type storage: member descriptor or str
+        """
+        self.field = field
+        self.storage = storage
+
+    def __set_name__(self, owner, name):
+        # SEMENT's own slots only exist once the class does
+        if isinstance(self.storage, str):
+            self.storage = owner.__dict__[self.storage]
+
+    def peek(self, sement):
+        """
+        Get the field's value if it's been materialized, without materializing it
+        """
+        try:
+            return self.storage.__get__(sement, type(sement))
+        except AttributeError:
+            return _UNSET
+
+    def __get__(self, sement, owner=None):
+        if sement is None:
+            return self
+        value = self.peek(sement)
+        if value is _UNSET:
+            value = sement._materialize(self.field)
+            self.storage.__set__(sement, value)
+            # the chain isn't needed anymore, the materialized value is used from now on
+            if sement._chains is not None and self.field in sement._chains:
+                sement._chains[self.field] = None
+        return value
+
+    def __set__(self, sement, value):
+        self.storage.__set__(sement, value)
 
 
 class SEMENT(mrs.MRS):
@@ -90,6 +238,18 @@ class SEMENT(mrs.MRS):
     However, during composition, the LTOP (or local top) is more appropriate
     """
 
+    # composition makes thousands of short-lived SEMENTs, so no per-instance __dict__
+    __slots__ = ('ltop', 'holes', '_eqs', '_chains')
+
+    # these wrap PyDelphin's own slots for the fields (rels is an alias of predications)
+    # so that SEMENTs made by composition can fill them in from chains only when they're needed
+    predications = _Materialized('rels', mrs.MRS.predications)
+    _pidx = _Materialized('pidx', mrs.MRS._pidx)
+    variables = _Materialized('variables', mrs.MRS.variables)
+    eqs = _Materialized('eqs', '_eqs')
+    hcons = _Materialized('hcons', mrs.MRS.hcons)
+    icons = _Materialized('icons', mrs.MRS.icons)
+
     # TODO: hcons and icons are of type mrs.HCons and mrs.ICons ...
     #  should just be HCons but this isn't in the real file yet
     def __init__(self,
@@ -107,6 +267,9 @@ class SEMENT(mrs.MRS):
                  surface=None,
                  identifier=None):
 
+        # no chains, everything is given up front
+        self._chains = None
+
         # top is GTOP, probably leaving it empty in most cases until the final MRS
         super().__init__(top, index, rels, hcons, icons, variables, lnk, surface, identifier)
 
@@ -115,20 +278,236 @@ class SEMENT(mrs.MRS):
         self.holes = holes
         self.eqs = eqs
 
+    @classmethod
+    def from_chains(cls, top, ltop, index, rels, variables, holes, eqs, hcons, icons=None):
+        """
+        Make a SEMENT whose rels, variables, EQs, HCONS and ICONS are persistent chains shared with the SEMENTs
+        it was composed from (see POGG.persistent), so composition doesn't copy them.
+        They're turned into regular lists (and a variables dict) the first time they're used
+        :param rels: chain of SEPs
+        :type rels: Chain
+        :param variables: chain of dicts mapping variables to properties, later dicts override earlier ones
+        :type variables: Chain
+        :param eqs: chain of EQs
+        :type eqs: Chain
+        :param hcons: chain of HCONS
+        :type hcons: Chain
+        :param icons: chain of ICONS
+        :type icons: Chain
+        :return: new SEMENT
+        :rtype: SEMENT
+        """
+        sement = cls.__new__(cls)
+        sement._chains = {
+            'rels': rels,
+            'variables': variables,
+            'eqs': eqs,
+            'hcons': hcons,
+            'icons': POGG.persistent.Chain() if icons is None else icons
+        }
+        sement.lnk = Lnk.default()
+        sement.surface = None
+        sement.identifier = None
+        sement.top = top
+        sement.index = index
+        sement.ltop = ltop
+        sement.holes = holes
+        return sement
+
+    def chain(self, field):
+        """
+        Get one of the SEMENT's fields ('rels', 'variables', 'eqs', 'hcons' or 'icons') as a chain to compose with
+        :param field: name of the field
+        :type field: str
+        :return: chain for the field
+        :rtype: Chain
+        """
+        if self._chains is not None and self._chains[field] is not None:
+            return self._chains[field]
+        value = _MATERIALIZED_FIELDS[field].__get__(self)
+        # it's already been made into a list/dict, which could've been changed since, so continue from a copy of that
+        if value is None:
+            return POGG.persistent.Chain()
+        if field == 'variables':
+            return POGG.persistent.Chain([{var: dict(props) for var, props in value.items()}])
+        return POGG.persistent.Chain(value)
+
+    def snapshot(self):
+        """
+        Cheap copy of the SEMENT that shares its chains, changes made to either one afterwards
+        (e.g. update_index) don't show up in the other
+        :return: copy of the SEMENT
+        :rtype: SEMENT
+        """
+        holes = None if self.holes is None else dict(self.holes)
+        return SEMENT.from_chains(self.top, self.ltop, self.index, self.chain('rels'), self.chain('variables'), holes,
+                                  self.chain('eqs'), self.chain('hcons'), self.chain('icons'))
+
+    def _materialize(self, field):
+        if field == 'pidx':
+            return {p.id: p for p in self.predications}
+
+        chain = self._chains[field]
+        if field == 'rels':
+            rels = list(chain)
+            # same as what the MRS constructor does, EPs can't share an id
+            next_vid = max((variable.id(ep.iv) for ep in rels if ep.iv), default=0)
+            ids = set()
+            for ep in rels:
+                if ep.id in ids:
+                    ep.id = "_{}".format(next_vid)
+                    next_vid += 1
+                ids.add(ep.id)
+            return rels
+        if field == 'variables':
+            new_variables = {}
+            for layer in chain:
+                for var, props in layer.items():
+                    new_variables[var] = dict(props)
+            # same default entries the MRS constructor adds for every variable used in the SEMENT
+            for var in (self.top, self.index):
+                if var is not None:
+                    new_variables.setdefault(var, {})
+            for ep in self.rels:
+                new_variables.setdefault(ep.label, {})
+                for role, value in ep.args.items():
+                    if role != mrs.CONSTANT_ROLE:
+                        new_variables.setdefault(value, {})
+            for hc in self.hcons:
+                new_variables.setdefault(hc.lo, {})
+                new_variables.setdefault(hc.hi, {})
+            for ic in self.icons:
+                new_variables.setdefault(ic.left, {})
+                new_variables.setdefault(ic.right, {})
+            return new_variables
+        return list(chain)
+
+    def to_mrs(self):
+        """
+        Convert to a plain PyDelphin MRS (with plain EPs), e.g. for encoding
+        Composition-only information (LTOP, holes, EQs) isn't included, so overwrite the EQs first
+        :return: MRS with the same TOP, INDEX, rels, HCONS, ICONS, and variables
+        :rtype: mrs.MRS
+        """
+        rels = [mrs.EP(r.predicate, r.label, dict(r.args), r.lnk, r.surface, r.base) for r in self.rels]
+        return mrs.MRS(self.top, self.index, rels, self.hcons, self.icons, self.variables,
+                       self.lnk, self.surface, self.identifier)
+
+
+# the materialized fields of a SEMENT, by the names chain() takes
+_MATERIALIZED_FIELDS = {
+    'rels': SEMENT.predications,
+    'pidx': SEMENT._pidx,
+    'variables': SEMENT.variables,
+    'eqs': SEMENT.eqs,
+    'hcons': SEMENT.hcons,
+    'icons': SEMENT.icons
+}
+
+
+
 
 # global variable labeler for creating new SEMENTS
-# might not want to keep this here, not sure where to instantiate it
-# TODO: shouldn't be an absolute path ... should i make an MRS algebra object...? that seems insane idk
-config = yaml.safe_load(open("/Users/lizcconrad/Documents/PhD/POGG/POGG_project/POGG_src/config_data/global_config.yml"))
-SEMI = semi.load(config['SEMI'])
+# only used when there's no labeler for the current context (see var_labeler_scope)
 VAR_LABELER = VarLabeler()
 
+# labeler for the current context, so each graph (or thread/async task) can number its variables from 0
+_current_var_labeler = contextvars.ContextVar('var_labeler', default=None)
+
+
+def __getattr__(name):
+    # the SEMI is only loaded the first time it's needed (see POGG.config), but mrs_algebra.SEMI still works
+    if name == 'SEMI':
+        return POGG.config.get_SEMI()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def get_var_labeler():
+    """
+    Get the variable labeler for the current context, the global VAR_LABELER if there isn't one
+    :return: variable labeler
+    :rtype: VarLabeler
+    """
+    var_labeler = _current_var_labeler.get()
+    if var_labeler is None:
+        return VAR_LABELER
+    return var_labeler
+
+
+@contextlib.contextmanager
+def var_labeler_scope(var_labeler=None):
+    """
+    Use a separate variable labeler for everything composed inside the with block, e.g. one graph
+    Since it's a context variable, other threads and async tasks keep using their own labelers
+    :param var_labeler: labeler to use, a new one (numbering from 0) if not given
+    :type var_labeler: VarLabeler
+    :return: the labeler in use
+    :rtype: VarLabeler
+    """
+    if var_labeler is None:
+        var_labeler = VarLabeler()
+    token = _current_var_labeler.set(var_labeler)
+    try:
+        yield var_labeler
+    finally:
+        _current_var_labeler.reset(token)
+
 
 def reset_labeler():
-    # TODO: not sure when to use this ...
-    #  but it feels like I should at some point especially after generating tons of MRSes
+    """
+    Start numbering variables from 0 again, for the current context's labeler if there is one
+    """
     global VAR_LABELER
-    VAR_LABELER = VarLabeler()
+    if _current_var_labeler.get() is not None:
+        _current_var_labeler.set(VarLabeler())
+    else:
+        VAR_LABELER = VarLabeler()
+
+
+def alpha_rename(sement, var_labeler=None):
+    """
+    Copy a SEMENT with every variable (handles included) replaced by a fresh one of the same type,
+    so it can be composed alongside the original without their variables being confused
+    :param sement: SEMENT to copy
+    :type sement: SEMENT
+    :param var_labeler: labeler for the fresh variables, the current context's labeler if not given
+    :type var_labeler: VarLabeler
+    :return: renamed copy of the SEMENT
+    :rtype: SEMENT
+    """
+    if var_labeler is None:
+        var_labeler = get_var_labeler()
+
+    renamed = {}
+
+    def rename(var):
+        if var is None:
+            return None
+        new_var = renamed.get(var)
+        if new_var is None:
+            new_var = var_labeler.get_var_name(variable.type(var))
+            renamed[var] = new_var
+        return new_var
+
+    new_top = rename(sement.top)
+    new_ltop = rename(sement.ltop)
+    new_index = rename(sement.index)
+
+    new_seps = []
+    for r in sement.rels:
+        new_args = {}
+        for role, value in r.args.items():
+            # CARG values are constants, not variables
+            new_args[role] = value if role == mrs.CONSTANT_ROLE else rename(value)
+        new_seps.append(SEP(r.predicate, rename(r.label), new_args, r.lnk, r.surface, r.base))
+
+    new_holes = None if sement.holes is None else {hole: rename(var) for hole, var in sement.holes.items()}
+    new_eqs = None if sement.eqs is None else [tuple(rename(var) for var in eq) for eq in sement.eqs]
+    new_hcons = [mrs.HCons(rename(hc.hi), hc.relation, rename(hc.lo)) for hc in sement.hcons]
+    new_icons = [mrs.ICons(rename(ic.left), ic.relation, rename(ic.right)) for ic in sement.icons]
+    new_variables = {rename(var): props for var, props in sement.variables.items()}
+
+    return SEMENT(new_top, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_hcons, new_icons)
 
 
 def get_holes(sep):
@@ -177,6 +556,87 @@ def concretize(var_labeler, synopsis):
     return args_dict
 
 
+class PredicateTemplate:
+    """
+    Everything about a predicate's SEP that's the same every time a base SEMENT is made for it,
+    i.e. its roles and their variable types, which roles are holes (per get_holes), and whether it's a quantifier
+    Built once per predicate from the SEMI so making a new SEP only has to label fresh variables
+    """
+    def __init__(self, predicate, synopsis):
+        """
+        :param predicate: ERG predicate label
+        :type predicate: str
+        :param synopsis: Synopsis of the predicate per the SEMI
+        :type synopsis: Synopsis object from PyDelphin
+        """
+        self.predicate = predicate
+        # (role name, variable type) in SEMI order, e.g. ('ARG0', 'x')
+        # interned, since every SEP of the predicate uses them as its args keys
+        self.roles = tuple((sys.intern(role.name), sys.intern(role.value)) for role in synopsis)
+        role_names = [name for name, var_type in self.roles]
+        # same check as EP.is_quantifier()
+        self.is_quantifier = 'RSTR' in role_names
+        # same rules as get_holes, every role is labeled with a fresh variable so only the role names matter
+        if self.is_quantifier:
+            self.hole_roles = tuple(name for name in role_names if name != 'BODY')
+        else:
+            self.hole_roles = tuple(name for name in role_names if name != 'ARG0')
+
+    def instantiate(self, var_labeler):
+        """
+        Label fresh variables for a new SEP of this predicate
+        :param var_labeler: iterator to label variables
+        :type var_labeler: VarLabeler object
+        :return: new SEP and its holes
+        :rtype: tuple
+        """
+        # same labeling order as before (roles, then the label) so variable numbering doesn't change
+        args = {name: var_labeler.get_var_name(var_type) for name, var_type in self.roles}
+        sep = SEP(self.predicate, var_labeler.get_var_name('h'), args)
+        holes = {role: args[role] for role in self.hole_roles}
+        return sep, holes
+
+
+# predicate -> PredicateTemplate, for the SEMI they were built from
+_predicate_templates = {}
+_predicate_templates_SEMI = None
+
+
+def get_predicate_template(predicate):
+    """
+    Get the template for a predicate, building it from the SEMI the first time the predicate is seen
+    :param predicate: ERG predicate label
+    :type predicate: str
+    :return: template for the predicate
+    :rtype: PredicateTemplate
+    """
+    global _predicate_templates_SEMI
+    SEMI = POGG.config.get_SEMI()
+    # templates from a different SEMI (e.g. after POGG.config.reset()) can't be reused
+    if SEMI is not _predicate_templates_SEMI:
+        _predicate_templates.clear()
+        _predicate_templates_SEMI = SEMI
+
+    template = _predicate_templates.get(predicate)
+    if template is None:
+        try:
+            syn = SEMI.find_synopsis(predicate)
+        except delphin.semi.SemIError:
+            raise ValueError("Couldn't find {} in the SEMI".format(predicate))
+        template = PredicateTemplate(predicate, syn)
+        _predicate_templates[predicate] = template
+    return template
+
+
+def clear_predicate_templates():
+    """
+    Forget every predicate template, they're rebuilt from the SEMI as they're needed
+    """
+    global _predicate_templates_SEMI
+    _predicate_templates.clear()
+    _predicate_templates_SEMI = None
+
+
 def create_base_SEMENT(predicate, variables={}, index_arg='ARG0'):
     """
     Make the base case SEMENT, that is a SEMENT with only one SEP in it before any composition has occurred
@@ -193,17 +653,12 @@ def create_base_SEMENT(predicate, variables={}, index_arg='ARG0'):
     # because _cute_a_1 can be used both as a modifier (want ARG1 as INDEX) and predicatively (want ARG0 as INDEX),
     # this function lets me determine at the time of creating the base SEMENT what's happening
     # so at the time of starting composition that decision will have to be made somehow
-    try:
-        syn = SEMI.find_synopsis(predicate)
-    except delphin.semi.SemIError:
-        raise ValueError("Couldn't find {} in the SEMI".format(predicate))
-
-    # syn = SEMI.find_synopsis(predicate)
-    args = concretize(VAR_LABELER, syn)
-    sep = SEP(predicate, VAR_LABELER.get_var_name('h'), args)
+    # the roles and holes for the predicate are only worked out from the SEMI the first time it's used
+    template = get_predicate_template(predicate)
+    sep, holes = template.instantiate(get_var_labeler())
 
     # for variables, assume that the INDEX variable is the one with the passed in properties (e.g. singular)
-    return SEMENT(None, sep.label, sep.args[index_arg], [sep], {sep.args[index_arg]: variables}, get_holes(sep))
+    return SEMENT(None, sep.label, sep.args[index_arg], [sep], {sep.args[index_arg]: variables}, holes)
 
 
 
@@ -243,17 +698,15 @@ def op_non_scopal(functor, argument, slot_label):
 
     new_holes = {}
 
-    # EQs ... empty list if there are none
-    functor_eqs = [] if functor.eqs is None else functor.eqs
-    argument_eqs = [] if argument.eqs is None else argument.eqs
-
-    # QEQs ... empty list if there are none
-    functor_qeqs = [] if functor.hcons is None else functor.hcons
-    argument_qeqs = [] if argument.hcons is None else argument.hcons
+    # EQs and QEQs (see SEMENT.chain)
+    functor_eqs = functor.chain('eqs')
+    argument_eqs = argument.chain('eqs')
+    functor_qeqs = functor.chain('hcons')
+    argument_qeqs = argument.chain('hcons')
 
-    # add EQs and QEQs together
-    new_eqs = functor_eqs + argument_eqs
-    new_qeqs = functor_qeqs + argument_qeqs
+    # EQs and QEQs added by this composition
+    new_eqs = []
+    new_qeqs = []
 
     # TODO: not sure if this is the best place to put it but whatever
     # if there are no holes, this should fail because nothing can be plugged
@@ -273,16 +726,18 @@ def op_non_scopal(functor, argument, slot_label):
     # also need to add an eq between the LBL of the functor and argument
     new_eqs.append((functor.ltop, argument.ltop))
 
+    # add EQs and QEQs together
+    new_eqs = POGG.persistent.Chain.concat(functor_eqs, argument_eqs, POGG.persistent.Chain(new_eqs))
+    new_qeqs = POGG.persistent.Chain.concat(functor_qeqs, argument_qeqs, POGG.persistent.Chain(new_qeqs))
+
     # SEPS
-    new_seps = functor.rels + argument.rels
+    new_seps = POGG.persistent.Chain.concat(functor.chain('rels'), argument.chain('rels'))
 
-    # Variables
-    new_variables = {}
-    new_variables.update(functor.variables)
-    new_variables.update(argument.variables)
+    # Variables ... argument's override the functor's, same as updating a dict with one then the other
+    new_variables = POGG.persistent.Chain.concat(functor.chain('variables'), argument.chain('variables'))
 
     # None for GTOP, we're not at a final SEMENT yet
-    return SEMENT(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
+    return SEMENT.from_chains(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
 
 
 
@@ -328,17 +783,15 @@ def op_non_scopal_lbl_shared(functor, argument, hole_label):
 
     new_holes = {}
 
-    # EQs ... empty list if there are none
-    functor_eqs = [] if functor.eqs is None else functor.eqs
-    argument_eqs = [] if argument.eqs is None else argument.eqs
-
-    # QEQs ... empty list if there are none
-    functor_qeqs = [] if functor.hcons is None else functor.hcons
-    argument_qeqs = [] if argument.hcons is None else argument.hcons
+    # EQs and QEQs (see SEMENT.chain)
+    functor_eqs = functor.chain('eqs')
+    argument_eqs = argument.chain('eqs')
+    functor_qeqs = functor.chain('hcons')
+    argument_qeqs = argument.chain('hcons')
 
-    # add EQs and QEQs together
-    new_eqs = functor_eqs + argument_eqs
-    new_qeqs = functor_qeqs + argument_qeqs
+    # EQs and QEQs added by this composition
+    new_eqs = []
+    new_qeqs = []
 
     # TODO: not sure if this is the best place to put it but whatever
     # if there are no holes, this should fail because nothing can be plugged
@@ -358,16 +811,18 @@ def op_non_scopal_lbl_shared(functor, argument, hole_label):
     # also need to add an eq between the LBL of the functor and argument
     new_eqs.append((functor.ltop, argument.ltop))
 
+    # add EQs and QEQs together
+    new_eqs = POGG.persistent.Chain.concat(functor_eqs, argument_eqs, POGG.persistent.Chain(new_eqs))
+    new_qeqs = POGG.persistent.Chain.concat(functor_qeqs, argument_qeqs, POGG.persistent.Chain(new_qeqs))
+
     # SEPS
-    new_seps = functor.rels + argument.rels
+    new_seps = POGG.persistent.Chain.concat(functor.chain('rels'), argument.chain('rels'))
 
-    # Variables
-    new_variables = {}
-    new_variables.update(functor.variables)
-    new_variables.update(argument.variables)
+    # Variables ... argument's override the functor's, same as updating a dict with one then the other
+    new_variables = POGG.persistent.Chain.concat(functor.chain('variables'), argument.chain('variables'))
 
     # None for GTOP, we're not at a final SEMENT yet
-    return SEMENT(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
+    return SEMENT.from_chains(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
 
 
 def op_non_scopal_lbl_unshared(functor, argument, hole_label):
@@ -411,17 +866,15 @@ def op_non_scopal_lbl_unshared(functor, argument, hole_label):
 
     new_holes = {}
 
-    # EQs ... empty list if there are none
-    functor_eqs = [] if functor.eqs is None else functor.eqs
-    argument_eqs = [] if argument.eqs is None else argument.eqs
+    # EQs and QEQs (see SEMENT.chain)
+    functor_eqs = functor.chain('eqs')
+    argument_eqs = argument.chain('eqs')
+    functor_qeqs = functor.chain('hcons')
+    argument_qeqs = argument.chain('hcons')
 
-    # QEQs ... empty list if there are none
-    functor_qeqs = [] if functor.hcons is None else functor.hcons
-    argument_qeqs = [] if argument.hcons is None else argument.hcons
-
-    # add EQs and QEQs together
-    new_eqs = functor_eqs + argument_eqs
-    new_qeqs = functor_qeqs + argument_qeqs
+    # EQs and QEQs added by this composition
+    new_eqs = []
+    new_qeqs = []
 
     # TODO: not sure if this is the best place to put it but whatever
     # if there are no holes, this should fail because nothing can be plugged
@@ -438,16 +891,18 @@ def op_non_scopal_lbl_unshared(functor, argument, hole_label):
         else:
             new_eqs.append((argument.index, functor.holes[hole]))
 
+    # add EQs and QEQs together
+    new_eqs = POGG.persistent.Chain.concat(functor_eqs, argument_eqs, POGG.persistent.Chain(new_eqs))
+    new_qeqs = POGG.persistent.Chain.concat(functor_qeqs, argument_qeqs, POGG.persistent.Chain(new_qeqs))
+
     # SEPS
-    new_seps = functor.rels + argument.rels
+    new_seps = POGG.persistent.Chain.concat(functor.chain('rels'), argument.chain('rels'))
 
-    # Variables
-    new_variables = {}
-    new_variables.update(functor.variables)
-    new_variables.update(argument.variables)
+    # Variables ... argument's override the functor's, same as updating a dict with one then the other
+    new_variables = POGG.persistent.Chain.concat(functor.chain('variables'), argument.chain('variables'))
 
     # None for GTOP, we're not at a final SEMENT yet
-    return SEMENT(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
+    return SEMENT.from_chains(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
 
 
 # TODO: add hole_label, like 'believes' ... not just RSTR
@@ -493,17 +948,15 @@ def op_scopal(scoping, scoped):
 
     new_holes = {}
 
-    # EQs ... empty list if there are none
-    functor_eqs = [] if functor.eqs is None else functor.eqs
-    argument_eqs = [] if argument.eqs is None else argument.eqs
-
-    # QEQs ... empty list if there are none
-    functor_qeqs = [] if functor.hcons is None else functor.hcons
-    argument_qeqs = [] if argument.hcons is None else argument.hcons
+    # EQs and QEQs (see SEMENT.chain)
+    functor_eqs = functor.chain('eqs')
+    argument_eqs = argument.chain('eqs')
+    functor_qeqs = functor.chain('hcons')
+    argument_qeqs = argument.chain('hcons')
 
-    # add EQs and QEQs together
-    new_eqs = functor_eqs + argument_eqs
-    new_qeqs = functor_qeqs + argument_qeqs
+    # EQs and QEQs added by this composition
+    new_eqs = []
+    new_qeqs = []
 
     # TODO: not sure if this is the best place to put it but whatever
     # if there are no holes, this should fail because nothing can be plugged
@@ -524,16 +977,18 @@ def op_scopal(scoping, scoped):
     # add a qeq between the RESTR of functor and LBL of argument
     new_qeqs.append(mrs.HCons(functor.holes['RSTR'], 'qeq', argument.ltop))
 
+    # add EQs and QEQs together
+    new_eqs = POGG.persistent.Chain.concat(functor_eqs, argument_eqs, POGG.persistent.Chain(new_eqs))
+    new_qeqs = POGG.persistent.Chain.concat(functor_qeqs, argument_qeqs, POGG.persistent.Chain(new_qeqs))
+
     # seps... union of both
-    new_seps = functor.rels + argument.rels
+    new_seps = POGG.persistent.Chain.concat(functor.chain('rels'), argument.chain('rels'))
 
-    # Variables
-    new_variables = {}
-    new_variables.update(functor.variables)
-    new_variables.update(argument.variables)
+    # Variables ... argument's override the functor's, same as updating a dict with one then the other
+    new_variables = POGG.persistent.Chain.concat(functor.chain('variables'), argument.chain('variables'))
 
     # None for GTOP, we're not at a final SEMENT yet
-    return SEMENT(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
+    return SEMENT.from_chains(None, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
 
 
 def op_final(wrapper_SEMENT, full_SEMENT, final_top_label):
@@ -578,17 +1033,15 @@ def op_final(wrapper_SEMENT, full_SEMENT, final_top_label):
 
     new_holes = {}
 
-    # EQs ... empty list if there are none
-    functor_eqs = [] if functor.eqs is None else functor.eqs
-    argument_eqs = [] if argument.eqs is None else argument.eqs
+    # EQs and QEQs (see SEMENT.chain)
+    functor_eqs = functor.chain('eqs')
+    argument_eqs = argument.chain('eqs')
+    functor_qeqs = functor.chain('hcons')
+    argument_qeqs = argument.chain('hcons')
 
-    # QEQs ... empty list if there are none
-    functor_qeqs = [] if functor.hcons is None else functor.hcons
-    argument_qeqs = [] if argument.hcons is None else argument.hcons
-
-    # add EQs and QEQs together
-    new_eqs = functor_eqs + argument_eqs
-    new_qeqs = functor_qeqs + argument_qeqs
+    # EQs and QEQs added by this composition
+    new_eqs = []
+    new_qeqs = []
 
     for hole in functor.holes:
         # if it's not the labeled hole add it to the new list of holes
@@ -602,14 +1055,16 @@ def op_final(wrapper_SEMENT, full_SEMENT, final_top_label):
     # add a qeq between the new GTOP and the LBL on the 'unknown' predicate
     new_qeqs.append(mrs.HCons(final_top_label, 'qeq', functor.ltop))
 
+    # add EQs and QEQs together
+    new_eqs = POGG.persistent.Chain.concat(functor_eqs, argument_eqs, POGG.persistent.Chain(new_eqs))
+    new_qeqs = POGG.persistent.Chain.concat(functor_qeqs, argument_qeqs, POGG.persistent.Chain(new_qeqs))
+
     # seps... union of both
-    new_seps = functor.rels + argument.rels
+    new_seps = POGG.persistent.Chain.concat(functor.chain('rels'), argument.chain('rels'))
 
-    # Variables
-    new_variables = {}
-    new_variables.update(functor.variables)
-    new_variables.update(argument.variables)
+    # Variables ... argument's override the functor's, same as updating a dict with one then the other
+    new_variables = POGG.persistent.Chain.concat(functor.chain('variables'), argument.chain('variables'))
 
-    return SEMENT(new_top, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
+    return SEMENT.from_chains(new_top, new_ltop, new_index, new_seps, new_variables, new_holes, new_eqs, new_qeqs)
 
 
@@ -1,15 +1,27 @@
 # contains helper functions for composing MRS and generating from MRS
 # ORGANIZED: 01/30/2024
 # DOCUMENTED: 01/30/2024
-import yaml
-from delphin import ace, mrs
+from delphin import mrs, predicate, variable
 from delphin.codecs import simplemrs
 import POGG.mrs_algebra
-import copy
+import POGG.ace_pool
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import json
 from tabulate import tabulate
 import re
 
 
+def _regularize_predicate(predicate_label):
+    # every quantifier counts as the same one when comparing, since which one gets picked often doesn't matter
+    if re.search("_q$", predicate_label):
+        return 'abstract_q'
+    return predicate_label
+
+
 def _make_rels_list(s):
     rels_list = list()
     for r in s.rels:
@@ -117,9 +129,7 @@ def _get_var_equivalencies(s_dicts):
 
         # get equivalencies for s
         for pred in s_var_dict[var]:
-            regularized_pred = s_pred_arg_dict[pred]['predicate_label']
-            if re.search("_q$", regularized_pred):
-                regularized_pred = 'abstract_q'
+            regularized_pred = _regularize_predicate(s_pred_arg_dict[pred]['predicate_label'])
 
             for arg in s_var_dict[var][pred]:
                 pred_arg = "{}__{}".format(pred, arg)
@@ -133,117 +143,6 @@ def _get_var_equivalencies(s_dicts):
     return all_equivalencies, all_regularized_equivalencies
 
 
-def _check_var_equivalencies(s1_dicts, s2_dicts):
-    s1_var_dict = s1_dicts[0]
-    s1_pred_arg_dict = s1_dicts[1]
-
-    s2_var_dict = s2_dicts[0]
-    s2_pred_arg_dict = s2_dicts[1]
-
-    # for each variable in s1...
-    for var in s1_var_dict:
-        # ... get each ARG it fills ...
-        # just a list of ARGs filled by the variable
-        target_equivalencies = list()
-        target_regularized_equivalencies = list()
-
-        actual_equivalencies = list()
-        actual_regularized_equivalencies = list()
-
-        # dict of every variable the created (or other) SEMENT has for the target ARGs
-        # ideally should end up with one key only, but if not, there's a missing equivalency
-        # PARALLEL LISTS...
-
-
-        # get equivalencies for s1
-        for pred in s1_var_dict[var]:
-            regularized_pred = s1_pred_arg_dict[pred]['predicate_label']
-            if re.search("_q$", regularized_pred):
-                regularized_pred = 'abstract_q'
-
-            for arg in s1_var_dict[var][pred]:
-                pred_arg = "{}__{}".format(pred, arg)
-                regularized_pred_arg = "{}__{}".format(regularized_pred, arg)
-                target_equivalencies.append(pred_arg)
-                target_regularized_equivalencies.append(regularized_pred_arg)
-
-                # for each variable in s1...
-                for var in s1_var_dict:
-                    # ... get each ARG it fills ...
-                    # just a list of ARGs filled by the variable
-
-
-                    actual_equivalencies = list()
-                    actual_regularized_equivalencies = list()
-
-                    # dict of every variable the created (or other) SEMENT has for the target ARGs
-                    # ideally should end up with one key only, but if not, there's a missing equivalency
-                    # PARALLEL LISTS...
-
-                    # get equivalencies for s1
-                    for pred in s1_var_dict[var]:
-                        regularized_pred = s1_pred_arg_dict[pred]['predicate_label']
-                        if re.search("_q$", regularized_pred):
-                            regularized_pred = 'abstract_q'
-
-                        for arg in s1_var_dict[var][pred]:
-                            pred_arg = "{}__{}".format(pred, arg)
-                            regularized_pred_arg = "{}__{}".format(regularized_pred, arg)
-                            target_equivalencies.append(pred_arg)
-                            target_regularized_equivalencies.append(regularized_pred_arg)
-
-            # TARGET_EQUIVALENCIES ESTABLISHED...
-
-
-            # # look for candidates in s2_pred_arg_dict
-            # for cand_pred in s2_pred_arg_dict:
-            #     if s2_pred_arg_dict[cand_pred]['predicate_label'] == regularized_pred:
-            #         cand_var = s2_pred_arg_dict[cand_pred][arg]
-            #
-            #         # if cand_var already in current_equivalencies, skip
-            #         if cand_var in current_equivalencies:
-            #             continue
-            #
-            #         for pred2 in s2_var_dict[cand_var]:
-            #             regularized_pred2 = s2_pred_arg_dict[pred2]['predicate_label']
-            #             for arg2 in s2_var_dict[cand_var][pred2]:
-            #                 current_equivalencies[cand_var].add("{}__{}".format(pred2, arg2))
-            #                 current_regularized_equivalencies[cand_var].add("{}__{}".format(regularized_pred2, arg2))
-            #         candidate_actual_equivalencies.append(current_equivalencies)
-            #         candidate_regularized_actual_equivalencies.append(current_regularized_equivalencies)
-
-
-                # FOR EVERY POSSIBLE RELATION THAT *COULD* BE A MATCH...
-                # if i find a match, then assume it's correct and add as normal and skip other candidates
-                # if i *dont* find a match
-
-                # actual_var = s2_pred_arg_dict[pred][arg]
-                # if actual_var not in actual_equivalencies:
-                #     actual_equivalencies[actual_var] = set()
-                #     actual_equivalencies[actual_var].add("{}__{}".format(pred, arg))
-                # else:
-                #     actual_equivalencies[actual_var].add("{}__{}".format(pred, arg))
-                # # add any other equivalencies with actual_var
-                # # this is technically redundant but this will catch those that are equivalent that *shouldn't* be
-                # for pred2 in s2_var_dict[actual_var]:
-                #     for arg2 in s2_var_dict[actual_var][pred2]:
-                #         actual_equivalencies[actual_var].add("{}__{}".format(pred2, arg2))
-
-        # # check set equivalency
-        # if len(actual_equivalencies) == 1:
-        #     key = list(actual_equivalencies.keys())[0]
-        #     if target_equivalencies == actual_equivalencies[key]:
-        #         continue
-        #     else:
-        #         print("Composed SEMENT has additional equivalencies...")
-        #         print("Target SEMENT equivalencies:{}".format(sorted(list(target_equivalencies))))
-        #         print("Composed SEMENT equivalencies:{}\n".format(sorted(list(actual_equivalencies[key]))))
-        # else:
-        #     print("Composed SEMENT doesn't contain appropriate equivalencies...")
-        #     print("Target SEMENT equivalencies:{}".format(sorted(list(target_equivalencies))))
-        #     print("Composed SEMENT variables:{}\n".format(actual_equivalencies))
-
-
 def _make_hcon_list(s, s_var_dict, s_pred_arg_dict):
     # TODO: make these into tuples for comparison i guess idk ... god ... puking
     full_hcons = list()
@@ -256,10 +155,9 @@ def _make_hcon_list(s, s_var_dict, s_pred_arg_dict):
 
         hi_string_full = ""
         hi_string_reg = ""
-        for pred in sorted(list(s_var_dict[hi_var].keys())):
-            regularized_pred = s_pred_arg_dict[pred]['predicate_label']
-            if re.search("_q$", regularized_pred):
-                regularized_pred = 'abstract_q'
+        # a handle no EP fills (e.g. the RSTR of a quantifier that's missing) has nothing to list
+        for pred in sorted(list(s_var_dict.get(hi_var, {}).keys())):
+            regularized_pred = _regularize_predicate(s_pred_arg_dict[pred]['predicate_label'])
 
             hi_string_full += "__{}_".format(pred)
             hi_string_reg += "__{}_".format(regularized_pred)
@@ -269,10 +167,8 @@ def _make_hcon_list(s, s_var_dict, s_pred_arg_dict):
 
         lo_string_full = ""
         lo_string_reg = ""
-        for pred in sorted(list(s_var_dict[lo_var].keys())):
-            regularized_pred = s_pred_arg_dict[pred]['predicate_label']
-            if re.search("_q$", regularized_pred):
-                regularized_pred = 'abstract_q'
+        for pred in sorted(list(s_var_dict.get(lo_var, {}).keys())):
+            regularized_pred = _regularize_predicate(s_pred_arg_dict[pred]['predicate_label'])
 
             lo_string_full += "__{}_".format(pred)
             lo_string_reg += "__{}_".format(regularized_pred)
@@ -290,133 +186,298 @@ def _make_hcon_list(s, s_var_dict, s_pred_arg_dict):
 
 
 
-def find_discrepancy(s1, s2, file):
-    # check if isomorphic
-    if mrs.is_isomorphic(s1, s2, properties=False):
-        file.write("SEMENTs are isomorphic!\n")
+# most rounds of refinement mrs_fingerprint does, each one takes in the neighbourhood one edge further out
+FINGERPRINT_ROUNDS = 3
+
+
+def _isomorphism_graph(m, properties):
+    # the graph mrs.is_isomorphic matches up, built the same way (so isomorphic MRSs always get the same fingerprint):
+    # variables and EPs are nodes, EPs are labelled with their predicate (and CARG or properties),
+    # and there are edges from each EP to its arguments, from each scope label to its EPs, and for HCONS and ICONS,
+    # along with an inverse of each edge, so matching up nodes looks at edges in and out
+    # node -> {None: label, neighbour: edge label}
+    graph = {('v', var): {} for var in m.variables}
+    for i, ep in enumerate(m.rels):
+        node = ('p', i)
+        label = predicate.normalize(ep.predicate)
+        props = m.variables.get(ep.iv or "")
+        if ep.carg is not None:
+            label += "({})".format(ep.carg)
+        elif properties and props:
+            label += "{" + "|".join("{}={}".format(prop.upper(), props[prop].lower()) for prop in sorted(props)) + "}"
+        graph[node] = {None: label}
+        graph.setdefault(('v', ep.label), {})[node] = "eq-scope"
+        for role in ep.args:
+            if role != mrs.CONSTANT_ROLE:
+                target = ('v', ep.args[role])
+                graph.setdefault(target, {})
+                graph[node][target] = " ".join(sorted([*graph[node].get(target, "").split(), role]))
+    for hc in m.hcons:
+        graph.setdefault(('v', hc.hi), {})[('v', hc.lo)] = str(hc.relation)
+        graph.setdefault(('v', hc.lo), {})
+    for ic in m.icons:
+        graph.setdefault(('v', ic.left), {})[('v', ic.right)] = str(ic.relation)
+        graph.setdefault(('v', ic.right), {})
+
+    inverse = {}
+    for source, edges in graph.items():
+        for target, edge_label in edges.items():
+            if target is not None and source != target:
+                inverse.setdefault(target, {})[source] = "--" + edge_label
+    for node, edges in inverse.items():
+        graph[node].update(edges)
+    return graph
+
+
+def mrs_fingerprint(m, properties=True):
+    """
+    Get a hash of an MRS (or SEMENT) that's the same for every MRS it's isomorphic to (see mrs.is_isomorphic),
+    i.e. it covers the predicates, argument structure, scope, HCONS, ICONS, and optionally the EPs' properties,
+    but not how the variables are named or what order the EPs are in
+    MRSs with different fingerprints are never isomorphic, ones with the same fingerprint almost always are
+    (this is Weisfeiler-Lehman refinement, which can't tell a few very symmetric structures apart)
+    :param m: MRS or SEMENT
+    :type m: MRS
+    :param properties: whether the EPs' variable properties count, as for mrs.is_isomorphic
+    :type properties: bool
+    :return: hex digest
+    :rtype: str
+    """
+    graph = _isomorphism_graph(m, properties)
+    neighbours = {node: [(edge_label, neighbour) for neighbour, edge_label in edges.items() if neighbour is not None]
+                  for node, edges in graph.items()}
+    signatures = {node: edges.get(None, "") for node, edges in graph.items()}
+    rounds = []
+    distinct = 0
+    # relabel every node by its label and its neighbours' labels until that stops telling any more nodes apart
+    # (or for FINGERPRINT_ROUNDS rounds, which is plenty to tell apart nearly every pair of MRSs that aren't isomorphic)
+    # labels are numbered by where they come in that round's sorted labels, which only means the same thing for two MRSs
+    # if every round up to then was the same for both, so every round goes into the fingerprint
+    for _ in range(FINGERPRINT_ROUNDS + 1):
+        rounds.append(sorted(signatures.values()))
+        numbers = {signature: i for i, signature in enumerate(sorted(set(signatures.values())))}
+        if len(numbers) == distinct:
+            break
+        distinct = len(numbers)
+        labels = {node: numbers[signature] for node, signature in signatures.items()}
+        signatures = {node: (labels[node], tuple(sorted((edge_label, labels[neighbour])
+                                                        for edge_label, neighbour in neighbours[node])))
+                      for node in graph}
+    fingerprint = [len(m.rels), len(m.hcons), len(m.icons), len(m.variables), rounds]
+    return hashlib.sha1(repr(fingerprint).encode('utf-8')).hexdigest()
+
+
+def is_isomorphic(m1, m2, properties=True):
+    """
+    Check whether two MRSs (or SEMENTs) are isomorphic, same as mrs.is_isomorphic,
+    but MRSs with different fingerprints (see mrs_fingerprint) are turned down without searching for an isomorphism
+    :param m1: MRS or SEMENT
+    :type m1: MRS
+    :param m2: MRS or SEMENT
+    :type m2: MRS
+    :param properties: whether the EPs' variable properties have to match
+    :type properties: bool
+    :return: True if the MRSs are isomorphic
+    :rtype: bool
+    """
+    # the same quick checks mrs.is_isomorphic starts with, which are cheaper than a fingerprint
+    if len(m1.rels) != len(m2.rels) or len(m1.hcons) != len(m2.hcons) or len(m1.icons) != len(m2.icons) \
+            or len(m1.variables) != len(m2.variables):
+        return False
+    if mrs_fingerprint(m1, properties) != mrs_fingerprint(m2, properties):
         return False
+    return mrs.is_isomorphic(m1, m2, properties=properties)
 
-    # s1_string = simplemrs.encode(s1, indent=True)
-    # s2_string = simplemrs.encode(s2, indent=True)
-    # file.write("TARGET SEMENT:\n{}\n\n".format(s1_string))
-    # file.write("COMPOSED SEMENT:\n{}\n\n".format(s2_string))
+
+def find_isomorphic(m, candidates, properties=True):
+    """
+    Find the MRSs in a list that are isomorphic to an MRS (e.g. a composed MRS and every ERG parse of the string it
+    should generate), only checking for an isomorphism against candidates with the same fingerprint
+    :param m: MRS or SEMENT
+    :type m: MRS
+    :param candidates: MRSs or SEMENTs to look through
+    :type candidates: list
+    :param properties: whether the EPs' variable properties have to match
+    :type properties: bool
+    :return: positions in candidates of the MRSs isomorphic to m
+    :rtype: list
+    """
+    fingerprint = mrs_fingerprint(m, properties)
+    return [i for i, candidate in enumerate(candidates)
+            if mrs_fingerprint(candidate, properties) == fingerprint
+            and mrs.is_isomorphic(m, candidate, properties=properties)]
+
+
+def _unmatched(first, second):
+    """
+    Match up equal items between two lists, each item matching at most one item in the other list
+    (earlier items are matched first), using a lookup by item instead of searching the other list for every item
+    :param first: list of hashable items
+    :type first: list
+    :param second: list of hashable items
+    :type second: list
+    :return: positions of the items in first that weren't matched, and of those in second that weren't matched
+    :rtype: list, list
+    """
+    positions = {}
+    for j, item in enumerate(second):
+        positions.setdefault(item, collections.deque()).append(j)
+    matched = [False] * len(second)
+    first_unmatched = []
+    for i, item in enumerate(first):
+        if positions.get(item):
+            matched[positions[item].popleft()] = True
+        else:
+            first_unmatched.append(i)
+    return first_unmatched, [j for j, is_matched in enumerate(matched) if not is_matched]
+
+
+class MRSDiscrepancy:
+    """
+    Differences between a target MRS (e.g. the ERG's parse of the string it should generate) and a composed one,
+    see diff_mrs. Each list has what's in one MRS but not the other
+    Equalities and HCONS are only compared when both MRSs have the same RELs (counting every quantifier as the same),
+    since otherwise the RELs are what's wrong
+    """
+    def __init__(self, isomorphic=False, missing_rels=(), extra_rels=(), missing_equalities=(), extra_equalities=(),
+                 missing_hcons=(), extra_hcons=()):
+        """
+        :param isomorphic: whether the MRSs are isomorphic (nothing else is filled in if they are)
+        :type isomorphic: bool
+        :param missing_rels: predicates in the target MRS but not the composed one
+        :type missing_rels: list
+        :param extra_rels: predicates in the composed MRS but not the target one
+        :type extra_rels: list
+        :param missing_equalities: (regularized, full) pairs for each variable in the target MRS whose set of
+        predicate__ARG slots isn't filled by one variable in the composed MRS
+        :type missing_equalities: list
+        :param extra_equalities: same, the other way around
+        :type extra_equalities: list
+        :param missing_hcons: (regularized, full) pairs for HCONS in the target MRS but not the composed one
+        :type missing_hcons: list
+        :param extra_hcons: same, the other way around
+        :type extra_hcons: list
+        """
+        self.isomorphic = isomorphic
+        self.missing_rels = list(missing_rels)
+        self.extra_rels = list(extra_rels)
+        self.missing_equalities = list(missing_equalities)
+        self.extra_equalities = list(extra_equalities)
+        self.missing_hcons = list(missing_hcons)
+        self.extra_hcons = list(extra_hcons)
+
+    @property
+    def same_rels(self):
+        return not self.missing_rels and not self.extra_rels
+
+    def write(self, file):
+        """
+        Write the differences out for error analysis
+        :param file: file to write to
+        :type file: file
+        """
+        if self.isomorphic:
+            file.write("SEMENTs are isomorphic!\n")
+            return
+
+        if not self.same_rels:
+            file.write("SEMENTs don't contain the same RELs\n")
+            file.write("Extra Target RELs: {}\n\n".format(self.missing_rels))
+            file.write("Extra Composed RELs: {}\n\n".format(self.extra_rels))
+            return
+
+        # print equivalencies not found in both
+        file.write("Equivalencies in TARGET SEMENT not found in COMPOSED SEMENT:\n")
+        for reg_equiv, full_equiv in self.missing_equalities:
+            # regularized equiv_element in parallel
+            file.write("{}\n\n".format(tabulate(list(zip(reg_equiv, full_equiv)), headers=["REGULARIZED", "FULL"])))
+
+        file.write("\nEquivalencies in COMPOSED SEMENT not found in TARGET SEMENT:\n")
+        for reg_equiv, full_equiv in self.extra_equalities:
+            file.write("{}\n\n".format(tabulate(list(zip(reg_equiv, full_equiv)), headers=["REGULARIZED", "FULL"])))
+
+        file.write("\n\nHCONs in TARGET SEMENT not found in COMPOSED SEMENT:\n")
+        for reg_hcon, full_hcon in self.missing_hcons:
+            file.write("\tREGULARIZED: {} ={}= {}\n".format(reg_hcon[0], reg_hcon[1], reg_hcon[2]))
+            file.write("\tFULL: {} ={}= {}\n\n".format(full_hcon[0], full_hcon[1], full_hcon[2]))
+
+        file.write("\nHCONs in COMPOSED SEMENT not found in TARGET SEMENT:\n")
+        for reg_hcon, full_hcon in self.extra_hcons:
+            file.write("\tREGULARIZED: {} ={}= {}\n".format(reg_hcon[0], reg_hcon[1], reg_hcon[2]))
+            file.write("\tFULL: {} ={}= {}\n\n".format(full_hcon[0], full_hcon[1], full_hcon[2]))
+
+
+def diff_mrs(s1, s2):
+    """
+    Find what's different between a target MRS (or SEMENT) and a composed one
+    Each MRS is indexed once (variable -> the predicate ARGs it fills, and predicate -> ARG -> variable)
+    and the two are matched up by lookups, so it takes time linear in the size of the MRSs
+    :param s1: target MRS
+    :type s1: MRS
+    :param s2: composed MRS
+    :type s2: MRS
+    :return: differences between the two
+    :rtype: MRSDiscrepancy
+    """
+    # check if isomorphic
+    # MRSs with different predicates can't be, which is much quicker to find out than searching for an isomorphism
+    same_predicates = collections.Counter(predicate.normalize(r.predicate) for r in s1.rels) == \
+        collections.Counter(predicate.normalize(r.predicate) for r in s2.rels)
+    if same_predicates and is_isomorphic(s1, s2, properties=False):
+        return MRSDiscrepancy(isomorphic=True)
 
     # check for same RELS ...
     s1_rels = _make_rels_list(s1)
     s2_rels = _make_rels_list(s2)
-
-    if _make_rels_list(s1) != _make_rels_list(s2):
-        s1_mutable_rels = copy.copy(s1_rels)
-        s2_mutable_rels = copy.copy(s2_rels)
-
-        for rel in s1_rels:
-            s1_ind = s1_mutable_rels.index(rel)
-            if rel in s2_mutable_rels:
-                s2_ind = s2_mutable_rels.index(rel)
-
-                # remove from s1 and s2 lists because a match was found
-                s1_mutable_rels.pop(s1_ind)
-                s2_mutable_rels.pop(s2_ind)
-            elif re.search("_q$", rel):
-                # if the rel from s1 ends in _q, just pop any quantifier out of s2
-                # TODO: not the best but just assuming if the MRSs have the same # of quantifiers they have same RELs
-                q_index_list = [i for i, item in enumerate(s2_mutable_rels) if re.search('_q$', item)]
-                # just get the first one it found
-                try:
-                    q_index = q_index_list[0]
-                    s2_mutable_rels.pop(q_index)
-                    s1_mutable_rels.pop(s1_ind)
-                except:
-                    pass
-
-        if len(s2_mutable_rels) > 0 or len(s1_mutable_rels) > 0:
-            file.write("SEMENTs don't contain the same RELs\n")
-            file.write("Extra Target RELs: {}\n\n".format(s1_mutable_rels))
-            file.write("Extra Composed RELs: {}\n\n".format(s2_mutable_rels))
-            return True
+    s1_extra, s2_extra = _unmatched(s1_rels, s2_rels)
+    # a quantifier left over in s1 matches any quantifier left over in s2
+    s1_extra_q = [i for i in s1_extra if re.search("_q$", s1_rels[i])]
+    s2_extra_q = [i for i in s2_extra if re.search("_q$", s2_rels[i])]
+    s1_paired = set(s1_extra_q[:len(s2_extra_q)])
+    s2_paired = set(s2_extra_q[:len(s1_extra_q)])
+    missing_rels = [s1_rels[i] for i in s1_extra if i not in s1_paired]
+    extra_rels = [s2_rels[i] for i in s2_extra if i not in s2_paired]
+    if missing_rels or extra_rels:
+        return MRSDiscrepancy(missing_rels=missing_rels, extra_rels=extra_rels)
 
     # make var dicts
     s1_dicts = _make_var_dicts(s1)
     s2_dicts = _make_var_dicts(s2)
 
     # check variable equivalencies...
-    # _check_var_equivalencies(s1_dicts, s2_dicts)
     s1_full_equivs, s1_reg_equivs = _get_var_equivalencies(s1_dicts)
     s2_full_equivs, s2_reg_equivs = _get_var_equivalencies(s2_dicts)
-
-    s1_mutable_full_equivs = copy.copy(s1_full_equivs)
-    s1_mutable_reg_equivs = copy.copy(s1_reg_equivs)
-    s2_mutable_full_equivs = copy.copy(s2_full_equivs)
-    s2_mutable_reg_equivs = copy.copy(s2_reg_equivs)
-
-    for reg_equiv in s1_reg_equivs:
-        s1_ind = s1_mutable_reg_equivs.index(reg_equiv)
-        if reg_equiv in s2_mutable_reg_equivs:
-            s2_ind = s2_mutable_reg_equivs.index(reg_equiv)
-
-            # remove from s1 and s2 lists because a match was found
-            s1_mutable_full_equivs.pop(s1_ind)
-            s1_mutable_reg_equivs.pop(s1_ind)
-            s2_mutable_full_equivs.pop(s2_ind)
-            s2_mutable_reg_equivs.pop(s2_ind)
-
-    # print equivalencies not found in both
-    file.write("Equivalencies in TARGET SEMENT not found in COMPOSED SEMENT:\n")
-    for i, equiv in enumerate(s1_mutable_full_equivs):
-        equiv_table = []
-        for j, equiv_elem in enumerate(equiv):
-            # get regularized equiv_element in parallel
-            reg_equiv_elem = s1_mutable_reg_equivs[i][j]
-            equiv_table.append([reg_equiv_elem, equiv_elem])
-        file.write("{}\n\n".format(tabulate(equiv_table, headers=["REGULARIZED", "FULL"])))
-
-    file.write("\nEquivalencies in COMPOSED SEMENT not found in TARGET SEMENT:\n")
-    for i, equiv in enumerate(s2_mutable_full_equivs):
-        equiv_table = []
-        for j, equiv_elem in enumerate(equiv):
-            # get regularized equiv_element in parallel
-            reg_equiv_elem = s2_mutable_reg_equivs[i][j]
-            equiv_table.append([reg_equiv_elem, equiv_elem])
-        file.write("{}\n\n".format(tabulate(equiv_table, headers=["REGULARIZED", "FULL"])))
-
+    s1_extra, s2_extra = _unmatched([tuple(e) for e in s1_reg_equivs], [tuple(e) for e in s2_reg_equivs])
+    missing_equalities = [(s1_reg_equivs[i], s1_full_equivs[i]) for i in s1_extra]
+    extra_equalities = [(s2_reg_equivs[i], s2_full_equivs[i]) for i in s2_extra]
 
     # check qeq equivalencies...
     # pass in SEMENT to access HCONS and the var_dict to convert the qeqs to readable format
     s1_full_hcons, s1_reg_hcons = _make_hcon_list(s1, s1_dicts[0], s1_dicts[1])
     s2_full_hcons, s2_reg_hcons = _make_hcon_list(s2, s2_dicts[0], s2_dicts[1])
+    s1_extra, s2_extra = _unmatched(s1_reg_hcons, s2_reg_hcons)
+    missing_hcons = [(s1_reg_hcons[i], s1_full_hcons[i]) for i in s1_extra]
+    extra_hcons = [(s2_reg_hcons[i], s2_full_hcons[i]) for i in s2_extra]
 
-    s1_mutable_full_hcons = copy.copy(s1_full_hcons)
-    s1_mutable_reg_hcons = copy.copy(s1_reg_hcons)
-    s2_mutable_full_hcons = copy.copy(s2_full_hcons)
-    s2_mutable_reg_hcons = copy.copy(s2_reg_hcons)
-
-    for reg_hcon in s1_reg_hcons:
-        s1_ind = s1_mutable_reg_hcons.index(reg_hcon)
-        if reg_hcon in s2_reg_hcons:
-            s2_ind = s2_mutable_reg_hcons.index(reg_hcon)
-
-            # remove from s1 and s2 lists because a match was found
-            s1_mutable_full_hcons.pop(s1_ind)
-            s1_mutable_reg_hcons.pop(s1_ind)
-            s2_mutable_full_hcons.pop(s2_ind)
-            s2_mutable_reg_hcons.pop(s2_ind)
+    return MRSDiscrepancy(missing_equalities=missing_equalities, extra_equalities=extra_equalities,
+                          missing_hcons=missing_hcons, extra_hcons=extra_hcons)
 
-    # print equivalencies not found in both
-    file.write("\n\nHCONs in TARGET SEMENT not found in COMPOSED SEMENT:\n")
-    for i in range(len(s1_mutable_full_hcons)):
-        file.write("\tREGULARIZED: {} ={}= {}\n".format(s1_mutable_reg_hcons[i][0], s1_mutable_reg_hcons[i][1],
-                                                 s1_mutable_reg_hcons[i][2]))
-        file.write("\tFULL: {} ={}= {}\n\n".format(s1_mutable_full_hcons[i][0], s1_mutable_full_hcons[i][1],
-                                          s1_mutable_full_hcons[i][2]))
 
-    file.write("\nHCONs in COMPOSED SEMENT not found in TARGET SEMENT:\n")
-    for i in range(len(s2_mutable_full_hcons)):
-        file.write("\tREGULARIZED: {} ={}= {}\n".format(s2_mutable_reg_hcons[i][0], s2_mutable_reg_hcons[i][1],
-                                                 s2_mutable_reg_hcons[i][2]))
-        file.write("\tFULL: {} ={}= {}\n\n".format(s2_mutable_full_hcons[i][0], s2_mutable_full_hcons[i][1],
-                                          s2_mutable_full_hcons[i][2]))
-
-    return True
+def find_discrepancy(s1, s2, file):
+    """
+    Write what's different between a target MRS (or SEMENT) and a composed one to a file, see diff_mrs
+    :param s1: target MRS
+    :type s1: MRS
+    :param s2: composed MRS
+    :type s2: MRS
+    :param file: file to write to
+    :type file: file
+    :return: True if the MRSs aren't isomorphic
+    :rtype: bool
+    """
+    discrepancy = diff_mrs(s1, s2)
+    discrepancy.write(file)
+    return not discrepancy.isomorphic
 
 
 def check_if_quantified(check_SEMENT):
@@ -485,55 +546,15 @@ def group_equalities(eqs):
     """
     Group equalities from a list of EQs into lists as opposed to individual equalities
     That is, if x1=x2 and x2=x3 create a list [x1, x2, x3] such that they're in an equality "group"
+    The list of EQs is left as is
     :param eqs: List of eqs
     :type eqs: list
     :return: new_sets, list of EQ groups
     :rtype: list
     """
-    new_sets = []
-    # as long as there are eqs still not covered
-    while eqs:
-        # pop one eq off the list
-        current_eq = eqs.pop()
-        # flag for whether a new group is needed
-        need_new = True
-        # for every set in the list of new_sets,
-        # THIS DOESN'T WORK BECAUSE (x1,x2) makes new set, (x3,x4) makes new set
-        # BUT WHAT IF (x2,x3)
-        # so...
-        # which new sets are the eq members found in
-        new_sets_found_in = []
-        for i, new_set in enumerate(new_sets):
-            # if either member is in the new_set, update the set so that it's the union of both
-            if current_eq[0] in new_set or current_eq[1] in new_set:
-                # append new_set and index as tuple for popping
-                new_sets_found_in.append(new_set)
-                # and therefore we don't need to create a new set because we found a candidate group
-                need_new = False
-
-        # if need_new, start a new group
-        if need_new:
-            new_sets.append(set(current_eq))
-        # else, unionize all sets it was found in and pop extras from new_sets
-        else:
-            updated_new_set = set()
-            # update the set
-            for new_set in new_sets_found_in:
-                updated_new_set.update(new_set)
-                new_sets.remove(new_set)
-            updated_new_set.update(current_eq)
-            new_sets.append(updated_new_set)
-
-
-        # for i, new_set in enumerate(new_sets):
-        #     # if either member is in the new_set, update the set so that it's the union of both
-        #     if current_eq[0] in new_set or current_eq[1] in new_set:
-        #         new_sets[i] = new_set.union(set(current_eq))
-        #         # and therefore we don't need to create a new set because we found the right group
-        #         need_new = False
-
-
-    return new_sets
+    # union-find over the variables, so each eq only costs a couple of lookups
+    # instead of a pass over every group found so far
+    return POGG.mrs_algebra.EqualityClasses(eqs).groups()
 
 
 def get_most_specified_variable(eq_vars):
@@ -573,90 +594,49 @@ def overwrite_eqs(final_SEMENT):
     :return: new SEMENT with overwritten EQs
     :rtype: SEMENT
     """
-
-    # will be progressively collecting a new list of SEPs, HCONS, and EQs, so start with those from the final_SEMENT
-    # where final_SEMENT is the SEMENT that comes out after composition is complete
-    current_SEMENT = final_SEMENT
-    current_seps = current_SEMENT.rels
-    current_variables = current_SEMENT.variables
-    current_hcons = current_SEMENT.hcons
     # group the equalities so if x1=x2 and x2=x3 there's a list of [x1, x2, x3] with all variables that are equivalent
-    grouped_eqs = group_equalities(current_SEMENT.eqs)
+    grouped_eqs = group_equalities(final_SEMENT.eqs)
 
+    # map every variable in an eq group to the representative for that group
+    # then everything only needs to be rewritten once, rather than once per group
+    representatives = {}
     for eq in grouped_eqs:
-        # need to get the more specific variable of the pair
+        # need to get the more specific variable of the group
         chosen_var = get_most_specified_variable(list(eq))
+        for var in eq:
+            representatives[var] = chosen_var
 
-        # check the top
-        if current_SEMENT.top in eq:
-            newest_top = chosen_var
-        else:
-            newest_top = current_SEMENT.top
-        # check the ltop
-        if current_SEMENT.ltop in eq:
-            newest_ltop = chosen_var
-        else:
-            newest_ltop = current_SEMENT.ltop
-        # check the index
-        if current_SEMENT.index in eq:
-            newest_index = chosen_var
-        else:
-            newest_index = current_SEMENT.index
-
-        # check the rels
-        new_seps = []
-        for r in current_seps:
-            if r.label in eq:
-                new_r_label = chosen_var
-            else:
-                new_r_label = r.label
-            new_r_args = {}
-            for arg in r.args:
-                if r.args[arg] in eq:
-                    new_r_args[arg] = chosen_var
-                else:
-                    new_r_args[arg] = r.args[arg]
-            new_seps.append(POGG.mrs_algebra.SEP(r.predicate, new_r_label, new_r_args))
+    def rep(var):
+        return representatives.get(var, var)
 
+    # top, ltop, index
+    new_top = rep(final_SEMENT.top)
+    new_ltop = rep(final_SEMENT.ltop)
+    new_index = rep(final_SEMENT.index)
 
-        # update the SEP list with the current ones
-        current_seps = new_seps
+    # rels
+    new_seps = []
+    for r in final_SEMENT.rels:
+        new_r_args = {arg: rep(val) for arg, val in r.args.items()}
+        new_seps.append(POGG.mrs_algebra.SEP(r.predicate, rep(r.label), new_r_args))
 
-        # update the variable dictionary
-        new_variables = {}
-        for var in current_variables:
-            if var in eq:
-                new_variables[chosen_var] = {}
-                # update the new property dictionary with properties from every var in the eq group
-                for e in eq:
-                    new_variables[chosen_var].update(current_variables[e])
-            else:
-                new_variables[var] = current_variables[var]
-        current_variables = new_variables
-
-        # check the hcons...
-        new_hcons = []
-        for hcon in current_hcons:
-            # is there any chance that the hi of an hcon will be one member of an eq
-            # and the lo could be another member of the eq? so both need to be checked/changed?
-            # idk but i'm scared so
-            if hcon.hi in eq:
-                new_hi = chosen_var
-            else:
-                new_hi = hcon.hi
-            if hcon.lo in eq:
-                new_lo = chosen_var
-            else:
-                new_lo = hcon.lo
-            new_hcons.append(mrs.HCons(new_hi, 'qeq', new_lo))
+    # variable dictionary
+    # the representative gets the properties from every var in the eq group
+    new_variables = {}
+    for var, props in final_SEMENT.variables.items():
+        new_variables.setdefault(rep(var), {}).update(props)
 
-        current_hcons = new_hcons
+    # hcons
+    # the hi and lo could both be members of eq groups, so both are checked
+    new_hcons = [mrs.HCons(rep(hcon.hi), hcon.relation, rep(hcon.lo)) for hcon in final_SEMENT.hcons]
 
-        # check the icons...???
+    # icons
+    new_icons = [mrs.ICons(rep(icon.left), icon.relation, rep(icon.right)) for icon in final_SEMENT.icons]
 
     # build new overwritten SEMENT
     # eqs list is gone
-    return POGG.mrs_algebra.SEMENT(newest_top, newest_ltop, newest_index, current_seps, current_variables, current_SEMENT.holes, None, new_hcons)
+    return POGG.mrs_algebra.SEMENT(new_top, new_ltop, new_index, new_seps, new_variables, final_SEMENT.holes, None,
+                                   new_hcons, new_icons)
 
 
 def wrap_and_generate_to_console(final_SEMENT):
@@ -673,19 +653,16 @@ def wrap_and_generate_to_console(final_SEMENT):
 
     # wrap with 'unknown' and overwrite EQs
     unknown = POGG.mrs_algebra.create_base_SEMENT('unknown')
-    wrapped_SEMENT = POGG.mrs_algebra.op_final(unknown, quant_final_SEMENT, POGG.mrs_algebra.VAR_LABELER.get_var_name('h'))
+    wrapped_SEMENT = POGG.mrs_algebra.op_final(unknown, quant_final_SEMENT, POGG.mrs_algebra.get_var_labeler().get_var_name('h'))
     generate_from = overwrite_eqs(wrapped_SEMENT)
 
-    generate_mrs_string = simplemrs.encode(generate_from, indent=True)
-
-    config = yaml.safe_load((open("../config_data/global_config.yml")))
+    generate_mrs_string = simplemrs.encode(generate_from.to_mrs(), indent=True)
 
-    with ace.ACEGenerator(config['ERG'], ['-r', 'root_frag']) as generator:
-        print(generate_mrs_string)
-        response = generator.interact(generate_mrs_string)
-        print("GENERATED RESULTS ... ")
-        for r in response.results():
-            print(r.get('surface'))
+    print(generate_mrs_string)
+    results = generate(generate_mrs_string)
+    print("GENERATED RESULTS ... ")
+    for r in results:
+        print(r.get('surface'))
 
 
 def wrap_and_generate_to_file(final_SEMENT, filename):
@@ -702,20 +679,17 @@ def wrap_and_generate_to_file(final_SEMENT, filename):
 
     # wrap with 'unknown' and overwrite EQs
     unknown = POGG.mrs_algebra.create_base_SEMENT('unknown')
-    wrapped_SEMENT = POGG.mrs_algebra.op_final(unknown, quant_final_SEMENT, POGG.mrs_algebra.VAR_LABELER.get_var_name('h'))
+    wrapped_SEMENT = POGG.mrs_algebra.op_final(unknown, quant_final_SEMENT, POGG.mrs_algebra.get_var_labeler().get_var_name('h'))
     generate_from = overwrite_eqs(wrapped_SEMENT)
 
-    generate_mrs_string = simplemrs.encode(generate_from, indent=True)
-
-    config = yaml.safe_load((open("../config_data/global_config.yml")))
+    generate_mrs_string = simplemrs.encode(generate_from.to_mrs(), indent=True)
 
-    with ace.ACEGenerator(config['ERG'], ['-r', 'root_frag']) as generator:
-        with open(filename, 'a') as file:
-            file.write(generate_mrs_string + "\n")
-            response = generator.interact(generate_mrs_string)
-            file.write("GENERATED RESULTS ... \n")
-            for r in response.results():
-                file.write(r.get('surface') + "\n")
+    with open(filename, 'a') as file:
+        file.write(generate_mrs_string + "\n")
+        results = generate(generate_mrs_string)
+        file.write("GENERATED RESULTS ... \n")
+        for r in results:
+            file.write(r.get('surface') + "\n")
 
 
 def wrap_SEMENT(final_SEMENT):
@@ -738,25 +712,179 @@ def wrap_SEMENT(final_SEMENT):
 
     # wrap with 'unknown' and overwrite EQs
     unknown = POGG.mrs_algebra.create_base_SEMENT('unknown')
-    wrapped_SEMENT = POGG.mrs_algebra.op_final(unknown, quant_final_SEMENT, POGG.mrs_algebra.VAR_LABELER.get_var_name('h'))
+    wrapped_SEMENT = POGG.mrs_algebra.op_final(unknown, quant_final_SEMENT, POGG.mrs_algebra.get_var_labeler().get_var_name('h'))
     generate_from = overwrite_eqs(wrapped_SEMENT)
 
-    generate_mrs_string = simplemrs.encode(generate_from, indent=True)
+    generate_mrs_string = simplemrs.encode(generate_from.to_mrs(), indent=True)
 
     return generate_mrs_string
 
 
 
-def generate(wrapped_mrs_string):
+def canonical_mrs(mrs_string):
+    """
+    Get a form of an MRS that's the same however its variables are named
+    Variables are renamed in the order they first appear (top, index, each EP's label and arguments, HCONS, ICONS),
+    keeping their types, so MRSs that only differ in how the variable labeler numbered them come out the same
+    (EPs stay in their order, so it's not the same for every isomorphic MRS, see mrs_fingerprint for that)
+    :param mrs_string: MRS string
+    :type mrs_string: str
+    :return: canonical form of the MRS
+    :rtype: str
+    """
+    m = simplemrs.decode(mrs_string)
+    names = {}
+
+    def rename(var):
+        if var not in names:
+            names[var] = "{}{}".format(variable.type(var), len(names))
+        return names[var]
+
+    def rename_arg(role, value):
+        # CARG (and anything else that isn't a variable) is a constant
+        if role != mrs.CONSTANT_ROLE and variable.is_valid(value):
+            return rename(value)
+        return value
+
+    top = rename(m.top) if m.top else None
+    index = rename(m.index) if m.index else None
+    rels = [[ep.predicate, rename(ep.label), [[role, rename_arg(role, ep.args[role])] for role in sorted(ep.args)]]
+            for ep in m.rels]
+    hcons = sorted([rename(hc.hi), hc.relation, rename(hc.lo)] for hc in m.hcons)
+    icons = sorted([rename(ic.left), ic.relation, rename(ic.right)] for ic in m.icons)
+    properties = sorted([names[var], sorted(m.variables[var].items())] for var in m.variables if var in names)
+    return json.dumps([top, index, rels, hcons, icons, properties], separators=(',', ':'))
+
+
+def generate(wrapped_mrs_string, pool=None, timeout=None, request=None):
     """
     Generate from a given MRS and return the results
+    If the pool has a generation cache (see POGG.generation_cache), an MRS that's been generated from before
+    (under any variable names) is answered from the cache instead of ACE
     :param wrapped_mrs_string: MRS string to generate from
     :type wrapped_mrs_string: str
-    :return: results from response object
-    :rtype: list
+    :param pool: generator pool to send the MRS to, the shared pool built from the global config if not given
+    :type pool: ACEGeneratorPool
+    :param timeout: seconds ACE may take, the pool's timeout if None
+    :type timeout: float
+    :param request: handle another thread can cancel the request with
+    :type request: POGG.ace_pool.GenerationRequest
+    :return: results from response object, with the status of the request (e.g. whether it timed out)
+    :rtype: POGG.ace_pool.GenerationResults
     """
-    config = yaml.safe_load((open("../config_data/global_config.yml")))
-
-    with ace.ACEGenerator(config['ERG'], ['-r', 'root_frag']) as generator:
-        response = generator.interact(wrapped_mrs_string)
-        return response.results()
+    if pool is None:
+        pool = POGG.ace_pool.get_shared_pool()
+
+    cache = pool.cache
+    if cache is not None:
+        key = cache.key(wrapped_mrs_string, pool.grammar, pool.cmdargs)
+        results = cache.get(key)
+        if results is not None:
+            return results
+
+    response = pool.interact(wrapped_mrs_string, timeout=timeout, request=request)
+    results = response.results()
+    # ACE's -n should already have stopped it there, but the cap holds either way
+    if pool.max_results is not None:
+        results = results[:pool.max_results]
+    results = POGG.ace_pool.GenerationResults(results, response.get('status', POGG.ace_pool.GENERATION_OK))
+    # anything that went wrong (e.g. ACE being killed for running too long) might not happen next time,
+    # so only complete runs are cached
+    if cache is not None and results.status in (POGG.ace_pool.GENERATION_OK, POGG.ace_pool.GENERATION_TRUNCATED):
+        cache.put(key, results, results.status)
+    return results
+
+
+async def generate_async(wrapped_mrs_string, pool=None, timeout=None, executor=None):
+    """
+    Generate from a given MRS without blocking the event loop (see generate)
+    The request waits on ACE in a thread, and cancelling the task kills the ACE process it's running in
+    :param wrapped_mrs_string: MRS string to generate from
+    :type wrapped_mrs_string: str
+    :param pool: generator pool to send the MRS to, the shared pool built from the global config if not given
+    :type pool: ACEGeneratorPool
+    :param timeout: seconds ACE may take, the pool's timeout if None
+    :type timeout: float
+    :param executor: threads to wait on ACE in, the event loop's default executor if None
+    :type executor: concurrent.futures.Executor
+    :return: results from response object, with the status of the request
+    :rtype: POGG.ace_pool.GenerationResults
+    """
+    if pool is None:
+        pool = POGG.ace_pool.get_shared_pool()
+    request = POGG.ace_pool.GenerationRequest()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, functools.partial(generate, wrapped_mrs_string, pool, timeout, request))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        # the thread can't be stopped, but killing ACE makes it finish straight away
+        request.cancel()
+        raise
+
+
+async def generate_many(mrs_strings, pool=None, concurrency=None, timeout=None):
+    """
+    Generate from many MRSs, with up to `concurrency` of them being generated from at once
+    Results are yielded as (position, results) as soon as each MRS is done, so not necessarily in order.
+    MRSs are only taken from mrs_strings as there's room for them, so it can be a (sync or async) generator that's
+    still producing them. Empty MRSs (i.e. no MRS was produced) get no results without going to ACE.
+    Closing the generator early cancels every request still running
+    :param mrs_strings: MRS strings to generate from
+    :type mrs_strings: Iterable or AsyncIterable
+    :param pool: generator pool to send the MRSs to, the shared pool built from the global config if not given
+    :type pool: ACEGeneratorPool
+    :param concurrency: maximum number of MRSs being generated from at once, the pool size if None
+    :type concurrency: int
+    :param timeout: seconds ACE may take per MRS, the pool's timeout if None
+    :type timeout: float
+    :return: async generator of (position, results)
+    :rtype: AsyncGenerator
+    """
+    if pool is None:
+        pool = POGG.ace_pool.get_shared_pool()
+    if concurrency is None:
+        concurrency = pool.size
+
+    async def numbered():
+        if hasattr(mrs_strings, '__aiter__'):
+            position = 0
+            async for mrs_string in mrs_strings:
+                yield position, mrs_string
+                position += 1
+        else:
+            for position, mrs_string in enumerate(mrs_strings):
+                yield position, mrs_string
+
+    async def generate_one(position, mrs_string, executor):
+        if not mrs_string:
+            return position, POGG.ace_pool.GenerationResults()
+        return position, await generate_async(mrs_string, pool, timeout, executor)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        tasks = set()
+        try:
+            async for position, mrs_string in numbered():
+                # the next MRS is taken before waiting for room, so it's ready as soon as there is
+                while len(tasks) >= concurrency:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                tasks.add(asyncio.ensure_future(generate_one(position, mrs_string, executor)))
+
+                # give finished requests a chance to come back before the next MRS is taken
+                await asyncio.sleep(0)
+                done = {task for task in tasks if task.done()}
+                tasks -= done
+                for task in done:
+                    yield task.result()
+
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # the threads have to finish before the executor can shut down, so kill anything still running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,76 @@
+# Persistent (structure-shared) sequences used to build up SEMENTs during composition
+# Concatenating is O(1) and shares the pieces instead of copying them,
+# the elements are only copied out into one flat tuple when something actually needs them
+
+
+class Chain:
+    """
+    Immutable sequence that's either a leaf (a tuple of items) or the concatenation of other chains.
+
+    Composition concatenates the rels/EQs/QEQs/variables of the functor and argument at every step,
+    so copying them into new lists each time is O(n^2) over a whole graph. A Chain just points at the two
+    pieces, and the full sequence is only flattened (once, then kept) when it's iterated.
+    """
+    __slots__ = ('_items', '_parts', '_length')
+
+    def __init__(self, items=()):
+        """
+        :param items: elements of a leaf chain
+        :type items: Iterable
+        """
+        self._items = tuple(items)
+        self._parts = None
+        self._length = len(self._items)
+
+    @classmethod
+    def concat(cls, *chains):
+        """
+        Concatenate chains without copying any of them
+        :param chains: chains to concatenate, in order
+        :type chains: Chain
+        :return: concatenated chain
+        :rtype: Chain
+        """
+        parts = tuple(c for c in chains if c._length)
+        if len(parts) == 1:
+            return parts[0]
+        chain = cls.__new__(cls)
+        if not parts:
+            chain._items = ()
+            chain._parts = None
+            chain._length = 0
+        else:
+            chain._items = None
+            chain._parts = parts
+            chain._length = sum(c._length for c in parts)
+        return chain
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def items(self):
+        """
+        Get every element, flattening the chain the first time
+        :return: elements of the chain in order
+        :rtype: tuple
+        """
+        if self._items is None:
+            # iterative, so deep chains (from deep graphs) don't hit the recursion limit
+            flat = []
+            stack = [self]
+            while stack:
+                chain = stack.pop()
+                if chain._items is not None:
+                    flat.extend(chain._items)
+                else:
+                    stack.extend(reversed(chain._parts))
+            # keep the flat tuple and let go of the pieces
+            self._items = tuple(flat)
+            self._parts = None
+        return self._items
+
+    def __repr__(self):
+        return "Chain({} items)".format(self._length)
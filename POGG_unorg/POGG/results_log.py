@@ -0,0 +1,146 @@
+# Per-graph results streamed to an append-only JSON Lines log as each graph finishes,
+# so nothing has to be kept in memory until the end of a run and a run that dies part way still has everything so far
+# The evaluation summary is worked out from the log afterwards (see aggregate), which can also be run on its own:
+#   python -m POGG.results_log RESULTS_LOG [SUMMARY_FILE]
+import json
+import os
+import sys
+import POGG.batch
+import POGG.evaluation
+
+RESULTS_LOG_FILENAME = "results.jsonl"
+
+
+def results_log_path(results_directory):
+    """
+    Get the path of the results log in a results directory
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :return: path to the results log
+    :rtype: str
+    """
+    return os.path.join(results_directory, RESULTS_LOG_FILENAME)
+
+
+def _json_entry(entry):
+    # eval entries are (bool, reason) pairs where the reason can be an exception, which is only ever shown as a string
+    return [entry[0], entry[1] if isinstance(entry[1], str) else str(entry[1])]
+
+
+def graph_record(graph_result):
+    """
+    Turn the results for one graph into a record for the log
+    :param graph_result: (graph_name, eval_info, generation_entry) tuple from process_graph
+    :type graph_result: tuple
+    :return: JSON-serializable record
+    :rtype: dict
+    """
+    graph_name, eval_info, generation_entry = graph_result
+    return {
+        'graph': graph_name,
+        'generation': list(generation_entry),
+        'nodes': {n: {k: _json_entry(v) for k, v in info.items()} for n, info in eval_info['nodes'].items()},
+        'edges': {e: {k: _json_entry(v) for k, v in info.items()} for e, info in eval_info['edges'].items()}
+    }
+
+
+class ResultsLog:
+    """
+    Append-only log of per-graph results, one JSON object per line
+    Every line is flushed as soon as it's written, so the log is only ever missing the graph being written when a run dies
+    """
+    def __init__(self, path, append=True):
+        """
+        :param path: path to the log
+        :type path: str
+        :param append: whether to add to the log if it already exists, instead of starting it again
+        :type append: bool
+        """
+        self.path = path
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        # finish off a line a run died part way through, so the next record starts on its own line
+        if self._file.tell() > 0:
+            with open(path, 'rb') as log_file:
+                log_file.seek(-1, os.SEEK_END)
+                if log_file.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write(self, graph_result):
+        """
+        Add the results for one graph to the log
+        :param graph_result: (graph_name, eval_info, generation_entry) tuple from process_graph
+        :type graph_result: tuple
+        """
+        self._file.write(json.dumps(graph_record(graph_result)) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """
+        Close the log
+        """
+        self._file.close()
+
+
+def read_results_log(path):
+    """
+    Read the records in a results log, in the order they were written
+    Lines that were cut off part way (i.e. a run died while writing them) are skipped
+    :param path: path to the log
+    :type path: str
+    :return: generator of records (see graph_record)
+    :rtype: generator
+    """
+    with open(path, encoding='utf-8') as log_file:
+        for line in log_file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def aggregate(log_path, summary_filename, graph_names=None):
+    """
+    Write the evaluation summary for every graph in a results log (see evaluation.write_evaluation_summary)
+    If a graph is in the log more than once (e.g. it was run again), its latest results are used
+    :param log_path: path to the results log
+    :type log_path: str
+    :param summary_filename: path to write the summary to (e.g. evaluation_summary.txt)
+    :type summary_filename: str
+    :param graph_names: only summarize these graphs (e.g. the ones still in the graph directory), every graph if None
+    :type graph_names: set
+    :return: number of graphs in the summary
+    :rtype: int
+    """
+    records = {}
+    for record in read_results_log(log_path):
+        if graph_names is None or record['graph'] in graph_names:
+            records[record['graph']] = record
+
+    full_eval_info = {
+        'nodes': {},
+        'edges': {}
+    }
+    generation_info = {}
+    for record in records.values():
+        graph_result = (record['graph'], {'nodes': record['nodes'], 'edges': record['edges']}, record['generation'])
+        POGG.batch.merge_graph_result(graph_result, full_eval_info, generation_info)
+
+    POGG.evaluation.write_evaluation_summary(summary_filename, generation_info, full_eval_info)
+    return len(generation_info)
+
+
+if __name__ == '__main__':
+    # python -m POGG.results_log RESULTS_LOG [SUMMARY_FILE]
+    log_path = sys.argv[1]
+    if len(sys.argv) > 2:
+        summary_filename = sys.argv[2]
+    else:
+        summary_filename = os.path.join(os.path.dirname(os.path.abspath(log_path)), "evaluation_summary.txt")
+    print("Summarized {} graphs in {}".format(aggregate(log_path, summary_filename), summary_filename))
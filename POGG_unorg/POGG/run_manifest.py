@@ -0,0 +1,242 @@
+# Manifest of what each graph in a results directory was last run with, so running a scenario again only processes
+# the graphs something has changed for, and a run that was interrupted picks up where it stopped
+# One JSON object per line, added as soon as each graph finishes (the latest line for a graph wins), with
+#   - the hash of the graph's .dot file
+#   - the hash of the lexicon entries the graph uses (see composition_cache.graph_lexicon_fingerprint)
+#   - the hash of everything else that goes into its results (see config_fingerprint)
+#   - where its results file is, and the status of its generation request (see ace_pool)
+#   - which nodes and edges use which lexicon entries (see composition_cache.lexicon_uses and POGG.lexicon_index)
+import hashlib
+import json
+import os
+import POGG.ace_pool
+import POGG.batch
+import POGG.composition_cache
+import POGG.generation_cache
+import POGG.graph_corpus
+
+# bump if what goes into the manifest changes
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "manifest.jsonl"
+# generation statuses a graph is run again for when failed graphs are retried
+FAILED_STATUSES = {
+    POGG.ace_pool.GENERATION_RESOURCE_LIMIT,
+    POGG.ace_pool.GENERATION_TIMEOUT,
+    POGG.ace_pool.GENERATION_CANCELLED,
+    POGG.ace_pool.GENERATION_ERROR
+}
+
+
+def manifest_path(results_directory):
+    """
+    Get the path of the run manifest in a results directory
+    :param results_directory: directory the per-graph results files are written to
+    :type results_directory: str
+    :return: path to the manifest
+    :rtype: str
+    """
+    return os.path.join(results_directory, MANIFEST_FILENAME)
+
+
+def file_hash(path):
+    """
+    Get a hash of a file's contents
+    :param path: path to the file
+    :type path: str
+    :return: hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_fingerprint(pool, memoize=False):
+    """
+    Get a hash of everything apart from the graph and the lexicon that affects a graph's results,
+    i.e. what composition_cache.environment_fingerprint covers, the grammar image, and the ACE arguments
+    :param pool: generator pool the graphs are generated with
+    :type pool: POGG.ace_pool.ACEGeneratorPool
+    :param memoize: whether subtrees are memoized (see SubtreeMemo)
+    :type memoize: bool
+    :return: hex digest
+    :rtype: str
+    """
+    config = [MANIFEST_VERSION, POGG.composition_cache.environment_fingerprint(), bool(memoize),
+              POGG.generation_cache.grammar_stamp(pool.grammar), list(pool.cmdargs)]
+    return hashlib.sha1(json.dumps(config).encode('utf-8')).hexdigest()
+
+
+class RunManifest:
+    """
+    What each graph in a results directory was last run with, read in from the manifest and added to as graphs finish
+    Every line is flushed as soon as it's written, so an interrupted run only loses the graphs it was in the middle of
+    """
+    def __init__(self, path, config):
+        """
+        :param path: path to the manifest (see manifest_path), started if it doesn't exist yet
+        :type path: str
+        :param config: hash of everything that isn't the graph or the lexicon (see config_fingerprint)
+        :type config: str
+        """
+        self.path = path
+        self.config = config
+        # graph name -> latest entry
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as manifest_file:
+                for line in manifest_file:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['graph']] = entry
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        # cut off by an interrupted run
+                        continue
+        # graph name -> (path, hashes, lexicon uses), for graphs that are being run but haven't finished yet
+        self._pending = {}
+        # graph name -> (path, lexicon), for graphs queued to run without being read first (see queue)
+        self._queued = {}
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def graph_hashes(self, graph_path, lexicon, graph=None):
+        """
+        Get the hashes of everything that goes into a graph's results
+        :param graph_path: path to the .dot file
+        :type graph_path: str
+        :param lexicon: lexicon with node to ERG predicate label mappings
+        :type lexicon: dict
+        :param graph: the graph, if it's already been read
+        :type graph: DiGraph
+        :return: dict of the input, lexicon, and config hashes
+        :rtype: dict
+        """
+        if graph is None:
+            graph = POGG.graph_corpus.read_graph(graph_path)
+        return {
+            'input': file_hash(graph_path),
+            'lexicon': POGG.composition_cache.graph_lexicon_fingerprint(graph, lexicon),
+            'config': self.config
+        }
+
+    def is_current(self, graph_path, hashes, retry_failed=False):
+        """
+        Check whether a graph's results are up to date, i.e. it was last run with the same hashes
+        and its results file is still there
+        :param graph_path: path to the .dot file
+        :type graph_path: str
+        :param hashes: hashes from graph_hashes
+        :type hashes: dict
+        :param retry_failed: whether a graph whose generation failed (see FAILED_STATUSES) counts as out of date
+        :type retry_failed: bool
+        :return: True if the graph doesn't need to be run again
+        :rtype: bool
+        """
+        entry = self.entries.get(_graph_name(graph_path))
+        if entry is None or any(entry.get(name) != value for name, value in hashes.items()):
+            return False
+        if not os.path.exists(entry.get('output', "")):
+            return False
+        if retry_failed and entry.get('status') in FAILED_STATUSES:
+            return False
+        return True
+
+    def stale_graphs(self, graph_paths, lexicon, retry_failed=False, have_results=None):
+        """
+        Get the graphs that have to be run (again), i.e. the ones whose results aren't up to date (see is_current)
+        Each graph is read here to hash the lexicon entries it uses, and read again when it's run
+        :param graph_paths: paths to the .dot files
+        :type graph_paths: list
+        :param lexicon: lexicon with node to ERG predicate label mappings
+        :type lexicon: dict
+        :param retry_failed: whether graphs whose generation failed are run again
+        :type retry_failed: bool
+        :param have_results: names of the graphs in the results log, the others are run again (not checked if None)
+        :type have_results: set
+        :return: paths of the graphs to run, in the order they were given
+        :rtype: list
+        """
+        stale = []
+        for graph_path in graph_paths:
+            graph = POGG.graph_corpus.read_graph(graph_path)
+            hashes = self.graph_hashes(graph_path, lexicon, graph)
+            graph_name = _graph_name(graph_path)
+            if self.is_current(graph_path, hashes, retry_failed) and \
+                    (have_results is None or graph_name in have_results):
+                continue
+            self._pending[graph_name] = (graph_path, hashes, POGG.composition_cache.lexicon_uses(graph, lexicon))
+            stale.append(graph_path)
+        return stale
+
+    def queue(self, graph_paths, lexicon):
+        """
+        Get ready to record graphs that are run whether they're up to date or not (e.g. every graph in a full run),
+        without reading them here first like stale_graphs does
+        Their hashes are worked out when they're recorded instead (see record)
+        :param graph_paths: paths to the .dot files
+        :type graph_paths: list
+        :param lexicon: lexicon with node to ERG predicate label mappings
+        :type lexicon: dict
+        """
+        for graph_path in graph_paths:
+            self._queued[_graph_name(graph_path)] = (graph_path, lexicon)
+
+    def record(self, graph_result, results_directory):
+        """
+        Add a graph that's just been run to the manifest
+        :param graph_result: (graph_name, eval_info, generation_entry) tuple from process_graph
+        :type graph_result: tuple
+        :param results_directory: directory the per-graph results files are written to
+        :type results_directory: str
+        """
+        graph_name, _, generation_entry = graph_result
+        if graph_name in self._pending:
+            graph_path, hashes, uses = self._pending.pop(graph_name)
+        else:
+            # queued, so the graph hasn't been read in this process yet
+            graph_path, lexicon = self._queued.pop(graph_name)
+            graph = POGG.graph_corpus.read_graph(graph_path)
+            hashes = self.graph_hashes(graph_path, lexicon, graph)
+            uses = POGG.composition_cache.lexicon_uses(graph, lexicon)
+        entry = {
+            'graph': graph_name,
+            'path': graph_path,
+            'output': POGG.batch.results_filename(graph_path, results_directory),
+            'results': generation_entry[0],
+            'status': generation_entry[2],
+            'uses': uses
+        }
+        entry.update(hashes)
+        self.entries[graph_name] = entry
+
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            # finish off a line an interrupted run was part way through, so this entry starts on its own line
+            if self._file.tell() > 0:
+                with open(self.path, 'rb') as manifest_file:
+                    manifest_file.seek(-1, os.SEEK_END)
+                    if manifest_file.read(1) != b"\n":
+                        self._file.write("\n")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """
+        Close the manifest
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _graph_name(graph_path):
+    # same name the batch tools use for a graph, e.g. graph0 for graph0.dot
+    return os.path.splitext(os.path.basename(graph_path))[0]
@@ -30,7 +30,7 @@ total_included_edges = 0
 for filename in os.listdir(graph_directory):
     if os.path.splitext(filename)[-1].lower() == '.dot':
         print(os.path.join(graph_directory, filename))
-        graph = nx.drawing.nx_pydot.read_dot(os.path.join(graph_directory, filename))
+        graph = POGG.graph_util.read_dot(os.path.join(graph_directory, filename))
 
         root = POGG.graph_util.find_root(graph)
 
@@ -1,7 +1,7 @@
 import os
 import yaml
 import networkx as nx
-from POGG.graph_util import write_graph_to_dot, find_root
+from POGG.graph_util import write_graph_to_dot, find_root, read_dot
 import csv
 
 # Load elements from global config
@@ -39,7 +39,7 @@ for dir in data_dirs:
 
                     subgraphs = []
 
-                    graph = nx.drawing.nx_pydot.read_dot(os.path.join(subdir_path, filename))
+                    graph = read_dot(os.path.join(subdir_path, filename))
                     try:
                         graph.remove_node("\\n")
                     except:
@@ -32,7 +32,7 @@ for filename in os.listdir(graph_directory):
     # only process if it's an actual .dot file
     if ".dot" in filename:
         graph_name = split_file[0]
-        graph = nx.drawing.nx_pydot.read_dot(os.path.join(graph_directory, filename))
+        graph = POGG.graph_util.read_dot(os.path.join(graph_directory, filename))
 
         # TODO: might want to deal with this better in the future...
         # if there's a cycle, skip it entirely
@@ -2,12 +2,13 @@ import os
 import yaml
 import json
 import networkx as nx
-from delphin import ace
 from networkx import MultiDiGraph
 from POGG.data_regularization import regularize_node, regularize_edge
 from POGG.graph_to_mrs import node_to_mrs, edge_to_mrs
-from POGG.graph_util import find_root
-from POGG.mrs_util import wrap_SEMENT
+from POGG.graph_util import find_root, read_dot
+from POGG.mrs_util import wrap_SEMENT, generate
+from POGG.mrs_algebra import var_labeler_scope
+from POGG.ace_pool import ACEGeneratorPool
 
 import POGG.composition_library
 import POGG.semantic_constructions.base
@@ -54,13 +55,15 @@ class POGGenerator:
         self.results_directory = config['results_directory']
         self.LEXICON = POGGLexicon(config['LEXICON'])
         self.statistics = POGGStatistics()
+        # ACE processes are only opened on the first generation request and then reused
+        self.generator_pool = ACEGeneratorPool(self.ERG_path, ['-r', 'root_frag'])
 
 
     def read_graph(self, graph_path):
         if ".dot" in graph_path:
             graph_file = os.path.basename(graph_path)
             graph_name = graph_file.strip('.dot')
-            graph = nx.drawing.nx_pydot.read_dot(graph_path)
+            graph = read_dot(graph_path)
             print(graph_name)
             return graph
 
@@ -116,9 +119,11 @@ class POGGenerator:
         return new_composed_mrs
 
     def generate_MRS_from_graph(self, graph):
-        graph_mrs = self.graph_to_mrs_new(find_root(graph), graph)
-        # TODO: THIS RETURNS A STRING... DO I WANT THAT?
-        return wrap_SEMENT(graph_mrs)
+        # number variables per graph
+        with var_labeler_scope():
+            graph_mrs = self.graph_to_mrs_new(find_root(graph), graph)
+            # TODO: THIS RETURNS A STRING... DO I WANT THAT?
+            return wrap_SEMENT(graph_mrs)
 
 
     def generate_MRS_from_graphs(self, graphs):
@@ -126,14 +131,13 @@ class POGGenerator:
 
 
     def generate_text_from_MRS_results(self, results):
-        with ace.ACEGenerator(self.ERG_path, ['-r', 'root_frag']) as generator:
-            for r in results:
-                print("GENERATING FROM ... ")
-                print(r)
-                generator_response = generator.interact(r)
-                print("GENERATED RESULTS ... ")
-                for r in generator_response.results():
-                    print(r.get('surface'))
+        for r in results:
+            print("GENERATING FROM ... ")
+            print(r)
+            generated_results = generate(r, self.generator_pool)
+            print("GENERATED RESULTS ... ")
+            for g in generated_results:
+                print(g.get('surface'))
 
 
 
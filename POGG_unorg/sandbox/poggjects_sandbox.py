@@ -2,6 +2,7 @@ import os.path
 import networkx as nx
 from delphin.codecs import simplemrs
 import POGG.composition_library
+import POGG.graph_util
 from POGG.mrs_util import wrap_SEMENT
 from sandbox.pogg_objects import POGGenerator, POGGGraph
 
@@ -11,7 +12,7 @@ local_yaml_path = "/Users/lizcconrad/Documents/PhD/POGG/POGG_project/POGG_data/s
 # make POGGProcess which contains all config information
 p1 = POGGenerator([global_yaml_path, local_yaml_path])
 
-graph = nx.drawing.nx_pydot.read_dot(os.path.join(p1.graph_directory, "graph1.dot"))
+graph = POGG.graph_util.read_dot(os.path.join(p1.graph_directory, "graph1.dot"))
 
 # result = p1.generate_MRS_from_graph(graph)
 test = POGGGraph(graph)
@@ -0,0 +1,201 @@
+import time
+import unittest
+import unittest.mock
+
+from delphin import interface
+
+import POGG.ace_pool
+
+
+class TestGenerationLimits(unittest.TestCase):
+    """
+    Test the limits a generator pool passes to ACE and the status it gives each request
+    (nothing here starts ACE, generators are only opened when a request is sent)
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def _response(self, results=0, errors=(), notes=()):
+        return interface.Response({'NOTES': list(notes), 'WARNINGS': [], 'ERRORS': list(errors),
+                                   'results': [{'surface': str(i)} for i in range(results)]})
+
+    def test_limits_are_ace_options(self):
+        # Act
+        pool = POGG.ace_pool.ACEGeneratorPool("erg.dat", max_results=5, max_chart_megabytes=1000,
+                                              max_unpack_megabytes=1500)
+
+        # Assert
+        self.assertEqual(pool.cmdargs, ['-r', 'root_frag', '-n', '5',
+                                        '--max-chart-megabytes=1000', '--max-unpack-megabytes=1500'])
+
+    def test_status(self):
+        # Arrange
+        pool = POGG.ace_pool.ACEGeneratorPool("erg.dat", max_results=5)
+
+        # Act
+        statuses = [pool._status(self._response(2)),
+                    pool._status(self._response(5)),
+                    pool._status(self._response(1, notes=["hit RAM limit while unpacking"])),
+                    pool._status(self._response(0, errors=["invalid predicate: '_kat_n_1'"]))]
+
+        # Assert
+        self.assertEqual(statuses, [POGG.ace_pool.GENERATION_OK, POGG.ace_pool.GENERATION_TRUNCATED,
+                                    POGG.ace_pool.GENERATION_RESOURCE_LIMIT, POGG.ace_pool.GENERATION_ERROR])
+
+
+class _StubProcess:
+    """
+    Stands in for the subprocess behind an ACEGenerator
+    """
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+
+class _StubGenerator:
+    """
+    Stands in for an ACEGenerator, answering every MRS after a wait unless its process is killed first
+    """
+    def __init__(self, delay=0, before_send=None):
+        self._p = _StubProcess()
+        self.delay = delay
+        # called before the MRS is written to the process, to kill it in between
+        self.before_send = before_send
+        self.sent = []
+        self.closed = False
+
+    def interact(self, mrs_string):
+        if self.before_send is not None:
+            self.before_send()
+        if self._p.returncode is not None:
+            raise BrokenPipeError(32, "Broken pipe")
+        self.sent.append(mrs_string)
+        deadline = time.monotonic() + self.delay
+        while self._p.returncode is None and time.monotonic() < deadline:
+            time.sleep(0.005)
+        if self._p.returncode is not None:
+            # PyDelphin gives up on a process that died and returns what it had read
+            self.close()
+            return interface.Response({'NOTES': [], 'WARNINGS': [], 'ERRORS': [], 'results': []})
+        return interface.Response({'NOTES': [], 'WARNINGS': [], 'ERRORS': [],
+                                   'results': [{'surface': mrs_string.upper()}]})
+
+    def close(self):
+        self.closed = True
+        if self._p.returncode is None:
+            self._p.returncode = 0
+
+
+class TestGeneratorPool(unittest.TestCase):
+    """
+    Test handing out, reusing, and replacing generators (stubs stand in for ACE)
+    """
+
+    def _pool(self, generators, **kwargs):
+        pool = POGG.ace_pool.ACEGeneratorPool("erg.dat", **kwargs)
+        open_patch = unittest.mock.patch.object(pool, '_open_generator', side_effect=generators)
+        self.opened = open_patch.start()
+        self.addCleanup(open_patch.stop)
+        return pool
+
+    def test_warm_generators_reused_first(self):
+        # Arrange
+        first, second = _StubGenerator(), _StubGenerator()
+        pool = self._pool([first, second], size=3)
+
+        # Act
+        checked_out = [pool.checkout(), pool.checkout()]
+        pool.checkin(first)
+        pool.checkin(second)
+        reused = [pool.checkout(), pool.checkout()]
+
+        # Assert
+        self.assertEqual(checked_out, [first, second])
+        # last in, first out, and free slots only once there are no open generators left
+        self.assertEqual(reused, [second, first])
+        self.assertEqual(self.opened.call_count, 2)
+
+    def test_slot_back_when_open_fails(self):
+        # Arrange
+        generator = _StubGenerator()
+        pool = self._pool([OSError("no ace"), generator])
+
+        # Act
+        with self.assertRaises(OSError):
+            pool.checkout()
+        free_slots = pool._slots.qsize()
+        retried = pool.checkout()
+
+        # Assert
+        self.assertEqual(free_slots, 1)
+        self.assertIs(retried, generator)
+
+    def test_dead_generator_replaced(self):
+        # Arrange
+        dead, fresh = _StubGenerator(), _StubGenerator()
+        pool = self._pool([dead, fresh])
+
+        # Act
+        pool.checkout()._p.kill()
+        pool.checkin(dead)
+        replacement = pool.checkout()
+
+        # Assert
+        self.assertTrue(dead.closed)
+        self.assertIs(replacement, fresh)
+
+    def test_timed_out_generator_replaced(self):
+        # Arrange
+        slow, fresh = _StubGenerator(delay=5), _StubGenerator()
+        pool = self._pool([slow, fresh], timeout=0.05)
+
+        # Act
+        timed_out = pool.interact("cat")
+        after = pool.interact("dog")
+
+        # Assert
+        self.assertEqual(timed_out['status'], POGG.ace_pool.GENERATION_TIMEOUT)
+        self.assertTrue(slow.closed)
+        self.assertEqual(after['status'], POGG.ace_pool.GENERATION_OK)
+        self.assertEqual(fresh.sent, ["dog"])
+
+    def test_killed_before_sent(self):
+        # Arrange
+        request = POGG.ace_pool.GenerationRequest()
+        # the watchdog fires, or the request is cancelled, after the generator is checked out but before the MRS is sent
+        late = _StubGenerator(before_send=lambda: time.sleep(0.2))
+        cancelled = _StubGenerator(before_send=request.cancel)
+        pool = self._pool([late, cancelled])
+
+        # Act
+        timed_out = pool.interact("cat", timeout=0.05)
+        cancelled_response = pool.interact("dog", request=request)
+
+        # Assert
+        self.assertEqual(timed_out['status'], POGG.ace_pool.GENERATION_TIMEOUT)
+        self.assertEqual(timed_out['results'], [])
+        self.assertEqual(cancelled_response['status'], POGG.ace_pool.GENERATION_CANCELLED)
+        self.assertTrue(late.closed and cancelled.closed)
+
+    def test_broken_pipe_raised_otherwise(self):
+        # Arrange
+        generator = _StubGenerator()
+        generator.before_send = generator._p.kill
+        pool = self._pool([generator])
+
+        # Act/Assert
+        with self.assertRaises(BrokenPipeError):
+            pool.interact("cat")
+        # the slot is still freed
+        self.assertEqual(pool._slots.qsize(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
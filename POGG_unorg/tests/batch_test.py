@@ -0,0 +1,215 @@
+import asyncio
+import concurrent.futures
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+from delphin import interface
+
+import POGG.batch
+
+
+class _StubPool:
+    """
+    Stands in for an ACEGeneratorPool, "generating" each MRS string in upper case
+    """
+    def __init__(self, size=2):
+        self.size = size
+        self.cache = None
+        self.max_results = None
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def interact(self, mrs_string, timeout=None, request=None):
+        with self._lock:
+            self.sent.append(mrs_string)
+        return interface.Response({'NOTES': [], 'WARNINGS': [], 'ERRORS': [],
+                                   'results': [{'surface': mrs_string.upper()}]})
+
+
+def _stub_compose(graph, root, lexicon, memoize=False, cache_dir=None):
+    # stands in for composition_cache.compose, roots starting with idNothing don't produce an MRS
+    if root.startswith("idNothing"):
+        failed = (False, "Can't find '{}' as a key in the lexicon".format(root))
+        return "", {'nodes': {root + "_1": {'produced': failed, 'included': failed}}, 'edges': {}}
+    entry = {'produced': (True, "MRS fragment produced"), 'included': (True, "Included in MRS")}
+    return "[ TOP: h0 RELS: < [ _{}_n_1 LBL: h1 ] > ]".format(root), {'nodes': {root + "_1": entry}, 'edges': {}}
+
+
+class _BatchTestCase(unittest.TestCase):
+    """
+    A directory of graphs, and a results directory to write to
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.graph_directory = os.path.join(self.temp_dir.name, "graphs")
+        self.results_directory = os.path.join(self.temp_dir.name, "results")
+        os.mkdir(self.graph_directory)
+        os.mkdir(self.results_directory)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write_graph(self, name, statements):
+        graph_path = os.path.join(self.graph_directory, name + ".dot")
+        with open(graph_path, 'w') as graph_file:
+            graph_file.write("digraph  {\n" + statements + "}\n")
+        return graph_path
+
+    def _patch_compose(self):
+        compose_patch = unittest.mock.patch('POGG.composition_cache.compose', side_effect=_stub_compose)
+        compose_patch.start()
+        self.addCleanup(compose_patch.stop)
+
+
+class TestRunBatch(_BatchTestCase):
+    """
+    Test running a batch of graphs in this process and across worker processes
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.graph_names = ["graph{}".format(i) for i in range(5)]
+        self.graph_paths = [self._write_graph(name, 'idCat{} [root=root];\n'.format(i))
+                            for i, name in enumerate(self.graph_names)]
+
+    def _run_in_threads(self, chunksize, ordered, hold_back=True):
+        # worker threads instead of processes, so process_graph can be patched to hold graph0 back
+        # until the last graph is done, i.e. the first chunk finishes last
+        last_done = threading.Event()
+        if not hold_back:
+            last_done.set()
+
+        def process_graph(graph_path, lexicon, results_directory, pool=None, memoize=False, cache_dir=None):
+            graph_name = os.path.splitext(os.path.basename(graph_path))[0]
+            if graph_name == "graph0":
+                last_done.wait(5)
+            if graph_name == self.graph_names[-1]:
+                last_done.set()
+            return graph_name, {'nodes': {}, 'edges': {}}, [0, "MRS not produced", None]
+
+        with unittest.mock.patch('POGG.batch.process_graph', side_effect=process_graph), \
+                unittest.mock.patch('POGG.batch.concurrent.futures.ProcessPoolExecutor',
+                                    concurrent.futures.ThreadPoolExecutor):
+            return [graph_name for graph_name, _, _ in
+                    POGG.batch.run_batch(self.graph_paths, {}, self.results_directory, workers=2,
+                                         chunksize=chunksize, ordered=ordered)]
+
+    def test_in_process(self):
+        # Arrange
+        self._patch_compose()
+        pool = _StubPool()
+
+        # Act
+        graph_results = list(POGG.batch.run_batch(self.graph_paths, {}, self.results_directory, pool=pool))
+
+        # Assert
+        self.assertEqual([graph_name for graph_name, _, _ in graph_results], self.graph_names)
+        self.assertEqual([generation_entry for _, _, generation_entry in graph_results],
+                         [[1, "Successfully generated", "ok"]] * len(self.graph_names))
+        self.assertEqual(len(pool.sent), len(self.graph_names))
+        for graph_path in self.graph_paths:
+            self.assertTrue(os.path.exists(POGG.batch.results_filename(graph_path, self.results_directory)))
+
+    def test_ordered(self):
+        # Act
+        graph_names = self._run_in_threads(chunksize=2, ordered=True)
+
+        # Assert
+        self.assertEqual(graph_names, self.graph_names)
+
+    def test_as_completed(self):
+        # Act
+        graph_names = self._run_in_threads(chunksize=2, ordered=False)
+
+        # Assert
+        # the chunk with graph0 in it finishes last
+        self.assertEqual(graph_names, ["graph2", "graph3", "graph4", "graph0", "graph1"])
+
+    def test_chunks_cover_every_graph_once(self):
+        for chunksize in (1, 2, 3, 5, 8):
+            with self.subTest(chunksize=chunksize):
+                # Act
+                graph_names = self._run_in_threads(chunksize=chunksize, ordered=False, hold_back=False)
+
+                # Assert
+                self.assertEqual(sorted(graph_names), self.graph_names)
+
+    def test_worker_processes(self):
+        # Arrange
+        # nothing is in the lexicon, so no MRS is produced and nothing needs generating
+        cycle_path = self._write_graph("cycle", 'idCat0 [root=root];\nidCat0 -> idBox1 [label=insideOf];\n'
+                                                'idBox1 -> idCat0 [label=insideOf];\n')
+        lexicon = {'entityTypes': {}, 'propertyValues': {}, 'properties': {}}
+
+        # Act
+        graph_results = list(POGG.batch.run_batch(self.graph_paths + [cycle_path], lexicon, self.results_directory,
+                                                  workers=2, chunksize=2, ordered=False))
+
+        # Assert
+        generation_info = {graph_name: generation_entry for graph_name, _, generation_entry in graph_results}
+        self.assertEqual(len(graph_results), len(self.graph_paths) + 1)
+        self.assertEqual(generation_info, dict({graph_name: [0, "MRS not produced", None]
+                                                for graph_name in self.graph_names},
+                                               cycle=[0, "Graph contains cycles", None]))
+        self.assertEqual(sorted(os.listdir(self.results_directory)),
+                         sorted(graph_name + ".txt" for graph_name in self.graph_names + ["cycle"]))
+
+
+
+class TestRunPipeline(_BatchTestCase):
+    """
+    Test composing graphs while earlier ones are being generated from
+    """
+
+    def setUp(self):
+        super().setUp()
+        self._patch_compose()
+        self.graph_paths = [
+            self._write_graph("cat", 'idCat0 [root=root];\n'),
+            self._write_graph("nothing", 'idNothing0 [root=root];\n'),
+            self._write_graph("cycle", 'idCat0 [root=root];\nidCat0 -> idBox1 [label=insideOf];\n'
+                                       'idBox1 -> idCat0 [label=insideOf];\n'),
+            self._write_graph("box", 'idBox0 [root=root];\n')
+        ]
+
+    def _results_files(self, results_directory):
+        contents = {}
+        for filename in os.listdir(results_directory):
+            with open(os.path.join(results_directory, filename)) as results_file:
+                contents[filename] = results_file.read()
+        return contents
+
+    def test_same_as_run_batch(self):
+        # Arrange
+        pipeline_directory = os.path.join(self.temp_dir.name, "pipeline")
+        os.mkdir(pipeline_directory)
+        pipeline_pool = _StubPool()
+
+        async def run_pipeline():
+            return [graph_result async for graph_result in
+                    POGG.batch.run_pipeline(self.graph_paths, {}, pipeline_directory, pool=pipeline_pool)]
+
+        # Act
+        batch_results = list(POGG.batch.run_batch(self.graph_paths, {}, self.results_directory, pool=_StubPool()))
+        pipeline_results = asyncio.run(run_pipeline())
+
+        # Assert
+        # yielded as they finish, so only the order can be different
+        self.assertCountEqual(pipeline_results, batch_results)
+        self.assertEqual(len(pipeline_results), len(self.graph_paths))
+        self.assertEqual(self._results_files(pipeline_directory), self._results_files(self.results_directory))
+        # only the graphs with an MRS are generated from
+        self.assertCountEqual(pipeline_pool.sent, ["[ TOP: h0 RELS: < [ _idCat0_n_1 LBL: h1 ] > ]",
+                                                   "[ TOP: h0 RELS: < [ _idBox0_n_1 LBL: h1 ] > ]"])
+
+
+if __name__ == '__main__':
+    unittest.main()
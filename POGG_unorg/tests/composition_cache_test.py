@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import networkx as nx
+
+import POGG.composition_cache
+
+
+class TestCompositionCache(unittest.TestCase):
+    """
+    Test caching composed MRSs on disk, keyed by everything that goes into them
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.temp_dir.name
+        # the real fingerprint needs the SEMI from the global config, which the tests don't need otherwise
+        POGG.composition_cache._environment = None
+        environment_patch = unittest.mock.patch('POGG.composition_cache.environment_fingerprint',
+                                                return_value="environment")
+        environment_patch.start()
+        self.addCleanup(environment_patch.stop)
+        self.lexicon = {
+            'entityTypes': {'idCat': "_cat_n_1", 'idBox': "_box_n_1"},
+            'propertyValues': {'red': "_red_a_1"},
+            'properties': {'idColor': "adjective", 'insideOf': "preposition"}
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        POGG.composition_cache._environment = None
+
+    def _cat_graph(self, cat="idCat0", box="idBox1"):
+        graph = nx.MultiDiGraph()
+        graph.add_edge(cat, "red", label="{}_prop_idColor".format(cat))
+        graph.add_edge(cat, box, label="insideOf")
+        return graph
+
+    def test_key_ignores_node_numbering(self):
+        # Act
+        first = POGG.composition_cache.graph_key(self._cat_graph(), "idCat0", self.lexicon)
+        second = POGG.composition_cache.graph_key(self._cat_graph("idCat7", "idBox3"), "idCat7", self.lexicon)
+
+        # Assert
+        self.assertEqual(first, second)
+
+    def test_key_changes_with_structure(self):
+        # Arrange
+        graph = self._cat_graph()
+        reordered = nx.MultiDiGraph()
+        reordered.add_edge("idCat0", "idBox1", label="insideOf")
+        reordered.add_edge("idCat0", "red", label="idCat0_prop_idColor")
+
+        # Act
+        key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+        reordered_key = POGG.composition_cache.graph_key(reordered, "idCat0", self.lexicon)
+        memoized_key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon, memoize=True)
+
+        # Assert
+        # the children are composed in a different order, so the MRS can be different
+        self.assertNotEqual(key, reordered_key)
+        self.assertNotEqual(key, memoized_key)
+
+    def test_key_only_depends_on_entries_used(self):
+        # Arrange
+        graph = self._cat_graph()
+        key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+
+        # Act
+        self.lexicon['entityTypes']['idDog'] = "_dog_n_1"
+        unused_key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+        self.lexicon['propertyValues']['red'] = "_red_a_2"
+        used_key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+        # red is looked up in entityTypes first, so adding it there changes things too
+        self.lexicon['propertyValues']['red'] = "_red_a_1"
+        self.lexicon['entityTypes']['red'] = "_red_n_1"
+        shadowed_key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+
+        # Assert
+        self.assertEqual(key, unused_key)
+        self.assertNotEqual(key, used_key)
+        self.assertNotEqual(key, shadowed_key)
+
+    def test_key_follows_compositional_entries(self):
+        # Arrange
+        self.lexicon['entityTypes']['idCat'] = {
+            'composition': "compound",
+            'predicates': {'head': "idBox", 'modifier': "_cat_n_1"}
+        }
+        graph = self._cat_graph()
+        key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+
+        # Act
+        self.lexicon['entityTypes']['idBox'] = "_crate_n_1"
+        changed_key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+
+        # Assert
+        self.assertNotEqual(key, changed_key)
+
+    def test_graph_lexicon_fingerprint(self):
+        # Arrange
+        graph = self._cat_graph()
+        fingerprint = POGG.composition_cache.graph_lexicon_fingerprint(graph, self.lexicon)
+
+        # Act
+        renumbered = POGG.composition_cache.graph_lexicon_fingerprint(self._cat_graph("idCat7", "idBox3"), self.lexicon)
+        self.lexicon['entityTypes']['idDog'] = "_dog_n_1"
+        unused = POGG.composition_cache.graph_lexicon_fingerprint(graph, self.lexicon)
+        self.lexicon['properties']['insideOf'] = "adjective"
+        used = POGG.composition_cache.graph_lexicon_fingerprint(graph, self.lexicon)
+
+        # Assert
+        self.assertEqual(fingerprint, renumbered)
+        self.assertEqual(fingerprint, unused)
+        self.assertNotEqual(fingerprint, used)
+
+    def test_compose_is_cached(self):
+        # Arrange
+        # nothing in the graph is in the lexicon, so no composition_library functions are needed
+        graph = self._cat_graph()
+        lexicon = {'entityTypes': {}, 'propertyValues': {}, 'properties': {}}
+        key = POGG.composition_cache.graph_key(graph, "idCat0", lexicon)
+
+        # Act
+        mrs_string, eval_info = POGG.composition_cache.compose(graph, "idCat0", lexicon, cache_dir=self.cache_dir)
+        cached = POGG.composition_cache.load(self.cache_dir, key)
+
+        # Assert
+        self.assertEqual(mrs_string, "")
+        self.assertTrue(os.path.exists(POGG.composition_cache.cache_path(self.cache_dir, key)))
+        self.assertEqual(cached[0], mrs_string)
+        self.assertEqual(list(cached[1]['nodes']), list(eval_info['nodes']))
+        self.assertEqual(cached[1]['edges']['insideOf_2']['produced'], (False, "Outbound from failed node"))
+
+    def test_compose_uses_cache(self):
+        # Arrange
+        graph = self._cat_graph()
+        key = POGG.composition_cache.graph_key(graph, "idCat0", self.lexicon)
+        POGG.composition_cache.store(self.cache_dir, key, "cached MRS", {'nodes': {}, 'edges': {}})
+
+        # Act
+        mrs_string, eval_info = POGG.composition_cache.compose(graph, "idCat0", self.lexicon, cache_dir=self.cache_dir)
+
+        # Assert
+        self.assertEqual(mrs_string, "cached MRS")
+        self.assertEqual(eval_info, {'nodes': {}, 'edges': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+import POGG.config
+
+
+class TestSEMICache(unittest.TestCase):
+    """
+    Test loading the SEMI through the on-disk cache
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.semi_dir = os.path.join(self.temp_dir.name, "semi")
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+        os.makedirs(self.semi_dir)
+        self.top_path = os.path.join(self.semi_dir, "top.smi")
+        self.preds_path = os.path.join(self.semi_dir, "preds.smi")
+        with open(self.top_path, 'w') as f:
+            f.write("variables:\n  u.\n  i < u.\n  e < i.\n  x < i.\n\nroles:\n  ARG0 : i.\n\ninclude: preds.smi\n")
+        self._write_preds("_cat_n_1 : ARG0 x.\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write_preds(self, preds):
+        with open(self.preds_path, 'w') as f:
+            f.write("predicates:\n  " + preds)
+
+    def test_cached_SEMI(self):
+        # Arrange
+        first = POGG.config.load_SEMI(self.top_path, self.cache_dir)
+
+        # Act
+        second = POGG.config.load_SEMI(self.top_path, self.cache_dir)
+
+        # Assert
+        # the second load comes from the cache, so it's a different object with the same contents
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.to_dict(), second.to_dict())
+
+    def test_changed_include_invalidates(self):
+        # Arrange
+        POGG.config.load_SEMI(self.top_path, self.cache_dir)
+        self._write_preds("_cat_n_1 : ARG0 x.\n  _dog_n_1 : ARG0 x.\n")
+
+        # Act
+        reloaded = POGG.config.load_SEMI(self.top_path, self.cache_dir)
+
+        # Assert
+        self.assertIn('_dog_n_1', reloaded.predicates)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import POGG.evaluation
+
+
+class TestEvalTable(unittest.TestCase):
+    """
+    Test recording eval information in one flat table
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def _included(self):
+        return True, "Included in MRS"
+
+    def test_nested_marks(self):
+        # Arrange
+        # garden -(has)-> wall -(coveredIn)-> ivy, where wall fails after ivy's edge failed
+        table = POGG.evaluation.EvalTable()
+        table.add_node('garden_1', self._included(), self._included())
+        has = table.reserve_edge()
+        wall_start = table.position()
+        table.add_node('wall_2', self._included(), self._included())
+        covered_in = table.reserve_edge()
+        ivy_start = table.position()
+        table.add_node('ivy_3', self._included(), self._included())
+        table.add_node('leaf_4', (False, "Not in lexicon"), (False, "Not in lexicon"))
+
+        # Act
+        table.set_edge(covered_in, 'coveredIn_1', (False, "No rule"), (False, "No rule"))
+        table.mark_not_included(ivy_start, (False, "Descends from failed edge"))
+        table.set_edge(has, 'has_2', (False, "Outbound from failed node"), (False, "Outbound from failed node"))
+        table.mark_not_included(wall_start, (False, "Descends from failed node"))
+        eval_info = table.to_eval_info()
+
+        # Assert
+        # edges come before the subtree below them, even though they're numbered after it
+        self.assertEqual(list(eval_info['edges']), ['has_2', 'coveredIn_1'])
+        self.assertEqual(list(eval_info['nodes']), ['garden_1', 'wall_2', 'ivy_3', 'leaf_4'])
+        self.assertEqual(eval_info['nodes']['garden_1']['included'], self._included())
+        self.assertEqual(eval_info['nodes']['wall_2']['included'], (False, "Descends from failed node"))
+        # the innermost failure is the reason, and anything that already failed keeps its own reason
+        self.assertEqual(eval_info['nodes']['ivy_3']['included'], (False, "Descends from failed edge"))
+        self.assertEqual(eval_info['nodes']['leaf_4']['included'], (False, "Not in lexicon"))
+        self.assertEqual(eval_info['edges']['coveredIn_1']['included'], (False, "No rule"))
+
+    def test_subtree_copy(self):
+        # Arrange
+        table = POGG.evaluation.EvalTable()
+        table.add_node('garden_1', self._included(), self._included())
+        table.reserve_edge()
+        wall_start = table.position()
+        table.add_node('wall_2', self._included(), self._included())
+        table.reserve_edge()
+        ivy_start = table.position()
+        table.add_node('ivy_3', self._included(), self._included())
+        table.mark_not_included(ivy_start, (False, "Descends from failed edge"))
+
+        # Act
+        subtree = table.subtree(wall_start)
+        copy = POGG.evaluation.EvalTable()
+        copy.extend(subtree, lambda n: n.upper())
+
+        # Assert
+        self.assertEqual(subtree.node_names, ['wall_2', 'ivy_3'])
+        self.assertEqual(copy.to_eval_info()['nodes'],
+                         {'WALL_2': {'produced': self._included(), 'included': self._included()},
+                          'IVY_3': {'produced': self._included(), 'included': (False, "Descends from failed edge")}})
+        # marks on the copy don't touch the original
+        self.assertEqual(table.node_entries[2]['included'], self._included())
+
+
+if __name__ == '__main__':
+    unittest.main()
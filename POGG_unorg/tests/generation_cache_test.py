@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from delphin import interface
+
+import POGG.ace_pool
+import POGG.generation_cache
+
+MRS = "[ TOP: h0 INDEX: x1 RELS: < [ _cat_n_1 LBL: h2 ARG0: x1 ] > HCONS: < h0 qeq h2 > ]"
+RENAMED_MRS = "[ TOP: h7 INDEX: x3 RELS: < [ _cat_n_1 LBL: h5 ARG0: x3 ] > HCONS: < h7 qeq h5 > ]"
+
+
+class TestGenerationCache(unittest.TestCase):
+    """
+    Test caching generation results by MRS, in memory and in the on-disk database
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.grammar = os.path.join(self.temp_dir.name, "erg.dat")
+        with open(self.grammar, 'w') as grammar_file:
+            grammar_file.write("image")
+        self.path = POGG.generation_cache.cache_path(self.temp_dir.name)
+        self.results = [interface.Result({'surface': "cat"}), interface.Result({'surface': "the cat"})]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key(self):
+        # Arrange
+        cache = POGG.generation_cache.GenerationCache()
+        other_grammar = os.path.join(self.temp_dir.name, "other.dat")
+        with open(other_grammar, 'w') as grammar_file:
+            grammar_file.write("another image")
+
+        # Act
+        key = cache.key(MRS, self.grammar, ['-r', 'root_frag'])
+
+        # Assert
+        self.assertEqual(key, cache.key(RENAMED_MRS, self.grammar, ['-r', 'root_frag']))
+        self.assertNotEqual(key, cache.key(MRS, self.grammar, ['-r', 'root_informal']))
+        self.assertNotEqual(key, cache.key(MRS, other_grammar, ['-r', 'root_frag']))
+
+    def test_kept_on_disk(self):
+        # Arrange
+        with POGG.generation_cache.GenerationCache(self.path) as cache:
+            key = cache.key(MRS, self.grammar, ['-r', 'root_frag'])
+            cache.put(key, self.results, POGG.ace_pool.GENERATION_TRUNCATED)
+
+        # Act
+        with POGG.generation_cache.GenerationCache(self.path) as cache:
+            results = cache.get(key)
+            missing = cache.get("0" * 40)
+
+        # Assert
+        self.assertEqual([r.get('surface') for r in results], ["cat", "the cat"])
+        self.assertIsInstance(results[0], interface.Result)
+        self.assertEqual(results.status, POGG.ace_pool.GENERATION_TRUNCATED)
+        self.assertIsNone(missing)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_dropped(self):
+        # Arrange
+        cache = POGG.generation_cache.GenerationCache(size=2)
+        cache.put("a", self.results)
+        cache.put("b", self.results)
+
+        # Act
+        cache.get("a")
+        cache.put("c", self.results)
+
+        # Assert
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
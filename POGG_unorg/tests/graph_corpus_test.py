@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import networkx as nx
+
+import POGG.graph_corpus
+import POGG.graph_util
+
+
+class TestGraphCorpus(unittest.TestCase):
+    """
+    Test packing a directory of .dot files and reading graphs back out of the pack
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.graph_directory = self.temp_dir.name
+
+        cat = nx.MultiDiGraph()
+        cat.add_node("idCat0", node_type="entity_node", root="root")
+        cat.add_node("red", node_type="property_node")
+        cat.add_edge("idCat0", "red", label="idCat0_prop_idColor", edge_type="property")
+        cat.add_edge("idCat0", "idBox1", label="insideOf", edge_type="relationship")
+        cat.add_edge("idCat0", "red", label='"has part"', edge_type="property")
+        POGG.graph_util.write_graph_to_dot(cat, self._path("graph0"))
+
+        box = nx.MultiDiGraph()
+        box.add_node("idBox0", node_type="entity_node")
+        POGG.graph_util.write_graph_to_dot(box, self._path("graph1"))
+
+    def tearDown(self):
+        POGG.graph_corpus.close_corpora()
+        self.temp_dir.cleanup()
+
+    def _path(self, graph_name):
+        return os.path.join(self.graph_directory, graph_name + ".dot")
+
+    def _assert_same_graph(self, graph, expected):
+        self.assertEqual(type(graph), type(expected))
+        self.assertEqual(graph.graph, expected.graph)
+        self.assertEqual(list(graph.nodes(data=True)), list(expected.nodes(data=True)))
+        self.assertEqual(list(graph.edges(keys=True, data=True)), list(expected.edges(keys=True, data=True)))
+
+    def test_same_as_read_dot(self):
+        # Arrange
+        POGG.graph_corpus.pack_corpus(self.graph_directory)
+
+        # Act
+        with POGG.graph_corpus.open_corpus(self.graph_directory, repack=False) as corpus:
+            graphs = {name: corpus.graph(name) for name in corpus.names()}
+
+        # Assert
+        self.assertEqual(sorted(graphs), ["graph0", "graph1"])
+        for name, graph in graphs.items():
+            self._assert_same_graph(graph, POGG.graph_util.read_dot(self._path(name)))
+
+    def test_changed_file_is_read_from_dot(self):
+        # Arrange
+        POGG.graph_corpus.pack_corpus(self.graph_directory)
+        with open(self._path("graph1")) as dot_file:
+            data = dot_file.read()
+        # a different size, so the change is noticed even if the mtime hasn't moved on
+        with open(self._path("graph1"), 'w') as dot_file:
+            dot_file.write(data.replace("idBox0", "idBox70"))
+
+        # Act
+        corpus = POGG.graph_corpus.GraphCorpus(POGG.graph_corpus.corpus_path(self.graph_directory))
+        graph = POGG.graph_corpus.read_graph(self._path("graph1"))
+
+        # Assert
+        self.assertTrue(corpus.is_stale())
+        self.assertFalse(corpus.is_current("graph1"))
+        self.assertTrue(corpus.is_current("graph0"))
+        self.assertEqual(list(graph.nodes), ["idBox70"])
+        corpus.close()
+
+    def test_open_corpus_repacks(self):
+        # Arrange
+        POGG.graph_corpus.pack_corpus(self.graph_directory)
+        POGG.graph_util.write_graph_to_dot(nx.MultiDiGraph(), self._path("graph2"))
+
+        # Act
+        with POGG.graph_corpus.open_corpus(self.graph_directory) as corpus:
+            # Assert
+            self.assertFalse(corpus.is_stale())
+            self.assertIn("graph2", corpus)
+
+    def test_without_pack(self):
+        # Act
+        graph = POGG.graph_corpus.read_graph(self._path("graph0"))
+
+        # Assert
+        self._assert_same_graph(graph, POGG.graph_util.read_dot(self._path("graph0")))
+
+    def test_copied_pack(self):
+        # Arrange
+        POGG.graph_corpus.pack_corpus(self.graph_directory)
+        copy_directory = os.path.join(self.graph_directory, "copy")
+        shutil.copytree(self.graph_directory, copy_directory)
+        copy_path = os.path.join(copy_directory, "graph1.dot")
+        with open(copy_path) as dot_file:
+            data = dot_file.read()
+        with open(copy_path, 'w') as dot_file:
+            dot_file.write(data.replace("idBox0", "idBox70"))
+
+        # Act
+        copy_graph = POGG.graph_corpus.read_graph(copy_path)
+        graph = POGG.graph_corpus.read_graph(self._path("graph1"))
+        with POGG.graph_corpus.GraphCorpus(POGG.graph_corpus.corpus_path(copy_directory)) as corpus:
+            stale = corpus.is_stale()
+
+        # Assert
+        self.assertEqual(list(copy_graph.nodes), ["idBox70"])
+        self.assertEqual(list(graph.nodes), ["idBox0"])
+        self.assertTrue(stale)
+
+    def test_moved_pack(self):
+        # Arrange
+        POGG.graph_corpus.pack_corpus(self.graph_directory)
+        moved_directory = os.path.join(self.graph_directory, "moved")
+        os.mkdir(moved_directory)
+        for filename in ["graph0.dot", "graph1.dot", POGG.graph_corpus.CORPUS_FILENAME]:
+            os.rename(os.path.join(self.graph_directory, filename), os.path.join(moved_directory, filename))
+
+        # Act
+        with POGG.graph_corpus.open_corpus(moved_directory, repack=False) as corpus:
+            stale = corpus.is_stale()
+            graphs = {name: corpus.graph(name) for name in corpus.names()}
+
+        # Assert
+        self.assertFalse(stale)
+        for name, graph in graphs.items():
+            self._assert_same_graph(graph, POGG.graph_util.read_dot(os.path.join(moved_directory, name + ".dot")))
+
+
+if __name__ == '__main__':
+    unittest.main()
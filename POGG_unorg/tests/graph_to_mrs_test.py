@@ -0,0 +1,248 @@
+import pickle
+import unittest
+
+import networkx as nx
+
+import POGG.evaluation
+import POGG.graph_to_mrs
+import POGG.mrs_algebra
+
+
+class TestSubtreeMemo(unittest.TestCase):
+    """
+    Test reusing subtrees composed under nodes with several parents
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.graph = object()
+        self.lexicon = {'propertyValues': {'red': '_red_a_1'}}
+        sep = POGG.mrs_algebra.SEP('_red_a_1', 'h1', {'ARG0': 'e2', 'ARG1': 'u3'})
+        self.red = POGG.mrs_algebra.SEMENT(None, 'h1', 'u3', [sep], {}, {'ARG1': 'u3'})
+        self.eval_table = POGG.evaluation.EvalTable()
+        self.eval_table.add_node('red_3', (True, "MRS fragment produced"), (True, "Included in MRS"))
+
+    def test_reuse_renumbers(self):
+        # Arrange
+        memo = POGG.graph_to_mrs.SubtreeMemo(self.graph, self.lexicon)
+        memo.store('red', self.red, self.eval_table, 2, 3, 1, 1)
+
+        # Act
+        reused = memo.reuse('red', 5, 4)
+
+        # Assert
+        reused_mrs, reused_eval_table, node_count, edge_count = reused
+        self.assertEqual(reused_eval_table.node_names, ['red_6'])
+        self.assertEqual((node_count, edge_count), (6, 4))
+        self.assertEqual(reused_mrs.rels[0].predicate, '_red_a_1')
+        self.assertNotEqual(reused_mrs.index, self.red.index)
+
+    def test_stored_entries_unaffected(self):
+        # Arrange
+        memo = POGG.graph_to_mrs.SubtreeMemo(self.graph, self.lexicon)
+        memo.store('red', self.red, self.eval_table, 2, 3, 1, 1)
+
+        # Act
+        # parents mark entries as not included, and constructions can move the index
+        first_mrs, first_eval_table, _, _ = memo.reuse('red', 2, 1)
+        first_eval_table.mark_not_included((0, 0), (False, "Descends from failed edge"))
+        first_eval_table.to_eval_info()
+        self.red.index = 'e2'
+        reused_mrs, reused_eval_table, _, _ = memo.reuse('red', 2, 1)
+
+        # Assert
+        self.assertEqual(reused_eval_table.to_eval_info()['nodes']['red_3']['included'], (True, "Included in MRS"))
+        self.assertEqual(reused_mrs.index, reused_mrs.holes['ARG1'])
+
+    def test_lexicon_change(self):
+        # Arrange
+        memo = POGG.graph_to_mrs.SubtreeMemo(self.graph, self.lexicon)
+        memo.store('red', self.red, self.eval_table, 2, 3, 1, 1)
+
+        # Act
+        self.lexicon['propertyValues']['red'] = '_scarlet_a_1'
+        new_memo = POGG.graph_to_mrs.SubtreeMemo(self.graph, self.lexicon)
+
+        # Assert
+        self.assertNotEqual(memo.lexicon_version, new_memo.lexicon_version)
+        self.assertIsNone(new_memo.reuse('red', 2, 1))
+
+
+class TestClassifyPredicates(unittest.TestCase):
+    """
+    Test guessing the part of speech of predicate labels
+    """
+
+    def test_classify_predicates(self):
+        # Arrange
+        pred_labels = ['_cat_n_1', '_light-blue_a_1', '_sit_v_1', '_every_q', '_on_p_loc', 'udef_q', '_give_v_to']
+
+        # Act
+        classified = POGG.graph_to_mrs.classify_predicates(pred_labels)
+
+        # Assert
+        self.assertEqual(list(classified.values()), ['noun_ssement', 'adjective_ssement', 'verb_ssement',
+                                                     'quant_ssement', 'preposition_ssement', 'basic', 'basic'])
+
+    def test_classify_lexicon(self):
+        # Arrange
+        lexicon = {
+            'entityTypes': {'idCat': '_cat_n_1', 'idEmpty': '',
+                            'idCatFood': {'composition': 'compound',
+                                          'predicates': {'head': '_food_n_1', 'modifier': 'idCat'}}},
+            'propertyValues': {'red': '_red_a_1'}
+        }
+
+        # Act
+        classified = POGG.graph_to_mrs.classify_lexicon(lexicon)
+
+        # Assert
+        # lexicon keys (like idCat) aren't predicates, only the labels they map to are
+        self.assertEqual(classified, {'_cat_n_1': 'noun_ssement', '_food_n_1': 'noun_ssement',
+                                      '_red_a_1': 'adjective_ssement'})
+
+
+class TestCompiledLexicon(unittest.TestCase):
+    """
+    Test compiling the lexicon into node/edge lookups
+    """
+
+    def setUp(self):
+        self.lexicon = {
+            'entityTypes': {'idEmpty': '', 'idBroken': {'composition': 'compound',
+                                                        'predicates': {'head': 'idMissing', 'modifier': 'idEmpty'}}},
+            'propertyValues': {},
+            'properties': {'idNope': 'not_a_composition'}
+        }
+
+    def test_problems(self):
+        # Arrange/Act
+        compiled = POGG.graph_to_mrs.CompiledLexicon(self.lexicon)
+
+        # Assert
+        self.assertEqual(compiled.problems, [
+            "entityTypes 'idEmpty': 'idEmpty' has no value in the lexicon",
+            "entityTypes 'idBroken': Can't find 'idMissing' as a key in the lexicon",
+            "properties 'idNope': Can't find 'not_a_composition' as a key in comp_to_graph_relations.json"
+        ])
+
+    def test_same_errors(self):
+        # Arrange
+        compiled = POGG.graph_to_mrs.CompiledLexicon(self.lexicon)
+
+        # Act/Assert
+        # errors from a compiled lexicon are the same ones node_to_mrs/edge_to_mrs give for the plain one
+        for lexicon in (self.lexicon, compiled):
+            with self.assertRaisesRegex(KeyError, "Can't find 'idUnknown' as a key in the lexicon"):
+                POGG.graph_to_mrs.node_to_mrs('idUnknown', lexicon)
+            with self.assertRaisesRegex(ValueError, "'idEmpty' has no value in the lexicon"):
+                POGG.graph_to_mrs.node_to_mrs('idEmpty', lexicon)
+            with self.assertRaisesRegex(KeyError, "Can't find 'idMissing' as a key in the lexicon"):
+                POGG.graph_to_mrs.node_to_mrs('idBroken', lexicon)
+            with self.assertRaisesRegex(KeyError, "'not_a_composition'"):
+                POGG.graph_to_mrs.edge_to_mrs(None, None, 'idNope', lexicon)
+
+    def test_pickle(self):
+        # Arrange
+        compiled = POGG.graph_to_mrs.CompiledLexicon(self.lexicon)
+
+        # Act
+        unpickled = pickle.loads(pickle.dumps(compiled))
+
+        # Assert
+        # it's compiled again on the other side
+        self.assertIsInstance(unpickled, POGG.graph_to_mrs.CompiledLexicon)
+        self.assertEqual(unpickled, self.lexicon)
+        self.assertEqual(unpickled.problems, compiled.problems)
+        self.assertEqual(POGG.graph_to_mrs.lexicon_fingerprint(unpickled),
+                         POGG.graph_to_mrs.lexicon_fingerprint(self.lexicon))
+
+
+class TestGraphTraversal(unittest.TestCase):
+    """
+    Test walking the graph without recursion
+    """
+
+    def setUp(self):
+        # nothing's in the lexicon, so every node fails and nothing needs composing
+        self.lexicon = {'entityTypes': {}, 'propertyValues': {}, 'properties': {}}
+
+    def _chain(self, length):
+        graph = nx.MultiDiGraph()
+        for i in range(length):
+            graph.add_edge("node{}".format(i), "node{}".format(i + 1), label="next")
+        return graph
+
+    def test_deeper_than_recursion_limit(self):
+        # Arrange
+        graph = self._chain(1500)
+
+        # Act
+        graph_mrs, eval_info, node_count, edge_count = POGG.graph_to_mrs.graph_to_mrs("node0", graph, self.lexicon)
+
+        # Assert
+        self.assertIsNone(graph_mrs)
+        self.assertEqual((node_count, edge_count), (1501, 1500))
+        self.assertEqual(list(eval_info['nodes'])[:3], ['node0_1', 'node1_2', 'node2_3'])
+        # the edge out of the root is numbered after every edge below it
+        self.assertEqual(list(eval_info['edges'])[:2], ['next_1500', 'next_1499'])
+        self.assertEqual(eval_info['edges']['next_1500']['included'], (False, "Outbound from failed node"))
+
+    def test_hooks(self):
+        # Arrange
+        graph = nx.MultiDiGraph()
+        graph.add_edge("dog", "collar", label="has")
+        graph.add_edge("dog", "ball", label="chases")
+        visited = []
+
+        # Act
+        POGG.graph_to_mrs.graph_to_mrs("dog", graph, self.lexicon,
+                                       on_node=lambda node, name, node_mrs, entry: visited.append(name),
+                                       on_edge=lambda parent, child, name, composed_mrs, entry: visited.append(name))
+
+        # Assert
+        self.assertEqual(visited, ['dog_1', 'collar_2', 'has_1', 'ball_3', 'chases_2'])
+
+    def test_hooks_with_memo(self):
+        # Arrange
+        graph = nx.MultiDiGraph()
+        graph.add_edge("dog", "ball", label="chases")
+        graph.add_edge("ball", "string", label="has")
+        graph.add_edge("cat", "ball", label="chases")
+        graph.add_edge("dog", "cat", label="chases")
+        memo = POGG.graph_to_mrs.SubtreeMemo(graph, self.lexicon)
+        visited = []
+        memo_visited = []
+
+        def hooks(calls):
+            # errors don't compare equal, so only keep whether the entries were produced and included
+            return {'on_node': lambda node, name, node_mrs, entry:
+                    calls.append((node, name, entry['produced'][0], entry['included'][0])),
+                    'on_edge': lambda parent, child, name, composed_mrs, entry:
+                    calls.append((parent, child, name, entry['produced'][0], entry['included'][0]))}
+
+        # Act
+        POGG.graph_to_mrs.graph_to_mrs("dog", graph, self.lexicon, **hooks(visited))
+        POGG.graph_to_mrs.graph_to_mrs("dog", graph, self.lexicon, memo=memo, **hooks(memo_visited))
+
+        # Assert
+        # the ball's subtree is reused under the cat, and its hooks are still called there
+        self.assertEqual(len(memo), 1)
+        self.assertEqual(memo_visited, visited)
+        self.assertIn(("ball", "string", "has_3", False, False), memo_visited)
+
+    def test_cycle(self):
+        # Arrange
+        graph = self._chain(3)
+        graph.add_edge("node3", "node1", label="next")
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            POGG.graph_to_mrs.graph_to_mrs("node0", graph, self.lexicon)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import warnings
+
+import networkx as nx
+
+import POGG.graph_util
+
+
+class TestReadDot(unittest.TestCase):
+    """
+    Test reading .dot files without going through pydot
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dot_path = os.path.join(self.temp_dir.name, "graph.dot")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _pydot_graph(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            graph = nx.drawing.nx_pydot.read_dot(self.dot_path)
+        # pydot adds a stray '\n' node for edges with attributes
+        graph.remove_nodes_from(["\\n"])
+        return graph
+
+    def _assert_same_graph(self, graph, expected):
+        self.assertEqual(type(graph), type(expected))
+        self.assertEqual(graph.graph, expected.graph)
+        self.assertEqual(list(graph.nodes(data=True)), list(expected.nodes(data=True)))
+        self.assertEqual(list(graph.edges(keys=True, data=True)), list(expected.edges(keys=True, data=True)))
+
+    def test_same_as_pydot(self):
+        # Arrange
+        graph = nx.MultiDiGraph()
+        graph.add_node("idCat0", node_type="entity_node", root="root")
+        graph.add_node('"light blue"', node_type="property_node")
+        graph.add_edge("idCat0", '"light blue"', label="idCat0_prop_idColor", edge_type="property")
+        graph.add_edge("idCat0", "idBox1", label="insideOf", edge_type="relationship")
+        graph.add_edge("idCat0", '"light blue"', label='"has part"', edge_type="property")
+        POGG.graph_util.write_graph_to_dot(graph, self.dot_path)
+
+        # Act
+        read_graph = POGG.graph_util.read_dot(self.dot_path)
+
+        # Assert
+        self._assert_same_graph(read_graph, self._pydot_graph())
+        self.assertEqual(read_graph.nodes["light blue"]['node_type'], "property_node")
+
+    def test_falls_back_to_pydot(self):
+        # Arrange
+        # default node attributes aren't something the native reader handles
+        with open(self.dot_path, 'w') as dot_file:
+            dot_file.write("digraph {\n  node [shape=box];\n  idCat0 -> red [label=idColor];\n}\n")
+
+        # Act
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            read_graph = POGG.graph_util.read_dot(self.dot_path)
+        read_graph.remove_nodes_from(["\\n"])
+
+        # Assert
+        self._assert_same_graph(read_graph, self._pydot_graph())
+        self.assertEqual(read_graph.graph['node'], {'shape': 'box'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import unittest
+
+import POGG.lexicon_index
+import POGG.run_manifest
+
+
+class TestLexiconIndex(unittest.TestCase):
+    """
+    Test finding the graphs that use edited lexicon entries
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.results_directory = self.temp_dir.name
+        self.lexicon = {
+            'entityTypes': {'idCat': "_cat_n_1", 'idBox': "_box_n_1"},
+            'propertyValues': {'red': "_red_a_1"},
+            'properties': {'idColor': "adjective", 'insideOf': "preposition"}
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _manifest(self, graphs):
+        # manifest for a run of graphs, given as name -> .dot statements
+        manifest = POGG.run_manifest.RunManifest(POGG.run_manifest.manifest_path(self.results_directory), "config")
+        graph_paths = []
+        for name, statements in graphs.items():
+            graph_path = os.path.join(self.temp_dir.name, name + ".dot")
+            with open(graph_path, 'w') as graph_file:
+                graph_file.write("digraph  {\n" + statements + "}\n")
+            graph_paths.append(graph_path)
+        for graph_path in manifest.stale_graphs(graph_paths, self.lexicon):
+            graph_name = os.path.splitext(os.path.basename(graph_path))[0]
+            manifest.record((graph_name, {'nodes': {}, 'edges': {}}, [1, "Successfully generated", "ok"]),
+                            self.results_directory)
+        manifest.close()
+        return manifest
+
+    def test_lexicon_changes(self):
+        # Arrange
+        new_lexicon = {
+            'entityTypes': {'idCat': "_cat_n_1", 'idBox': "_crate_n_1", 'idDog': "_dog_n_1"},
+            'propertyValues': {},
+            'properties': {'idColor': "adjective", 'insideOf': "preposition"}
+        }
+
+        # Act
+        changes = POGG.lexicon_index.lexicon_changes(self.lexicon, new_lexicon)
+
+        # Assert
+        self.assertEqual(changes, {'entityTypes': ["idBox", "idDog"], 'propertyValues': ["red"]})
+
+    def test_affected_graphs(self):
+        # Arrange
+        manifest = self._manifest({
+            'cat': 'idCat0 [root=root];\nidCat0 -> red [label=idCat0_prop_idColor];\n',
+            'box': 'idBox0 [root=root];\nidBox0 -> idBox1 [label=insideOf];\n'
+        })
+        index = POGG.lexicon_index.build_index(manifest)
+
+        # Act
+        red_affected = POGG.lexicon_index.affected_graphs(index, {'propertyValues': ["red"]})
+        box_affected = POGG.lexicon_index.affected_graphs(index, {'entityTypes': ["idBox"], 'properties': ["insideOf"]})
+        # red is looked up in entityTypes before propertyValues, so adding it there changes the cat graph too
+        new_entry_affected = POGG.lexicon_index.affected_graphs(index, {'entityTypes': ["red"]})
+        unused_affected = POGG.lexicon_index.affected_graphs(index, {'entityTypes': ["idDog"]})
+
+        # Assert
+        self.assertEqual(red_affected, {'cat': ["red"]})
+        self.assertEqual(box_affected, {'box': ["idBox0", "idBox1", "insideOf"]})
+        self.assertEqual(new_entry_affected, {'cat': ["red"]})
+        self.assertEqual(unused_affected, {})
+
+    def test_index_read_from_manifest(self):
+        # Arrange
+        self._manifest({'cat': 'idCat0 [root=root];\nidCat0 -> red [label=idCat0_prop_idColor];\n'})
+
+        # Act
+        manifest = POGG.run_manifest.RunManifest(POGG.run_manifest.manifest_path(self.results_directory), "config")
+        index = POGG.lexicon_index.build_index(manifest)
+
+        # Assert
+        self.assertEqual(index['properties']['idColor'], {'cat': ["idCat0_prop_idColor"]})
+        self.assertEqual(index['entityTypes']['idCat'], {'cat': ["idCat0"]})
+
+    def test_snapshot(self):
+        # Act
+        POGG.lexicon_index.save_snapshot(self.lexicon, self.results_directory)
+        self.lexicon['propertyValues']['red'] = "_red_a_2"
+        with open(POGG.lexicon_index.snapshot_path(self.results_directory)) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+
+        # Assert
+        self.assertEqual(POGG.lexicon_index.lexicon_changes(snapshot, self.lexicon), {'propertyValues': ["red"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
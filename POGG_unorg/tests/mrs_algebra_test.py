@@ -0,0 +1,128 @@
+import threading
+import unittest
+
+from delphin import mrs
+
+import POGG.mrs_algebra
+
+
+class TestVarLabelerScope(unittest.TestCase):
+    """
+    Test numbering variables per context instead of with the global labeler
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def test_scope_numbers_from_zero(self):
+        # Arrange
+        POGG.mrs_algebra.get_var_labeler().get_var_name('x')
+
+        # Act
+        with POGG.mrs_algebra.var_labeler_scope():
+            first = POGG.mrs_algebra.get_var_labeler().get_var_name('x')
+            second = POGG.mrs_algebra.get_var_labeler().get_var_name('h')
+
+        # Assert
+        self.assertEqual((first, second), ('x0', 'h1'))
+        self.assertIs(POGG.mrs_algebra.get_var_labeler(), POGG.mrs_algebra.VAR_LABELER)
+
+    def test_threads_do_not_interleave(self):
+        # Arrange
+        names = {}
+
+        def label(thread_id):
+            with POGG.mrs_algebra.var_labeler_scope():
+                names[thread_id] = [POGG.mrs_algebra.get_var_labeler().get_var_name('e') for _ in range(1000)]
+
+        threads = [threading.Thread(target=label, args=(i,)) for i in range(4)]
+
+        # Act
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # Assert
+        expected = ["e{}".format(i) for i in range(1000)]
+        for thread_id in range(4):
+            self.assertEqual(names[thread_id], expected)
+
+
+class TestComposedSEMENT(unittest.TestCase):
+    """
+    Test SEMENTs made by composition, whose fields are filled in from chains when they're used
+    """
+
+    def _noun(self, predicate, index, label):
+        sep = POGG.mrs_algebra.SEP(predicate, label, {'ARG0': index})
+        return POGG.mrs_algebra.SEMENT(None, label, index, [sep], {index: {'NUM': 'sg'}}, {})
+
+    def _adjective(self, predicate, event, arg, label):
+        sep = POGG.mrs_algebra.SEP(predicate, label, {'ARG0': event, 'ARG1': arg})
+        return POGG.mrs_algebra.SEMENT(None, label, arg, [sep], {}, {'ARG1': arg})
+
+    def test_fields(self):
+        # Arrange
+        noun = self._noun('_cat_n_1', 'x1', 'h2')
+        adjective = self._adjective('_red_a_1', 'e3', 'i4', 'h5')
+
+        # Act
+        composed = POGG.mrs_algebra.op_non_scopal_lbl_shared(adjective, noun, 'ARG1')
+
+        # Assert
+        self.assertEqual([r.predicate for r in composed.rels], ['_red_a_1', '_cat_n_1'])
+        self.assertEqual(composed.eqs, [('x1', 'i4'), ('h5', 'h2')])
+        self.assertEqual(composed.variables['x1'], {'NUM': 'sg'})
+        # variables used in the rels get default entries, same as any MRS
+        self.assertEqual(composed.variables['e3'], {})
+        self.assertIs(composed['x1'], composed.rels[1])
+
+    def test_changes_after_composition_stay_separate(self):
+        # Arrange
+        noun = self._noun('_cat_n_1', 'x1', 'h2')
+        adjective = self._adjective('_red_a_1', 'e3', 'i4', 'h5')
+        composed = POGG.mrs_algebra.op_non_scopal_lbl_shared(adjective, noun, 'ARG1')
+
+        # Act
+        noun.variables['x1']['PERS'] = '3'
+
+        # Assert
+        self.assertEqual(composed.variables['x1'], {'NUM': 'sg'})
+
+    def test_to_mrs(self):
+        # Arrange
+        noun = self._noun('_cat_n_1', 'x1', 'h2')
+        adjective = self._adjective('_red_a_1', 'e3', 'i4', 'h5')
+        composed = POGG.mrs_algebra.op_non_scopal_lbl_shared(adjective, noun, 'ARG1')
+
+        # Act
+        plain = composed.to_mrs()
+
+        # Assert
+        self.assertIs(type(plain), mrs.MRS)
+        self.assertTrue(all(type(ep) is mrs.EP for ep in plain.rels))
+        self.assertEqual(plain, composed)
+
+    def test_alpha_rename(self):
+        # Arrange
+        noun = self._noun('_cat_n_1', 'x1', 'h2')
+        adjective = self._adjective('_red_a_1', 'e3', 'i4', 'h5')
+        composed = POGG.mrs_algebra.op_non_scopal_lbl_shared(adjective, noun, 'ARG1')
+
+        # Act
+        with POGG.mrs_algebra.var_labeler_scope(POGG.mrs_algebra.VarLabeler()):
+            renamed = POGG.mrs_algebra.alpha_rename(composed)
+
+        # Assert
+        # same structure, none of the same variables
+        self.assertTrue(mrs.is_isomorphic(renamed, composed))
+        self.assertFalse(set(renamed.variables) & set(composed.variables))
+        self.assertEqual(renamed.variables[renamed.index], {})
+        self.assertEqual(renamed.variables[renamed.rels[1].args['ARG0']], {'NUM': 'sg'})
+        self.assertEqual(len(renamed.eqs), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
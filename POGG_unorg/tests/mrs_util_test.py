@@ -0,0 +1,384 @@
+import asyncio
+import io
+import threading
+import time
+import unittest
+
+from delphin import interface, mrs
+from delphin.codecs import simplemrs
+
+import POGG.mrs_algebra
+import POGG.mrs_util
+
+
+class TestGroupEqualities(unittest.TestCase):
+    """
+    Test grouping individual EQs into groups of equivalent variables
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def test_transitive_groups(self):
+        # Arrange
+        # (x2,x3) joins the groups started by (x1,x2) and (x3,x4)
+        eqs = [('x1', 'x2'), ('x3', 'x4'), ('x2', 'x3'), ('h5', 'h6')]
+
+        # Act
+        groups = POGG.mrs_util.group_equalities(eqs)
+
+        # Assert
+        self.assertCountEqual(groups, [{'x1', 'x2', 'x3', 'x4'}, {'h5', 'h6'}])
+
+    def test_eqs_not_consumed(self):
+        # Arrange
+        eqs = [('x1', 'x2'), ('x2', 'x3')]
+
+        # Act
+        POGG.mrs_util.group_equalities(eqs)
+
+        # Assert
+        self.assertEqual(eqs, [('x1', 'x2'), ('x2', 'x3')])
+
+
+class TestOverwriteEqs(unittest.TestCase):
+    """
+    Test overwriting EQs with one representative variable per group
+    """
+
+    def test_overwrite_everywhere(self):
+        # Arrange
+        # i3 and x4 are equal to x2, so x2 or x4 (both type x) should replace all of them
+        rels = [POGG.mrs_algebra.SEP('_cat_n_1', 'h1', {'ARG0': 'x2'}),
+                POGG.mrs_algebra.SEP('_red_a_1', 'h5', {'ARG0': 'e6', 'ARG1': 'i3'})]
+        variables = {'x2': {'NUM': 'sg'}, 'i3': {}, 'x4': {'PERS': '3'}, 'e6': {}}
+        eqs = [('x2', 'i3'), ('i3', 'x4'), ('h1', 'h5')]
+        hcons = [mrs.HCons('h7', 'qeq', 'h5')]
+        icons = [mrs.ICons('e6', 'topic', 'i3')]
+        sement = POGG.mrs_algebra.SEMENT(None, 'h5', 'i3', rels, variables, {}, eqs, hcons, icons)
+
+        # Act
+        new_sement = POGG.mrs_util.overwrite_eqs(sement)
+
+        # Assert
+        rep = new_sement.index
+        self.assertIn(rep, ('x2', 'x4'))
+        self.assertEqual(new_sement.ltop, 'h1' if new_sement.rels[0].label == 'h1' else 'h5')
+        self.assertEqual(new_sement.rels[0].label, new_sement.rels[1].label)
+        self.assertEqual(new_sement.rels[1].args['ARG1'], rep)
+        self.assertEqual(new_sement.hcons[0].lo, new_sement.ltop)
+        self.assertEqual(new_sement.icons[0].right, rep)
+        self.assertEqual(new_sement.variables[rep], {'NUM': 'sg', 'PERS': '3'})
+        self.assertNotIn('i3', new_sement.variables)
+
+
+class TestCanonicalMRS(unittest.TestCase):
+    """
+    Test the canonical form of an MRS used to key generation results
+    """
+
+    MRS = """[ TOP: {h0} INDEX: {e1}
+  RELS: < [ _red_a_1 LBL: {h2} ARG0: {e1} ARG1: {x3} ]
+          [ named LBL: {h4} ARG0: {x3} CARG: "Kim" ]
+          [ _the_q LBL: {h5} ARG0: {x3} RSTR: {h6} BODY: {h7} ] >
+  HCONS: < {h6} qeq {h4} > ]"""
+
+    def _mrs(self, names):
+        return self.MRS.format(**dict(zip(['h0', 'e1', 'h2', 'x3', 'h4', 'h5', 'h6', 'h7'], names)))
+
+    def test_same_for_renamed_variables(self):
+        # Arrange
+        first = self._mrs(['h0', 'e1', 'h2', 'x3', 'h4', 'h5', 'h6', 'h7'])
+        second = self._mrs(['h20', 'e11', 'h2', 'x9', 'h14', 'h5', 'h16', 'h3'])
+
+        # Act
+        canonical = POGG.mrs_util.canonical_mrs(first)
+
+        # Assert
+        self.assertEqual(canonical, POGG.mrs_util.canonical_mrs(second))
+        self.assertIn('"Kim"', canonical)
+
+    def test_different_for_different_structure(self):
+        # Arrange
+        first = self._mrs(['h0', 'e1', 'h2', 'x3', 'h4', 'h5', 'h6', 'h7'])
+        # the adjective's label is now shared with the name
+        second = self._mrs(['h0', 'e1', 'h4', 'x3', 'h4', 'h5', 'h6', 'h7'])
+
+        # Act
+        canonical = POGG.mrs_util.canonical_mrs(first)
+
+        # Assert
+        self.assertNotEqual(canonical, POGG.mrs_util.canonical_mrs(second))
+
+
+class TestMRSFingerprint(unittest.TestCase):
+    """
+    Test fingerprinting MRSs so ones that can't be isomorphic are told apart without an isomorphism search
+    """
+
+    MRS = """[ TOP: h0 INDEX: e1
+  RELS: < [ _red_a_1 LBL: h2 ARG0: e1 [ e TENSE: untensed ] ARG1: x3 ]
+          [ _cat_n_1 LBL: h2 ARG0: x3 [ x NUM: sg ] ]
+          [ _the_q LBL: h5 ARG0: x3 RSTR: h6 BODY: h7 ]
+          [ _in_p_loc LBL: h2 ARG0: e8 ARG1: x3 ARG2: x9 ]
+          [ _box_n_1 LBL: h10 ARG0: x9 [ x NUM: {num} ] ]
+          [ _a_q LBL: h11 ARG0: x9 RSTR: h12 BODY: h13 ] >
+  HCONS: < h6 qeq h2 h12 qeq h10 > ]"""
+
+    # same MRS with its EPs in a different order and its variables named differently
+    REORDERED = """[ TOP: h20 INDEX: e21
+  RELS: < [ _a_q LBL: h31 ARG0: x29 RSTR: h32 BODY: h33 ]
+          [ _box_n_1 LBL: h30 ARG0: x29 [ x NUM: sg ] ]
+          [ _in_p_loc LBL: h22 ARG0: e28 ARG1: x23 ARG2: x29 ]
+          [ _the_q LBL: h25 ARG0: x23 RSTR: h26 BODY: h27 ]
+          [ _cat_n_1 LBL: h22 ARG0: x23 [ x NUM: sg ] ]
+          [ _red_a_1 LBL: h22 ARG0: e21 [ e TENSE: untensed ] ARG1: x23 ] >
+  HCONS: < h32 qeq h30 h26 qeq h22 > ]"""
+
+    def test_same_for_isomorphic(self):
+        # Arrange
+        first = simplemrs.decode(self.MRS.format(num="sg"))
+        second = simplemrs.decode(self.REORDERED)
+
+        # Act
+        fingerprint = POGG.mrs_util.mrs_fingerprint(first)
+
+        # Assert
+        self.assertTrue(mrs.is_isomorphic(first, second))
+        self.assertEqual(fingerprint, POGG.mrs_util.mrs_fingerprint(second))
+        self.assertTrue(POGG.mrs_util.is_isomorphic(first, second))
+
+    def test_different_for_different_structure(self):
+        # Arrange
+        first = simplemrs.decode(self.MRS.format(num="sg"))
+        # the cat is in the box -> the box is in the cat
+        swapped = simplemrs.decode(self.MRS.format(num="sg").replace("ARG1: x3 ARG2: x9", "ARG1: x9 ARG2: x3"))
+
+        # Act
+        fingerprint = POGG.mrs_util.mrs_fingerprint(first)
+
+        # Assert
+        self.assertNotEqual(fingerprint, POGG.mrs_util.mrs_fingerprint(swapped))
+        self.assertFalse(POGG.mrs_util.is_isomorphic(first, swapped))
+
+    def test_properties(self):
+        # Arrange
+        singular = simplemrs.decode(self.MRS.format(num="sg"))
+        plural = simplemrs.decode(self.MRS.format(num="pl"))
+
+        # Act
+        with_properties = POGG.mrs_util.is_isomorphic(singular, plural)
+        without_properties = POGG.mrs_util.is_isomorphic(singular, plural, properties=False)
+
+        # Assert
+        self.assertEqual(with_properties, mrs.is_isomorphic(singular, plural))
+        self.assertFalse(with_properties)
+        self.assertTrue(without_properties)
+
+    def test_agrees_with_delphin(self):
+        # Arrange
+        singular = self.MRS.format(num="sg")
+        variants = [
+            # renamed
+            singular.replace("x3", "x30").replace("h2", "h20"),
+            # reordered and renamed
+            self.REORDERED,
+            # different properties
+            self.MRS.format(num="pl"),
+            # arguments swapped
+            singular.replace("ARG1: x3 ARG2: x9", "ARG1: x9 ARG2: x3"),
+            # the cat no longer shares its label with red and in
+            singular.replace("[ _cat_n_1 LBL: h2", "[ _cat_n_1 LBL: h4"),
+            # qeqs swapped
+            singular.replace("h6 qeq h2 h12 qeq h10", "h6 qeq h10 h12 qeq h2"),
+            # different predicate
+            singular.replace("_box_n_1", "_bag_n_1")
+        ]
+        first = simplemrs.decode(singular)
+
+        for variant in variants:
+            second = simplemrs.decode(variant)
+            for properties in (True, False):
+                with self.subTest(variant=variant, properties=properties):
+                    # Act
+                    isomorphic = POGG.mrs_util.is_isomorphic(first, second, properties=properties)
+
+                    # Assert
+                    self.assertEqual(isomorphic, mrs.is_isomorphic(first, second, properties=properties))
+
+    def test_find_isomorphic(self):
+        # Arrange
+        composed = simplemrs.decode(self.MRS.format(num="sg"))
+        parses = [simplemrs.decode(self.MRS.format(num="pl")),
+                  simplemrs.decode(self.REORDERED),
+                  simplemrs.decode(self.MRS.format(num="sg").replace("ARG1: x3 ARG2: x9", "ARG1: x9 ARG2: x3"))]
+
+        # Act
+        isomorphic = POGG.mrs_util.find_isomorphic(composed, parses)
+        isomorphic_without_properties = POGG.mrs_util.find_isomorphic(composed, parses, properties=False)
+
+        # Assert
+        self.assertEqual(isomorphic, [1])
+        self.assertEqual(isomorphic_without_properties, [0, 1])
+
+
+class TestDiffMRS(unittest.TestCase):
+    """
+    Test finding what's different between a target MRS and a composed one
+    """
+
+    TARGET = """[ TOP: h0 INDEX: e1
+  RELS: < [ _red_a_1 LBL: h2 ARG0: e1 ARG1: x3 ]
+          [ _cat_n_1 LBL: h2 ARG0: x3 ]
+          [ _the_q LBL: h5 ARG0: x3 RSTR: h6 BODY: h7 ]
+          [ _in_p_loc LBL: h2 ARG0: e8 ARG1: x3 ARG2: x9 ]
+          [ _box_n_1 LBL: h10 ARG0: x9 ]
+          [ _a_q LBL: h11 ARG0: x9 RSTR: h12 BODY: h13 ] >
+  HCONS: < h6 qeq h2 h12 qeq h10 > ]"""
+
+    def test_isomorphic(self):
+        # Arrange
+        target = simplemrs.decode(self.TARGET)
+        composed = simplemrs.decode(self.TARGET.replace("x3", "x30"))
+        report = io.StringIO()
+
+        # Act
+        discrepancy = POGG.mrs_util.diff_mrs(target, composed)
+        different = POGG.mrs_util.find_discrepancy(target, composed, report)
+
+        # Assert
+        self.assertTrue(discrepancy.isomorphic)
+        self.assertFalse(different)
+        self.assertEqual(report.getvalue(), "SEMENTs are isomorphic!\n")
+
+    def test_rels(self):
+        # Arrange
+        target = simplemrs.decode(self.TARGET)
+        # no adjective, a different noun, and a different (but still a) quantifier
+        composed = simplemrs.decode(self.TARGET.replace("[ _red_a_1 LBL: h2 ARG0: e1 ARG1: x3 ]", "")
+                                    .replace("_box_n_1", "_crate_n_1").replace("_a_q", "udef_q"))
+
+        # Act
+        discrepancy = POGG.mrs_util.diff_mrs(target, composed)
+
+        # Assert
+        self.assertFalse(discrepancy.isomorphic)
+        self.assertEqual(discrepancy.missing_rels, ["_box_n_1", "_red_a_1"])
+        self.assertEqual(discrepancy.extra_rels, ["_crate_n_1"])
+        self.assertEqual(discrepancy.missing_equalities, [])
+
+    def test_exact_quantifiers_matched_first(self):
+        # Arrange
+        target = simplemrs.decode(self.TARGET)
+        # _the_q is in both, so it's the _a_q that's missing
+        composed = simplemrs.decode(self.TARGET.replace("[ _a_q LBL: h11 ARG0: x9 RSTR: h12 BODY: h13 ]", "")
+                                    .replace("h12 qeq h10", ""))
+
+        # Act
+        discrepancy = POGG.mrs_util.diff_mrs(target, composed)
+
+        # Assert
+        self.assertEqual(discrepancy.missing_rels, ["_a_q"])
+        self.assertEqual(discrepancy.extra_rels, [])
+
+    def test_equalities(self):
+        # Arrange
+        target = simplemrs.decode(self.TARGET)
+        # the adjective modifies the box instead of the cat
+        composed = simplemrs.decode(self.TARGET.replace("ARG0: e1 ARG1: x3", "ARG0: e1 ARG1: x9"))
+        report = io.StringIO()
+
+        # Act
+        discrepancy = POGG.mrs_util.diff_mrs(target, composed)
+        different = POGG.mrs_util.find_discrepancy(target, composed, report)
+
+        # Assert
+        self.assertTrue(different)
+        self.assertTrue(discrepancy.same_rels)
+        missing = [regularized for regularized, _ in discrepancy.missing_equalities]
+        extra = [regularized for regularized, _ in discrepancy.extra_equalities]
+        self.assertIn(['_cat_n_1__ARG0', '_in_p_loc__ARG1', '_red_a_1__ARG1', 'abstract_q__ARG0'], missing)
+        self.assertIn(['_box_n_1__ARG0', '_in_p_loc__ARG2', '_red_a_1__ARG1', 'abstract_q__ARG0'], extra)
+        self.assertEqual(discrepancy.missing_hcons, [])
+        self.assertIn("Equivalencies in TARGET SEMENT not found in COMPOSED SEMENT", report.getvalue())
+
+    def test_dangling_hcons(self):
+        # Arrange
+        target = simplemrs.decode(self.TARGET)
+        # the quantifier's gone but its qeq is still there, and there's a second copy of the other qeq
+        composed = simplemrs.decode(self.TARGET.replace("[ _a_q LBL: h11 ARG0: x9 RSTR: h12 BODY: h13 ]",
+                                                        "[ udef_q LBL: h11 ARG0: x9 RSTR: h14 BODY: h13 ]")
+                                    .replace("h6 qeq h2", "h6 qeq h2 h6 qeq h2"))
+
+        # Act
+        discrepancy = POGG.mrs_util.diff_mrs(target, composed)
+
+        # Assert
+        self.assertTrue(discrepancy.same_rels)
+        self.assertEqual(len(discrepancy.extra_hcons), 2)
+        self.assertEqual(len(discrepancy.missing_hcons), 1)
+
+
+class _SlowPool:
+    """
+    Stands in for an ACEGeneratorPool, answering every MRS after a short wait and counting how many are in at once
+    """
+    def __init__(self, size):
+        self.size = size
+        self.cache = None
+        self.max_results = None
+        self.sent = []
+        self.most_at_once = 0
+        self._at_once = 0
+        self._lock = threading.Lock()
+
+    def interact(self, mrs_string, timeout=None, request=None):
+        with self._lock:
+            self.sent.append(mrs_string)
+            self._at_once += 1
+            self.most_at_once = max(self.most_at_once, self._at_once)
+        time.sleep(0.05)
+        with self._lock:
+            self._at_once -= 1
+        return interface.Response({'results': [{'surface': mrs_string.upper()}]})
+
+
+class TestGenerateMany(unittest.TestCase):
+    """
+    Test generating from many MRSs at once with asyncio
+    """
+
+    def _generate_many(self, mrs_strings, pool, concurrency=None):
+        async def collect():
+            return [result async for result in POGG.mrs_util.generate_many(mrs_strings, pool, concurrency)]
+        return asyncio.run(collect())
+
+    def test_results_by_position(self):
+        # Arrange
+        pool = _SlowPool(2)
+        mrs_strings = ["cat", "", "dog", "box"]
+
+        # Act
+        results = self._generate_many(mrs_strings, pool)
+
+        # Assert
+        surfaces = {position: [r['surface'] for r in position_results] for position, position_results in results}
+        self.assertEqual(surfaces, {0: ["CAT"], 1: [], 2: ["DOG"], 3: ["BOX"]})
+        # no MRS, nothing to send
+        self.assertCountEqual(pool.sent, ["cat", "dog", "box"])
+
+    def test_bounded_concurrency(self):
+        # Arrange
+        pool = _SlowPool(3)
+
+        # Act
+        results = self._generate_many(("mrs{}".format(i) for i in range(8)), pool, concurrency=2)
+
+        # Assert
+        self.assertEqual(len(results), 8)
+        self.assertEqual(pool.most_at_once, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
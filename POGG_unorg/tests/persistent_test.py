@@ -0,0 +1,43 @@
+import unittest
+
+from POGG.persistent import Chain
+
+
+class TestChain(unittest.TestCase):
+    """
+    Test concatenating and flattening persistent chains
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def test_concat_order(self):
+        # Arrange
+        left = Chain.concat(Chain([1, 2]), Chain([3]))
+        right = Chain([4, 5])
+
+        # Act
+        chain = Chain.concat(left, Chain(), right)
+
+        # Assert
+        self.assertEqual(len(chain), 5)
+        self.assertEqual(list(chain), [1, 2, 3, 4, 5])
+        # the pieces are unchanged
+        self.assertEqual(list(left), [1, 2, 3])
+
+    def test_deep_chain(self):
+        # Arrange
+        chain = Chain()
+        for i in range(5000):
+            chain = Chain.concat(Chain([i]), chain)
+
+        # Act
+        items = chain.items()
+
+        # Assert
+        self.assertEqual(items, tuple(reversed(range(5000))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+import POGG.results_log
+
+
+class TestResultsLog(unittest.TestCase):
+    """
+    Test streaming per-graph results to a log and summarizing them afterwards
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = POGG.results_log.results_log_path(self.temp_dir.name)
+        self.summary_path = os.path.join(self.temp_dir.name, "evaluation_summary.txt")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _graph_result(self, graph_name, results=2):
+        error = KeyError("Can't find 'idTable' as a key in the lexicon")
+        eval_info = {
+            'nodes': {
+                'idCat_1': {'produced': (True, "MRS fragment produced"), 'included': (True, "Included in MRS")},
+                'idTable_2': {'produced': (False, error), 'included': (False, error)}
+            },
+            'edges': {
+                'onTopOf_1': {'produced': (False, "Inbound to failed node"), 'included': (False, "Inbound to failed node")}
+            }
+        }
+        return graph_name, eval_info, [results, "Successfully generated", "ok"]
+
+    def test_record(self):
+        # Act
+        with POGG.results_log.ResultsLog(self.log_path) as results_log:
+            results_log.write(self._graph_result("graph0"))
+        records = list(POGG.results_log.read_results_log(self.log_path))
+
+        # Assert
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['generation'], [2, "Successfully generated", "ok"])
+        self.assertEqual(records[0]['nodes']['idTable_2']['produced'],
+                         [False, str(KeyError("Can't find 'idTable' as a key in the lexicon"))])
+
+    def test_cut_off_line_skipped(self):
+        # Arrange
+        with POGG.results_log.ResultsLog(self.log_path) as results_log:
+            results_log.write(self._graph_result("graph0"))
+        # the run died part way through writing graph1
+        with open(self.log_path, 'a') as log_file:
+            log_file.write('{"graph": "graph1", "gener')
+
+        # Act
+        with POGG.results_log.ResultsLog(self.log_path) as results_log:
+            results_log.write(self._graph_result("graph2"))
+        records = list(POGG.results_log.read_results_log(self.log_path))
+
+        # Assert
+        self.assertEqual([r['graph'] for r in records], ["graph0", "graph2"])
+
+    def test_aggregate(self):
+        # Arrange
+        with POGG.results_log.ResultsLog(self.log_path) as results_log:
+            results_log.write(self._graph_result("graph0", results=0))
+            results_log.write(self._graph_result("graph1"))
+            # graph0 was run again
+            results_log.write(self._graph_result("graph0", results=3))
+
+        # Act
+        graph_count = POGG.results_log.aggregate(self.log_path, self.summary_path)
+
+        # Assert
+        self.assertEqual(graph_count, 2)
+        with open(self.summary_path) as summary_file:
+            summary = summary_file.read()
+        self.assertIn("graph0_idTable_2", summary)
+        self.assertRegex(summary, r"graph0\s+3\s+Successfully generated\s+ok")
+        self.assertIn("Can't find 'idTable' as a key in the lexicon", summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
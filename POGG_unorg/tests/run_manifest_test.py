@@ -0,0 +1,155 @@
+import os
+import tempfile
+import unittest
+
+import POGG.ace_pool
+import POGG.run_manifest
+
+
+class TestRunManifest(unittest.TestCase):
+    """
+    Test working out which graphs have to be run again from the run manifest
+
+    - Arrange: arrange all necessary preconditions and inputs
+    - Act: on the object or method under test
+    - Assert: that the expected results have occurred
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.results_directory = self.temp_dir.name
+        self.manifest_path = POGG.run_manifest.manifest_path(self.results_directory)
+        self.lexicon = {
+            'entityTypes': {'idCat': "_cat_n_1", 'idBox': "_box_n_1"},
+            'propertyValues': {'red': "_red_a_1"},
+            'properties': {'idColor': "adjective", 'insideOf': "preposition"}
+        }
+        self.cat_path = self._write_graph("cat", 'idCat0 [root=root];\nidCat0 -> red [label=idCat0_prop_idColor];\n')
+        self.box_path = self._write_graph("box", 'idBox0 [root=root];\nidBox0 -> idBox1 [label=insideOf];\n')
+        self.graph_paths = [self.cat_path, self.box_path]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _write_graph(self, name, statements):
+        graph_path = os.path.join(self.temp_dir.name, name + ".dot")
+        with open(graph_path, 'w') as graph_file:
+            graph_file.write("digraph  {\n" + statements + "}\n")
+        return graph_path
+
+    def _run(self, manifest, graph_paths, status=POGG.ace_pool.GENERATION_OK):
+        # what a run does for each graph: write its results file and record it
+        for graph_path in graph_paths:
+            graph_name = os.path.splitext(os.path.basename(graph_path))[0]
+            with open(os.path.join(self.results_directory, graph_name + ".txt"), 'w') as results_file:
+                results_file.write(graph_path)
+            manifest.record((graph_name, {'nodes': {}, 'edges': {}}, [1, "Successfully generated", status]),
+                            self.results_directory)
+
+    def test_unchanged_graphs_skipped(self):
+        # Arrange
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            self._run(manifest, manifest.stale_graphs(self.graph_paths, self.lexicon))
+
+        # Act
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+        with POGG.run_manifest.RunManifest(self.manifest_path, "other config") as manifest:
+            new_config_stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+
+        # Assert
+        self.assertEqual(stale, [])
+        self.assertEqual(new_config_stale, self.graph_paths)
+
+    def test_queued_graphs_recorded(self):
+        # Arrange
+        checked_path = os.path.join(self.temp_dir.name, "checked.jsonl")
+        with POGG.run_manifest.RunManifest(checked_path, "config") as manifest:
+            self._run(manifest, manifest.stale_graphs(self.graph_paths, self.lexicon))
+        checked_entries = POGG.run_manifest.RunManifest(checked_path, "config").entries
+
+        # Act
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            manifest.queue(self.graph_paths, self.lexicon)
+            self._run(manifest, self.graph_paths)
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+            entries = manifest.entries
+
+        # Assert
+        # same entries as if the graphs had been checked first
+        self.assertEqual(entries, checked_entries)
+        self.assertEqual(stale, [])
+
+    def test_changes_only_rerun_graphs_they_affect(self):
+        # Arrange
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            self._run(manifest, manifest.stale_graphs(self.graph_paths, self.lexicon))
+
+        # Act
+        self.lexicon['propertyValues']['red'] = "_red_a_2"
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            lexicon_stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+            self._run(manifest, lexicon_stale)
+        self._write_graph("box", 'idBox0 [root=root];\nidBox0 -> idBox2 [label=insideOf];\n')
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            input_stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+
+        # Assert
+        self.assertEqual(lexicon_stale, [self.cat_path])
+        self.assertEqual(input_stale, [self.box_path])
+
+    def test_failed_graphs_retried_on_request(self):
+        # Arrange
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            manifest.stale_graphs(self.graph_paths, self.lexicon)
+            self._run(manifest, [self.cat_path])
+            self._run(manifest, [self.box_path], status=POGG.ace_pool.GENERATION_TIMEOUT)
+
+        # Act
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+            retry_stale = manifest.stale_graphs(self.graph_paths, self.lexicon, retry_failed=True)
+
+        # Assert
+        self.assertEqual(stale, [])
+        self.assertEqual(retry_stale, [self.box_path])
+
+    def test_missing_results_rerun(self):
+        # Arrange
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            self._run(manifest, manifest.stale_graphs(self.graph_paths, self.lexicon))
+        os.remove(os.path.join(self.results_directory, "cat.txt"))
+
+        # Act
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+            unlogged_stale = manifest.stale_graphs(self.graph_paths, self.lexicon, have_results={"cat"})
+
+        # Assert
+        self.assertEqual(stale, [self.cat_path])
+        self.assertEqual(unlogged_stale, self.graph_paths)
+
+    def test_resume_after_interruption(self):
+        # Arrange
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            graph_paths = manifest.stale_graphs(self.graph_paths, self.lexicon)
+            self._run(manifest, graph_paths[:1])
+        # the run died part way through recording the second graph
+        with open(self.manifest_path, 'a') as manifest_file:
+            manifest_file.write('{"graph": "box", "outp')
+
+        # Act
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+            self._run(manifest, stale)
+        with POGG.run_manifest.RunManifest(self.manifest_path, "config") as manifest:
+            resumed_stale = manifest.stale_graphs(self.graph_paths, self.lexicon)
+
+        # Assert
+        self.assertEqual(stale, [self.box_path])
+        self.assertEqual(resumed_stale, [])
+
+
+if __name__ == '__main__':
+    unittest.main()